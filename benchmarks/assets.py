@@ -0,0 +1,104 @@
+"""
+Time to get the images of the window ready, the way main.py used to do it (every PNG file decoded and scaled twice
+at every launch, never converted) against AssetSet: building the atlas without a cache file, reading it from the
+cache file (a later launch), and a new size (a resize) in the same process and from the cache. Then the pieces
+blitted per second, not converted against converted to the format of the display. It runs without a window (SDL
+dummy video driver) unless SDL_VIDEODRIVER is set.
+
+    python benchmarks/assets.py --assets Nicest_Assets --blits 20000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from classes.AssetsClass import PIECE_COLORS, PIECE_NAMES, AssetSet
+
+
+def legacy_images(directory, board_size, piece_size):
+    """
+    :param directory: str
+    :param board_size: tuple
+    :param piece_size: tuple
+    :return: dict. {piece: {color: Surface}}, loaded as main.py used to.
+    """
+    pygame.transform.scale(pygame.image.load(os.path.join(directory, 'board_alt.png')), board_size)
+    images = {}
+    for name in os.listdir(directory):
+        if name.endswith('.png') and 'alt' not in name:
+            color, piece = name[:-4].split('_')
+            path = os.path.join(directory, name)
+            images.setdefault(piece, {})
+            pygame.transform.scale(pygame.image.load(path), piece_size)
+            images[piece][color] = pygame.transform.scale(pygame.image.load(path), piece_size)
+    return images
+
+
+def timed(function, *args):
+    """
+    :return: tuple. (result, milliseconds)
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def blits_per_second(window, images, count):
+    """
+    :param window: pygame.Surface
+    :param images: list of pygame.Surface
+    :param count: int
+    :return: float
+    """
+    start = time.perf_counter()
+    for i in range(count):
+        window.blit(images[i % len(images)], (i % 700, i * 7 % 700))
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--assets', default='Nicest_Assets')
+    parser.add_argument('--board', type=int, default=400, help="board size in pixels")
+    parser.add_argument('--piece', type=int, default=40, help="piece size in pixels")
+    parser.add_argument('--blits', type=int, default=20000)
+    args = parser.parse_args()
+
+    pygame.init()
+    window = pygame.display.set_mode((800, 800))
+    directory = os.path.join(ROOT, args.assets)
+    board_size, piece_size = (args.board, args.board), (args.piece, args.piece)
+    resized_board, resized_piece = (args.board * 3 // 2,) * 2, (args.piece * 3 // 2,) * 2
+    cache = tempfile.mkdtemp()
+    try:
+        legacy, legacy_time = timed(legacy_images, directory, board_size, piece_size)
+        print(f"{'legacy load':<24} {legacy_time:8.2f} ms")
+
+        assets = AssetSet(directory, cache)
+        atlas, cold = timed(assets.atlas, board_size, piece_size)
+        print(f"{'atlas, no cache file':<24} {cold:8.2f} ms")
+        _, resize = timed(assets.atlas, resized_board, resized_piece)
+        print(f"{'resize, same process':<24} {resize:8.2f} ms")
+        _, warm = timed(AssetSet(directory, cache).atlas, board_size, piece_size)
+        print(f"{'atlas, from cache file':<24} {warm:8.2f} ms")
+        _, resize_warm = timed(AssetSet(directory, cache).atlas, resized_board, resized_piece)
+        print(f"{'resize, from cache file':<24} {resize_warm:8.2f} ms")
+    finally:
+        shutil.rmtree(cache)
+
+    old = [legacy[piece][color] for piece in PIECE_NAMES for color in PIECE_COLORS]
+    new = [atlas.pieces[(piece, color)] for piece in PIECE_NAMES for color in PIECE_COLORS]
+    print(f"{'blits, not converted':<24} {blits_per_second(window, old, args.blits):10.0f} /s")
+    print(f"{'blits, atlas':<24} {blits_per_second(window, new, args.blits):10.0f} /s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Time to open an opening book and positions per second looked up in it (moves of the book for the position). The
+book is compiled from random games written to a temporary file, unless a book is given.
+
+    python benchmarks/book.py --games 2000
+    python benchmarks/book.py --path book.bin
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from classes.BoardClass import Board
+from classes.BookClass import OpeningBook, build_book
+from pgn import random_games
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--games', type=int, default=500)
+    parser.add_argument('--path', help="a book to read instead of one made of random games")
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        directory = tempfile.mkdtemp()
+        random_games(os.path.join(directory, 'games.pgn'), args.games, max_plies=16)
+        path = os.path.join(directory, 'book.bin')
+        build_book([os.path.join(directory, 'games.pgn')], path, max_plies=16)
+
+    start = time.perf_counter()
+    book = OpeningBook(path)
+    opened = time.perf_counter() - start
+
+    # the positions after a few random moves, most of them in the book if it is made of random games
+    chooser = random.Random(0)
+    keys = []
+    for _ in range(200):
+        board = Board()
+        for _ in range(chooser.randrange(4)):
+            board.make_move(chooser.choice(board.legal_moves(board.turn)))
+        keys.append(board.zobrist_key)
+
+    found = 0
+    start = time.perf_counter()
+    for i in range(args.lookups):
+        found += bool(book.entries(keys[i % len(keys)]))
+    elapsed = time.perf_counter() - start
+    print(f"{len(book)} entries ({os.path.getsize(path)} bytes) opened in {opened * 1000:.3f} ms, "
+          f"{args.lookups / elapsed:.0f} lookups/s ({found * 100 // args.lookups}% found)")
+    book.close()
+
+
+if __name__ == "__main__":
+    main()
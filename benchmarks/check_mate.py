@@ -0,0 +1,64 @@
+"""
+Time of Game.check_mate() on a few positions of the grid board, the check that main.py runs after every click.
+
+    python benchmarks/check_mate.py --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.BoardClass import Board
+from classes.GameClass import Game
+
+POSITIONS = {
+    'start': [],
+    'italian': ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'f8c5', 'c2c3', 'g8f6'],
+    'check': ['e2e4', 'e7e5', 'f1c4', 'b8c6', 'd1h5', 'g8f6', 'h5f7'],
+    'middlegame': ['d2d4', 'd7d5', 'c2c4', 'e7e6', 'b1c3', 'g8f6', 'c1g5', 'f8e7', 'e2e3', 'b8d7', 'g1f3', 'e8g8'],
+}
+
+
+def square(name):
+    """
+    :param name: str. For example 'e2'.
+    :return: tuple. (row, col) of the board.
+    """
+    return 8 - int(name[1]), ord(name[0]) - ord('a')
+
+
+def build_game(moves):
+    game = Game(Board())
+    for move in moves:
+        old_position, new_position = square(move[:2]), square(move[2:])
+        game.select_piece(*old_position, 0, 0)
+        game.move(new_position)
+    return game
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for name, moves in POSITIONS.items():
+        game = build_game(moves)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            # a new position: the legal moves must be computed again
+            game.legal_moves_cache = None
+            result = game.check_mate()
+        first = (time.perf_counter() - start) / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            game.check_mate()
+        cached = (time.perf_counter() - start) / args.repeat
+        print(f"{name:<12} {game.color} to move: {first * 1000:9.3f} ms per check_mate(), "
+              f"{cached * 1000:7.3f} ms once the legal moves are cached -> {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+CPU use of the window while nobody touches it, and the time from a click to the frame that shows it on the screen,
+for the three ways the main loop can run: drawing as fast as it can (no frame cap, as it used to), polling the events
+MAX_FPS times per second, and sleeping until the next event (EVENT_DRIVEN). The clicks play the moves of a random
+game. It runs without a window (SDL dummy video driver) unless SDL_VIDEODRIVER is set.
+
+    python benchmarks/event_loop.py --idle 3 --moves 20
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+# main loads the images from paths relative to the repository
+os.chdir(ROOT)
+
+import pygame
+
+import main as gui
+from classes.BoardClass import Board
+
+MODES = {'unpaced': (False, 0), 'polling': (False, 60), 'event-driven': (True, 60)}
+
+
+def random_moves(count, seed=0):
+    """
+    :param count: int
+    :param seed: int
+    :return: list of Move. The moves of a random game without promotions (they need the menu).
+    """
+    chooser = random.Random(seed)
+    board = Board()
+    moves = []
+    while len(moves) < count:
+        legal_moves = [move for move in board.legal_moves(board.turn) if move.promotion is None]
+        if not legal_moves:
+            break
+        move = chooser.choice(legal_moves)
+        board.make_move(move)
+        moves.append(move)
+    return moves
+
+
+def measure(event_driven, max_fps, idle, moves):
+    """
+    :param event_driven: bool
+    :param max_fps: int. 0 for no frame cap.
+    :param idle: float. Seconds without events.
+    :param moves: list of Move
+    :return: tuple. (CPU use while idle, sorted list of click to paint latencies in seconds)
+    """
+    gui.EVENT_DRIVEN, gui.MAX_FPS = event_driven, max_fps
+    gui.last_frame.clear()
+    painted = threading.Event()
+    update = pygame.display.update
+
+    def timed_update(*args):
+        update(*args)
+        painted.set()
+
+    results = {'latencies': []}
+
+    def player():
+        try:
+            time.sleep(0.5)
+            cpu, wall = time.process_time(), time.perf_counter()
+            time.sleep(idle)
+            results['idle'] = (time.process_time() - cpu) / (time.perf_counter() - wall)
+            for move in moves:
+                for row, col in (move.old_position, move.new_position):
+                    x, y = gui.get_center_square(row, col)
+                    painted.clear()
+                    start = time.perf_counter()
+                    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(int(x), int(y)), button=1))
+                    painted.wait(1)
+                    results['latencies'].append(time.perf_counter() - start)
+                    time.sleep(0.05)
+        finally:
+            # the window is closed even if something goes wrong
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    pygame.display.update = timed_update
+    thread = threading.Thread(target=player)
+    thread.start()
+    try:
+        gui.event_loop(True, None)
+    finally:
+        thread.join()
+        pygame.display.update = update
+    return results['idle'], sorted(results['latencies'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--idle', type=float, default=3.0, help="seconds without events")
+    parser.add_argument('--moves', type=int, default=20)
+    args = parser.parse_args()
+
+    moves = random_moves(args.moves)
+    for name, (event_driven, max_fps) in MODES.items():
+        cpu, latencies = measure(event_driven, max_fps, args.idle, moves)
+        p50, p99 = latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{name:<13} idle CPU {cpu * 100:5.1f}%, click to paint p50 {p50 * 1000:6.2f} ms, "
+              f"p99 {p99 * 1000:6.2f} ms, max {latencies[-1] * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
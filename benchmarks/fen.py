@@ -0,0 +1,59 @@
+"""
+Positions per second written (to_fen) and read (from_fen) in the FEN notation, with both backends of the board. The
+positions come from random games.
+
+    python benchmarks/fen.py --positions 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.BoardClass import Board
+from classes.BitboardClass import BitBoard
+
+
+def positions(count, seed=0):
+    """
+    :param count: int
+    :param seed: int
+    :return: list of str. FEN strings of the positions of random games.
+    """
+    chooser = random.Random(seed)
+    fens = []
+    board = Board()
+    while len(fens) < count:
+        moves = board.legal_moves(board.turn)
+        if not moves or len(board.history) >= 200:
+            board = Board()
+            continue
+        board.make_move(chooser.choice(moves))
+        fens.append(board.to_fen())
+    return fens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--positions', type=int, default=2000)
+    args = parser.parse_args()
+
+    fens = positions(args.positions)
+    for backend in (Board, BitBoard):
+        start = time.perf_counter()
+        boards = [backend.from_fen(fen) for fen in fens]
+        read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        written = [board.to_fen() for board in boards]
+        write = time.perf_counter() - start
+
+        assert written == fens
+        print(f"{backend.__name__:<9} from_fen {len(fens) / read:9.0f} positions/s, "
+              f"to_fen {len(fens) / write:9.0f} positions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Frame time and CPU time of main.draw while idle (nothing changes between frames) and while playing (a piece is
+selected and then moved, every move of a random game), drawing only the regions that changed and drawing the whole
+frame every time. It runs without a window (SDL dummy video driver) unless SDL_VIDEODRIVER is set.
+
+    python benchmarks/frame_time.py --frames 2000 --moves 100
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+# main loads the images from paths relative to the repository
+os.chdir(ROOT)
+
+import main as gui
+from classes.BoardClass import Board
+from classes.GameClass import Game
+
+
+def frames(moves, seed=0):
+    """
+    :param moves: int
+    :param seed: int
+    :return: list of tuple. The arguments of main.draw of every frame: the board before every move with the piece
+             selected, and the board after the move.
+    """
+    chooser = random.Random(seed)
+    game = Game(Board())
+    frames = []
+    eaten = []
+    for _ in range(moves):
+        legal_moves = game.legal_moves()
+        if not legal_moves:
+            break
+        move = chooser.choice(legal_moves)
+        row, col = move.old_position
+        x, y = gui.normalize_position((row, col))
+        click_info, valid_moves = game.select_piece(row, col, x, y)
+        frames.append((Board.unpack(game.board.pack()), click_info, list(valid_moves), list(eaten)))
+        captured = game.play(move)
+        if captured is not None:
+            eaten.append(captured)
+        frames.append((Board.unpack(game.board.pack()), None, [], list(eaten)))
+    return frames
+
+
+def measure(states, full):
+    """
+    :param states: list of tuple. (board, click_info, valid_moves, eaten pieces) of every frame.
+    :param full: bool. Draw the whole frame every time.
+    :return: tuple. (mean milliseconds per frame, p99 milliseconds, CPU milliseconds per frame, pixels updated per
+             frame)
+    """
+    gui.last_frame.clear()
+    times = []
+    pixels = 0
+    cpu_start = time.process_time()
+    for board, click_info, valid_moves, eaten in states:
+        if full:
+            gui.last_frame.clear()
+        start = time.perf_counter()
+        rects = gui.draw(gui.win, gui.BACKGROUND, board, None, click_info, valid_moves, eaten, True, None)
+        times.append(time.perf_counter() - start)
+        pixels += sum(rect.width * rect.height for rect in rects)
+    cpu = time.process_time() - cpu_start
+    times.sort()
+    return (sum(times) / len(times) * 1000, times[int(len(times) * 0.99)] * 1000, cpu / len(times) * 1000,
+            pixels / len(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=1000, help="idle frames")
+    parser.add_argument('--moves', type=int, default=100, help="moves of the random game")
+    parser.add_argument('--fps', type=int, default=60, help="frame rate of the CPU use")
+    args = parser.parse_args()
+
+    active = frames(args.moves)
+    idle = [active[0]] * args.frames
+    for name, states in (('idle', idle), ('active', active)):
+        for mode, full in (('dirty', False), ('full', True)):
+            mean, p99, cpu, pixels = measure(states, full)
+            print(f"{name:<6} {mode:<5} {mean:7.3f} ms/frame (p99 {p99:7.3f} ms), CPU {cpu:7.3f} ms/frame "
+                  f"({min(100.0, cpu * args.fps / 10):5.1f}% at {args.fps} fps), {pixels:9.0f} pixels/frame")
+
+
+if __name__ == "__main__":
+    main()
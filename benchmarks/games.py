@@ -0,0 +1,37 @@
+"""
+Random games for the benchmarks that play moves on boards (registry.py, server_load.py, spectators.py). It is not a
+benchmark itself.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.BoardClass import Board
+
+
+def random_games(count, plies, seed=0, complete=False):
+    """
+    :param count: int
+    :param plies: int
+    :param seed: int
+    :param complete: bool. Only the games that do not end (by checkmate, stalemate or threefold repetition) before
+                     the last ply, so all of them have plies moves.
+    :return: list of list of Move
+    """
+    chooser = random.Random(seed)
+    games = []
+    while len(games) < count:
+        board = Board()
+        moves = []
+        while len(moves) < plies:
+            legal_moves = board.legal_moves(board.turn)
+            if not legal_moves or (complete and board.repetitions() >= 3):
+                break
+            moves.append(chooser.choice(legal_moves))
+            board.make_move(moves[-1])
+        # the last move can end the game, not the ones before it
+        if not complete or len(moves) == plies:
+            games.append(moves)
+    return games
@@ -0,0 +1,66 @@
+"""
+Import time of the rules core (Board, Game and the pieces) against the pygame view layer (main).
+
+Every import is measured in a fresh interpreter, so nothing is cached between runs. Run it from the root of the
+repository:
+
+    python benchmarks/import_time.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CORE = "import classes.BoardClass, classes.GameClass"
+VIEW = "import main"
+
+SNIPPET = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, 'pygame' in sys.modules)
+"""
+
+
+def time_import(statement, runs):
+    """
+    :param statement: str
+    :param runs: int
+    :return: list of floats (seconds) or None if the import fails
+    """
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', SDL_AUDIODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', SNIPPET.format(statement=statement)],
+                                cwd=ROOT, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        elapsed, pygame_loaded = result.stdout.split()
+        times.append(float(elapsed))
+    return times, pygame_loaded == 'True'
+
+
+def report(name, statement, runs):
+    times, extra = time_import(statement, runs)
+    if times is None:
+        print(f"{name:<6} {statement!r:<48} failed: {extra}")
+        return
+    print(f"{name:<6} {statement!r:<48} median {statistics.median(times) * 1000:8.2f} ms   "
+          f"min {min(times) * 1000:8.2f} ms   pygame loaded: {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    report('core', CORE, args.runs)
+    report('view', VIEW, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Memory of a board and memory allocated by the moves, for both backends of the board.
+
+    python benchmarks/memory.py --boards 500
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.BoardClass import Board
+from classes.BitboardClass import BitBoard
+
+MOVES = ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'f8c5', 'c2c3', 'g8f6', 'd2d4', 'e5d4', 'c3d4', 'c5b4']
+
+
+def square(name):
+    return 8 - int(name[1]), ord(name[0]) - ord('a')
+
+
+def board_memory(backend, count):
+    """
+    :param backend: class
+    :param count: int
+    :return: float. Bytes per board.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    boards = [backend() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del boards
+    return (after - before) / count
+
+
+def move_memory(backend, rounds):
+    """
+    The moves are played and taken back many times. We measure the memory kept by the board for every move
+    played (history), the temporary memory needed to play and take back a move, and the objects the garbage
+    collector has to track.
+    :param backend: class
+    :param rounds: int
+    :return: tuple. (retained bytes per move, peak temporary bytes per move, gc objects per move)
+    """
+    board = backend()
+    moves = [(square(move[:2]), square(move[2:])) for move in MOVES]
+
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tracked = len(gc.get_objects())
+    for old_position, new_position in moves:
+        board.check_move(new_position, old_position)
+    retained = (tracemalloc.get_traced_memory()[0] - base) / len(moves)
+    tracked = (len(gc.get_objects()) - tracked) / len(moves)
+
+    peaks = []
+    for _ in range(rounds):
+        while board.history:
+            board.unmake_move()
+        for old_position, new_position in moves:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            board.check_move(new_position, old_position)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    gc.enable()
+    return retained, sum(peaks) / len(peaks), tracked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--boards', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    for backend in (Board, BitBoard):
+        per_board = board_memory(backend, args.boards)
+        retained, peak, tracked = move_memory(backend, args.rounds)
+        print(f"{backend.__name__:<9} {per_board / 1024:7.1f} KiB per board, per move: {retained:6.0f} bytes kept, "
+              f"{peak:6.0f} bytes peak, {tracked:4.1f} new gc objects")
+
+
+if __name__ == "__main__":
+    main()
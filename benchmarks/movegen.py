@@ -0,0 +1,45 @@
+"""
+Legal move generation speed of the two backends of the board: the grid of pieces (Board) and the bitboards
+(BitBoard). Both count the leaf nodes of the start position (perft), so the node counts must match.
+
+    python benchmarks/movegen.py --depth 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.BoardClass import Board
+from classes.BitboardClass import BitBoard
+
+
+def run(backend, depth):
+    """
+    :param backend: class
+    :param depth: int
+    :return: tuple. (nodes, seconds)
+    """
+    board = backend()
+    start = time.perf_counter()
+    nodes = board.perft('white', depth)
+    return nodes, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--depth', type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    for backend in (Board, BitBoard):
+        nodes, elapsed = run(backend, args.depth)
+        results[backend.__name__] = elapsed
+        print(f"{backend.__name__:<9} depth {args.depth}: {nodes:>9} nodes in {elapsed:8.3f} s "
+              f"({nodes / elapsed:12.0f} nodes/s)")
+    print(f"BitBoard is {results['Board'] / results['BitBoard']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
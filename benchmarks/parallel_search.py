@@ -0,0 +1,64 @@
+"""
+Speedup of the parallel search (ParallelEngine) with 1, 2, 4, 8 and one worker per core: every run searches the same
+positions to the same depth, so the times can be compared.
+
+    python benchmarks/parallel_search.py --depth 3
+    python benchmarks/parallel_search.py --depth 4 --workers 1 2 16
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.BoardClass import START_FEN
+from classes.BitboardClass import BitBoard
+from classes.EngineClass import Engine, ParallelEngine
+from classes.GameClass import Game
+
+POSITIONS = (
+    START_FEN,
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+    'r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+)
+
+
+def run(engine, depth):
+    """
+    :param engine: Engine or ParallelEngine
+    :param depth: int
+    :return: tuple. (nodes, seconds)
+    """
+    nodes = 0
+    start = time.perf_counter()
+    for fen in POSITIONS:
+        nodes += engine.best_move(Game(BitBoard.from_fen(fen)), None, depth).nodes
+    return nodes, time.perf_counter() - start
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, 8, cores}))
+    args = parser.parse_args()
+
+    print(f"{cores} cores")
+    nodes, serial = run(Engine(), args.depth)
+    print(f"{'serial':<11} {nodes:>9} nodes in {serial:8.3f} s ({nodes / serial:9.0f} nodes/s)")
+
+    one_worker = None
+    for workers in args.workers:
+        with ParallelEngine(workers) as engine:
+            # the worker processes start with the first search
+            engine.best_move(Game(BitBoard()), None, 1)
+            nodes, elapsed = run(engine, args.depth)
+        one_worker = one_worker or elapsed
+        print(f"{workers:>2} workers  {nodes:>9} nodes in {elapsed:8.3f} s ({nodes / elapsed:9.0f} nodes/s) "
+              f"speedup {one_worker / elapsed:5.2f}x ({serial / elapsed:5.2f}x over serial)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Throughput of the PGN reader: games and moves per second read (read_games) and replayed with the rules of the game
+(validate_pgn.py), in one process and split between worker processes. The games are random games written to a
+temporary file, unless a file is given.
+
+    python benchmarks/pgn.py --games 500 --workers 4
+    python benchmarks/pgn.py --path games.pgn
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from classes.BoardClass import Board
+from classes.PgnClass import format_game, move_to_san, read_games
+from validate_pgn import validate
+
+
+def random_games(path, count, seed=0, max_plies=200):
+    """
+    :param path: str. The games are written to this file.
+    :param count: int
+    :param seed: int
+    :param max_plies: int
+    :return: None
+    """
+    chooser = random.Random(seed)
+    with open(path, 'w') as file:
+        for i in range(count):
+            board = Board()
+            moves = []
+            while len(moves) < max_plies:
+                legal_moves = board.legal_moves(board.turn)
+                if not legal_moves:
+                    break
+                move = chooser.choice(legal_moves)
+                moves.append(move_to_san(board, move, legal_moves))
+                board.make_move(move)
+            file.write(format_game({'Event': f"Random game {i + 1}", 'Result': '*'}, moves))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--path', help="a PGN file to read instead of random games")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    path = args.path
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'games.pgn')
+        random_games(path, args.games)
+
+    start = time.perf_counter()
+    games = moves = 0
+    with open(path, 'rb') as file:
+        for game in read_games(file):
+            games += 1
+            moves += len(game.moves)
+    elapsed = time.perf_counter() - start
+    print(f"{'read':<18} {games / elapsed:10.1f} games/s {moves / elapsed:10.0f} moves/s")
+
+    for workers in sorted({1, args.workers}):
+        start = time.perf_counter()
+        games = moves = errors = 0
+        for part_games, part_moves, part_errors in validate(path, workers):
+            games += part_games
+            moves += part_moves
+            errors += len(part_errors)
+        elapsed = time.perf_counter() - start
+        print(f"{f'replay {workers} workers':<18} {games / elapsed:10.1f} games/s {moves / elapsed:10.0f} moves/s "
+              f"({errors} errors)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Memory per game of a game registry and the time to rebuild a packed game, with every game as a Game object, with the
+games packed in memory and with the packed games in a store on disk. Every case runs in a new process, so the
+resident memory (RSS) it adds is the one of its games.
+
+    python benchmarks/registry.py --games 20000 --plies 40
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from classes.BoardClass import Board
+from classes.BitboardClass import BitBoard
+from classes.RegistryClass import GameRegistry
+from games import random_games
+
+BACKENDS = {'board': Board, 'bitboard': BitBoard}
+LIVE_GAMES = 100
+
+
+def rss():
+    """
+    :return: int. The resident memory of the process in bytes.
+    """
+    with open('/proc/self/statm') as file:
+        return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def run_case(job):
+    """
+    :param job: tuple. (case, backend, games, plies, gets)
+    :return: tuple. (bytes of RSS per game, registry stats)
+    """
+    case, backend, count, plies, gets = job
+    sequences = random_games(100, plies)
+    directory = tempfile.mkdtemp()
+    store_path = os.path.join(directory, 'games.store') if case == 'store' else None
+    capacity = count if case == 'games' else LIVE_GAMES
+    before = rss()
+    with GameRegistry(capacity, LIVE_GAMES, store_path, BACKENDS[backend]) as registry:
+        for i in range(count):
+            game = registry.get(registry.add())
+            for move in sequences[i % len(sequences)]:
+                game.board.make_move(move)
+                game.change_turn()
+        per_game = (rss() - before) / count
+        chooser = random.Random(1)
+        for _ in range(gets):
+            registry.get(chooser.randrange(1, count + 1))
+        stats = registry.stats()
+    os.rmdir(directory)
+    return per_game, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--games', type=int, default=20000)
+    parser.add_argument('--plies', type=int, default=40)
+    parser.add_argument('--gets', type=int, default=2000, help="games asked for at random after they are created")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='board')
+    args = parser.parse_args()
+
+    print(f"{args.games} games of {args.plies} plies, {args.backend}, {LIVE_GAMES} games kept as Game objects when "
+          f"they are packed")
+    for case, name in (('games', 'Game objects'), ('packed', 'packed in memory'), ('store', 'packed on disk')):
+        # a new process for every case, so the memory freed by a case is not reused by the next one
+        with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+            per_game, stats = pool.apply(run_case, ((case, args.backend, args.games, args.plies, args.gets),))
+        line = f"{name:>17}: {per_game / 1024:7.2f} KiB of RSS per game"
+        if stats['rebuilds']:
+            times = ('store rebuild' if case == 'store' else 'rebuild')
+            line += (f", rebuild p50 {stats[times + ' p50'] * 1000:.3f} ms p99 {stats[times + ' p99'] * 1000:.3f} ms "
+                     f"({stats['rebuilds']} rebuilds)")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Depth reached and nodes per second of the search engine with a time limit per position, with both backends of the
+board.
+
+    python benchmarks/search.py --time 2
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.BoardClass import Board, START_FEN
+from classes.BitboardClass import BitBoard
+from classes.EngineClass import Engine
+from classes.GameClass import Game
+
+POSITIONS = {
+    'start': START_FEN,
+    'middlegame': 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+    'kiwipete': 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'endgame': '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--time', type=float, default=1.0, help="seconds per position")
+    args = parser.parse_args()
+
+    for backend in (Board, BitBoard):
+        for name, fen in POSITIONS.items():
+            result = Engine().best_move(Game(backend.from_fen(fen)), args.time)
+            print(f"{backend.__name__:<9} {name:<11} {str(result.move):<6} score {result.score:>6} "
+                  f"depth {result.depth:>2} {result.nodes:>8} nodes ({result.nodes_per_second:8.0f} nodes/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Load test of the game server: a client simulator opens two connections per game, thousands at once, and they play
+random games against each other. It reports the moves per second of the whole server, the round trip time of a move
+seen by the clients and the validation latency measured by the server (from a move being read to being validated),
+for every number of worker processes. The server runs in another process, so it does not share the event loop of
+the clients.
+
+    python benchmarks/server_load.py --games 1000 --plies 40
+    python benchmarks/server_load.py --games 2000 --workers 0 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from classes.ServerClass import GameServer
+from classes.StatsClass import percentile
+from games import random_games
+
+
+def run_server(workers, backend, connection):
+    """
+    :param workers: int
+    :param backend: str
+    :param connection: multiprocessing.connection.Connection. The port is sent through it.
+    :return: None
+    """
+    async def serve():
+        server = GameServer(workers, backend)
+        # terminate stops the server, which stops its workers (they would outlive a killed server)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            connection.send(await server.start('127.0.0.1', 0))
+            await server.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            server.close()
+    asyncio.run(serve())
+
+
+async def player(port, color, moves, game_id, started, round_trips):
+    """
+    :param port: int
+    :param color: str
+    :param moves: list of str. The moves of both players.
+    :param game_id: asyncio.Future. Set by white when the server creates the game.
+    :param started: asyncio.Barrier. Every player waits on it before its first move.
+    :param round_trips: list. The round trip times of the moves of the player are added to it.
+    :return: int. The moves played.
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    if color == 'white':
+        writer.write(b"new\n")
+        game_id.set_result(int((await reader.readline()).split()[1]))
+    else:
+        writer.write(f"join {await game_id}\n".encode())
+        await reader.readline()
+    await reader.readline()
+    await started.wait()
+
+    played = 0
+    sent = None
+    for ply, move in enumerate(moves):
+        if (ply % 2 == 0) == (color == 'white'):
+            sent = time.perf_counter()
+            writer.write(move.encode() + b"\n")
+        line = await reader.readline()
+        if not line.strip() or line.split()[0] in (b'end', b'error'):
+            break
+        if sent is not None:
+            round_trips.append(time.perf_counter() - sent)
+            sent = None
+            played += 1
+    writer.close()
+    return played
+
+
+async def load(port, games, clients):
+    """
+    :param port: int
+    :param games: list of list of str
+    :param clients: int. Games played at once.
+    :return: tuple. (moves, seconds, sorted round trip times, server stats line)
+    """
+    loop = asyncio.get_running_loop()
+    started = asyncio.Barrier(2 * clients + 1)
+    round_trips = []
+    tasks = []
+    for i in range(clients):
+        game_id = loop.create_future()
+        moves = games[i % len(games)]
+        tasks.append(asyncio.create_task(player(port, 'white', moves, game_id, started, round_trips)))
+        tasks.append(asyncio.create_task(player(port, 'black', moves, game_id, started, round_trips)))
+    await started.wait()
+    start = time.perf_counter()
+    moves = sum(await asyncio.gather(*tasks))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b"stats\n")
+    stats = (await reader.readline()).decode().split()
+    writer.close()
+    return moves, elapsed, sorted(round_trips), stats
+
+
+def raise_open_files_limit(connections):
+    """
+    Every connection is a file descriptor in the client and another one in the server.
+    :param connections: int
+    :return: None
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = connections + 256
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted if hard == resource.RLIM_INFINITY else min(wanted, hard),
+                                                    hard))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--games', type=int, default=1000, help="games played at once (two connections each)")
+    parser.add_argument('--plies', type=int, default=40)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, os.cpu_count() or 1],
+                        help="worker processes of the server, 0 to validate in the event loop")
+    parser.add_argument('--backend', choices=['board', 'bitboard'], default='bitboard')
+    args = parser.parse_args()
+
+    raise_open_files_limit(2 * args.games)
+    games = [[str(move) for move in moves] for moves in random_games(min(args.games, 100), args.plies, complete=True)]
+    print(f"{args.games} games at once ({2 * args.games} connections), {args.plies} plies each, {args.backend}")
+    for workers in args.workers:
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        server = multiprocessing.Process(target=run_server, args=(workers, args.backend, sender))
+        server.start()
+        try:
+            port = receiver.recv()
+            moves, elapsed, round_trips, stats = asyncio.run(load(port, games, args.games))
+        finally:
+            server.terminate()
+            server.join()
+        name = 'in the event loop' if workers == 0 else f"{workers} worker{'s' if workers > 1 else ''}"
+        print(f"{name:>18}: {moves / elapsed:8.0f} moves/s, round trip p50 {percentile(round_trips, 50) * 1000:.2f} "
+              f"ms p99 {percentile(round_trips, 99) * 1000:.2f} ms, validation p50 {stats[2]} ms p99 {stats[3]} ms")
+
+
+if __name__ == "__main__":
+    main()
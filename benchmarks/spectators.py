@@ -0,0 +1,104 @@
+"""
+Messages per second and bytes per move of the spectator channel, against a baseline that sends the whole position
+(its FEN) to every spectator after every move. The spectators are local sockets (socket pairs) read by asyncio
+tasks, so the cost of writing to them is in the figures; every byte sent is read before the time stops.
+
+    python benchmarks/spectators.py --spectators 500 --games 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from classes.BoardClass import Board
+from classes.ChannelClass import SpectatorChannel
+from games import random_games
+
+
+class FullStateChannel(SpectatorChannel):
+    """
+    The baseline: the position after every move instead of the move.
+    """
+
+    def publish(self, board, move, captured):
+        data = f"board {board.to_fen()}\n".encode()
+        self.keyframe = data
+        self.send(data)
+        return data
+
+
+async def count_bytes(reader):
+    """
+    :param reader: asyncio.StreamReader
+    :return: int. The bytes read until the end of the stream.
+    """
+    total = 0
+    while True:
+        data = await reader.read(1 << 16)
+        if not data:
+            return total
+        total += len(data)
+
+
+async def broadcast(channel_class, games, spectators):
+    """
+    :param channel_class: class
+    :param games: list of list of Move
+    :param spectators: int
+    :return: tuple. (messages sent, bytes of the moves, moves, bytes read by the spectators, seconds)
+    """
+    # the writers of the spectators are kept: their sockets would be closed with them
+    writers, readers, spectator_writers = [], [], []
+    for _ in range(spectators):
+        left, right = socket.socketpair()
+        writers.append((await asyncio.open_connection(sock=left))[1])
+        reader, writer = await asyncio.open_connection(sock=right)
+        readers.append(asyncio.create_task(count_bytes(reader)))
+        spectator_writers.append(writer)
+
+    messages = sent = plies = 0
+    start = time.perf_counter()
+    for moves in games:
+        board = Board()
+        channel = channel_class(board)
+        for writer in writers:
+            channel.subscribe(writer)
+        for move in moves:
+            undo_info = board.make_move(move)
+            sent += len(channel.publish(board, move, undo_info[2]))
+            messages += spectators
+            plies += 1
+            # the spectators read what they got
+            await asyncio.sleep(0)
+    for writer in writers:
+        writer.close()
+    received = sum(await asyncio.gather(*readers))
+    elapsed = time.perf_counter() - start
+    for writer in spectator_writers:
+        writer.close()
+    return messages, sent, plies, received, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--spectators', type=int, default=500)
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--plies', type=int, default=80)
+    args = parser.parse_args()
+
+    games = random_games(args.games, args.plies)
+    print(f"{args.spectators} spectators, {args.games} games of {args.plies} plies")
+    for name, channel_class in (('full position', FullStateChannel), ('deltas', SpectatorChannel)):
+        messages, sent, plies, received, elapsed = asyncio.run(broadcast(channel_class, games, args.spectators))
+        print(f"{name:>13}: {messages / elapsed:9.0f} messages/s, {sent / plies:5.1f} bytes per move, "
+              f"{received / args.spectators / 1024:7.1f} KiB read per spectator in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Tablebase probes per second, and the time the engine needs to choose a move in endgame positions with and without
+the tablebases. The tables of the positions (KQvK, KRvK, KPvK) are generated in a temporary directory, unless one is
+given.
+
+    python benchmarks/tablebase.py --directory tablebases
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.BoardClass import Board
+from classes.EngineClass import Engine
+from classes.GameClass import Game
+from classes.TablebaseClass import DEFAULT_MATERIALS, Tablebases, generate_tablebases
+
+POSITIONS = {
+    'KQvK': '8/8/8/3k4/8/8/8/4K1Q1 w - - 0 1',
+    'KRvK': '8/8/8/4k3/8/8/8/R3K3 w - - 0 1',
+    'KPvK': '8/8/8/8/3k4/8/4P3/4K3 w - - 0 1',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--directory', help="a directory with the tables")
+    parser.add_argument('--probes', type=int, default=100000)
+    parser.add_argument('--engine-time', type=float, default=1.0, help="seconds of the search without tablebases")
+    args = parser.parse_args()
+
+    directory = args.directory
+    if directory is None:
+        directory = tempfile.mkdtemp()
+        start = time.perf_counter()
+        for _ in generate_tablebases(DEFAULT_MATERIALS, directory):
+            pass
+        print(f"generated {', '.join(DEFAULT_MATERIALS)} in {time.perf_counter() - start:.1f} s")
+
+    with Tablebases(directory) as tablebases:
+        boards = [Board.from_fen(fen) for fen in POSITIONS.values()]
+        start = time.perf_counter()
+        for i in range(args.probes):
+            tablebases.probe(boards[i % len(boards)])
+        elapsed = time.perf_counter() - start
+        print(f"probe {args.probes / elapsed:10.0f} positions/s")
+
+        for name, fen in POSITIONS.items():
+            line = f"{name:<5}"
+            for engine in (Engine(tablebases=tablebases), Engine()):
+                result = engine.best_move(Game.from_fen(fen), args.engine_time)
+                line += (f" {'tablebases' if result.tablebase else 'search':<10} {result.move} "
+                         f"{result.seconds * 1000:8.1f} ms score {result.score:7}")
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Positions per second of the NumPy encoding of boards (classes/TensorClass.py): from boards to tensors and back, and
+the batched features (material, attacked squares and mobility) against computing them board by board on the pieces.
+The batched features are checked against the board by board ones, and the run fails if they differ. It needs numpy.
+
+    python benchmarks/tensor.py --positions 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.BoardClass import Board, King, Node, Pawn
+from classes.EngineClass import PIECE_VALUES
+from classes.TensorClass import attack_maps, decode, decode_packed, encode_packed, material, mobility, pack_boards
+
+
+def random_positions(count, seed=0):
+    """
+    :param count: int
+    :param seed: int
+    :return: list of Board. Positions of random games, of every stage of the game.
+    """
+    chooser = random.Random(seed)
+    positions = []
+    board = Board()
+    while len(positions) < count:
+        legal_moves = board.legal_moves(board.turn)
+        if not legal_moves or len(board.history) >= 150:
+            board = Board()
+            continue
+        board.make_move(chooser.choice(legal_moves))
+        positions.append(Board.unpack(board.pack()))
+    return positions
+
+
+def board_features(board):
+    """
+    The features of mobility, attack_maps and material, computed on the pieces of one board.
+    :param board: Board
+    :return: tuple. (material per color, attacked squares per color, moves per color)
+    """
+    grid = board.grid
+    values, attacked, moves = [], [], []
+    for color in ('white', 'black'):
+        values.append(sum(PIECE_VALUES[type(grid[row][col])] for row, col in board.pieces_positions[color]))
+        attacked.append([[board.is_square_attacked((row, col), color) for col in range(8)] for row in range(8)])
+        count = 0
+        for row, col in board.pieces_positions[color]:
+            piece = grid[row][col]
+            for target in set(piece.valid_move(board)):
+                if type(piece) is King and abs(target[1] - col) == 2:
+                    continue
+                if type(piece) is Pawn and target[1] != col and type(grid[target[0]][target[1]]) is Node:
+                    continue
+                count += 1
+        moves.append(count)
+    return values, attacked, moves
+
+
+def rate(function, count, repeat=3):
+    """
+    :param function: callable without arguments
+    :param count: int. Positions done by a call.
+    :param repeat: int
+    :return: float. Positions per second of the fastest call.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--positions', type=int, default=20000)
+    parser.add_argument('--baseline', type=int, default=1000, help="positions of the board by board features")
+    args = parser.parse_args()
+
+    boards = random_positions(args.positions)
+    packed = pack_boards(boards)
+    tensor = encode_packed(packed)
+    count = len(boards)
+    print(f"{count} positions, tensor {tensor.shape} of {tensor.dtype}, {tensor.nbytes / count:.0f} bytes each")
+    rows = [
+        ('pack the boards', lambda: pack_boards(boards)),
+        ('encode', lambda: encode_packed(packed)),
+        ('decode to packed', lambda: decode_packed(tensor)),
+        ('decode to boards', lambda: decode(tensor)),
+        ('material', lambda: material(tensor)),
+        ('attack maps', lambda: attack_maps(tensor)),
+        ('mobility', lambda: mobility(tensor)),
+    ]
+    for name, function in rows:
+        print(f"{name:>18}: {rate(function, count):12.0f} positions/s")
+    baseline = boards[:args.baseline]
+    speed = rate(lambda: [board_features(board) for board in baseline], len(baseline), 1)
+    print(f"{'board by board':>18}: {speed:12.0f} positions/s (material, attacked squares and mobility)")
+
+    # the batched features must be the ones computed board by board
+    batch = tensor[:len(baseline)]
+    values, attacked, moves = material(batch), attack_maps(batch), mobility(batch)
+    mismatches = sum(1 for i, (board_values, board_attacked, board_moves) in enumerate(map(board_features, baseline))
+                     if values[i].tolist() != board_values or attacked[i].tolist() != board_attacked
+                     or moves[i].tolist() != board_moves)
+    status = 'ok' if not mismatches else f"FAIL ({mismatches} mismatches)"
+    print(f"{'features':>18}: {len(baseline)} positions checked against the board by board ones, {status}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Compiles the first moves of the games of PGN files into an opening book for the engine (see classes/BookClass.py).
+
+    python build_book.py games.pgn more_games.pgn --output book.bin --plies 16 --min-games 2
+"""
+import argparse
+import time
+
+from classes.BookClass import build_book
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='+', help="PGN files")
+    parser.add_argument('--output', default='book.bin')
+    parser.add_argument('--plies', type=int, default=20, help="moves of every game in the book")
+    parser.add_argument('--min-games', type=int, default=1, help="leave out the moves played in fewer games")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games, entries, errors = build_book(args.paths, args.output, args.plies, args.min_games)
+    print(f"{games} games ({errors} left out with errors), {entries} entries written to {args.output} "
+          f"in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import struct
+from collections import namedtuple
+
+import pygame
+
+PIECE_NAMES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+PIECE_COLORS = ('white', 'black')
+BOARD_FILE = 'board_alt.png'
+
+# A cache file is a header (magic, version, digest of the source files, size of the board and of a piece) and the
+# pixels of the atlas, 4 bytes (RGBA) each, row after row.
+CACHE_HEADER = struct.Struct('>4sH20sHHHH')
+CACHE_MAGIC = b'CATL'
+CACHE_VERSION = 1
+
+# surface is the whole atlas: the board on top and the pieces below it, a row per color. board and pieces are
+# subsurfaces of it, so blitting them is blitting a part of the atlas.
+Atlas = namedtuple('Atlas', ['surface', 'board', 'pieces'])
+
+
+class AssetSet:
+    """
+    The images of a directory of assets (board_alt.png and a color_piece.png file per piece), decoded at most once
+    and scaled at most once per size. The board and the pieces of a size go in one atlas converted to the format of
+    the display, so blitting them needs no conversion. Every atlas is written to a cache file, so the next launches
+    with the same sizes do not decode or scale the PNG files. A cache file is rebuilt when the source files change.
+    """
+
+    def __init__(self, directory, cache_directory=None):
+        """
+        :param directory: str. The directory of the assets.
+        :param cache_directory: str or None. Where the atlases are cached, None to never cache them.
+        """
+        self.directory = directory
+        self.cache_directory = cache_directory
+        # the decoded PNG files, only if an atlas was not in the cache
+        self.sources = None
+        # (board size, piece size): Atlas
+        self.atlases = {}
+
+    def files(self):
+        """
+        :return: list of str. The names of the source files.
+        """
+        return [BOARD_FILE] + [f"{color}_{name}.png" for color in PIECE_COLORS for name in PIECE_NAMES]
+
+    def digest(self):
+        """
+        :return: bytes. Changes when a source file is changed.
+        """
+        digest = hashlib.sha1()
+        for name in self.files():
+            info = os.stat(os.path.join(self.directory, name))
+            digest.update(f"{name}:{info.st_size}:{info.st_mtime_ns};".encode())
+        return digest.digest()
+
+    def cache_path(self, board_size, piece_size):
+        """
+        :param board_size: tuple of int
+        :param piece_size: tuple of int
+        :return: str
+        """
+        name = os.path.basename(os.path.normpath(self.directory))
+        return os.path.join(self.cache_directory,
+                            f"{name}_{board_size[0]}x{board_size[1]}_{piece_size[0]}x{piece_size[1]}.atlas")
+
+    def atlas(self, board_size, piece_size):
+        """
+        :param board_size: tuple. Width and height of the board in pixels.
+        :param piece_size: tuple. Width and height of a piece in pixels.
+        :return: Atlas
+        """
+        board_size = (int(board_size[0]), int(board_size[1]))
+        piece_size = (int(piece_size[0]), int(piece_size[1]))
+        key = board_size, piece_size
+        if key in self.atlases:
+            return self.atlases[key]
+
+        surface = self.read_cache(board_size, piece_size) if self.cache_directory is not None else None
+        if surface is None:
+            surface = self.build(board_size, piece_size)
+            if self.cache_directory is not None:
+                self.write_cache(surface, board_size, piece_size)
+        surface = surface.convert_alpha()
+
+        width, height = piece_size
+        pieces = {(name, color): surface.subsurface(pygame.Rect(i * width, board_size[1] + row * height, width, height))
+                  for row, color in enumerate(PIECE_COLORS) for i, name in enumerate(PIECE_NAMES)}
+        atlas = Atlas(surface, surface.subsurface(pygame.Rect((0, 0), board_size)), pieces)
+        self.atlases[key] = atlas
+        return atlas
+
+    def build(self, board_size, piece_size):
+        """
+        :param board_size: tuple of int
+        :param piece_size: tuple of int
+        :return: pygame.Surface. The atlas, with the scaled images.
+        """
+        if self.sources is None:
+            self.sources = {name: pygame.image.load(os.path.join(self.directory, name)).convert_alpha()
+                            for name in self.files()}
+        width, height = piece_size
+        surface = pygame.Surface((max(board_size[0], len(PIECE_NAMES) * width),
+                                  board_size[1] + len(PIECE_COLORS) * height), pygame.SRCALPHA)
+        # the atlas is transparent: the images are copied as they are (the maximum with 0), not blended over it
+        surface.blit(pygame.transform.scale(self.sources[BOARD_FILE], board_size), (0, 0),
+                     special_flags=pygame.BLEND_RGBA_MAX)
+        for row, color in enumerate(PIECE_COLORS):
+            for i, name in enumerate(PIECE_NAMES):
+                image = pygame.transform.scale(self.sources[f"{color}_{name}.png"], piece_size)
+                surface.blit(image, (i * width, board_size[1] + row * height), special_flags=pygame.BLEND_RGBA_MAX)
+        return surface
+
+    def read_cache(self, board_size, piece_size):
+        """
+        :param board_size: tuple of int
+        :param piece_size: tuple of int
+        :return: pygame.Surface or None if there is no cache file or it is not the one of these files and sizes.
+        """
+        try:
+            with open(self.cache_path(board_size, piece_size), 'rb') as file:
+                header = file.read(CACHE_HEADER.size)
+                pixels = file.read()
+        except OSError:
+            return None
+        if len(header) != CACHE_HEADER.size:
+            return None
+        magic, version, digest, *sizes = CACHE_HEADER.unpack(header)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION or sizes != [*board_size, *piece_size] \
+                or digest != self.digest():
+            return None
+        size = (max(board_size[0], len(PIECE_NAMES) * piece_size[0]),
+                board_size[1] + len(PIECE_COLORS) * piece_size[1])
+        if len(pixels) != size[0] * size[1] * 4:
+            return None
+        return pygame.image.frombytes(pixels, size, 'RGBA')
+
+    def write_cache(self, surface, board_size, piece_size):
+        """
+        The cache is only an optimization: if it can not be written, the atlas is built again next time.
+        :param surface: pygame.Surface. The atlas.
+        :param board_size: tuple of int
+        :param piece_size: tuple of int
+        :return: None
+        """
+        path = self.cache_path(board_size, piece_size)
+        try:
+            os.makedirs(self.cache_directory, exist_ok=True)
+            with open(path + '.tmp', 'wb') as file:
+                file.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, self.digest(), *board_size, *piece_size))
+                file.write(pygame.image.tobytes(surface, 'RGBA'))
+            os.replace(path + '.tmp', path)
+        except OSError:
+            pass
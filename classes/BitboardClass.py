@@ -0,0 +1,356 @@
+from .BoardClass import *
+
+# Every square of the board is a bit of a 64 bits integer: square = row * 8 + col. As in the rest of the game, the
+# row 0 is the top of the board (black side) and the row 7 the bottom (white side).
+
+COLOR_INDEX = {'white': 0, 'black': 1}
+PIECE_INDEX = {Pawn: 0, Knight: 1, Bishop: 2, Rook: 3, Queen: 4, King: 5}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PROMOTIONS = (ROOK, BISHOP, QUEEN, KNIGHT)
+PROMOTION_NAMES = {ROOK: 'Rook', BISHOP: 'Bishop', QUEEN: 'Queen', KNIGHT: 'Knight'}
+
+FULL = (1 << 64) - 1
+ROW_2 = 0xFF << 16
+ROW_5 = 0xFF << 40
+
+ALL_CASTLING = WHITE_SHORT | WHITE_LONG | BLACK_SHORT | BLACK_LONG
+
+# the castling rights that survive a move from or to a square (the king or a rook moves, or a rook is captured)
+CASTLING_KEEP = [ALL_CASTLING] * 64
+CASTLING_KEEP[60] = ALL_CASTLING & ~(WHITE_SHORT | WHITE_LONG)
+CASTLING_KEEP[63] = ALL_CASTLING & ~WHITE_SHORT
+CASTLING_KEEP[56] = ALL_CASTLING & ~WHITE_LONG
+CASTLING_KEEP[4] = ALL_CASTLING & ~(BLACK_SHORT | BLACK_LONG)
+CASTLING_KEEP[7] = ALL_CASTLING & ~BLACK_SHORT
+CASTLING_KEEP[0] = ALL_CASTLING & ~BLACK_LONG
+
+# flag, king from, king to, rook from, rook to, squares that must be empty, squares that can not be attacked
+CASTLES = ((WHITE_SHORT, 60, 62, 63, 61, (61, 62), (60, 61, 62)),
+           (WHITE_LONG, 60, 58, 56, 59, (57, 58, 59), (60, 59, 58)),
+           (BLACK_SHORT, 4, 6, 7, 5, (5, 6), (4, 5, 6)),
+           (BLACK_LONG, 4, 2, 0, 3, (1, 2, 3), (4, 3, 2)))
+
+
+def _jump_table(offsets):
+    """
+    :param offsets: tuple of (row, col) steps
+    :return: list. For every square, the mask of the squares reached with one of the steps.
+    """
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        for dr, dc in offsets:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                mask |= 1 << (r * 8 + c)
+        table.append(mask)
+    return table
+
+
+def _ray_table(dr, dc):
+    """
+    :param dr: int
+    :param dc: int
+    :return: list. For every square, the mask of the squares in the direction (dr, dc) up to the edge of the board.
+    """
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        r, c = row + dr, col + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            mask |= 1 << (r * 8 + c)
+            r, c = r + dr, c + dc
+        table.append(mask)
+    return table
+
+
+def _rays(directions):
+    # the rays growing the square index find their nearest blocker in the lowest bit, the others in the highest one
+    return tuple((_ray_table(dr, dc), dr * 8 + dc > 0) for dr, dc in directions)
+
+
+KNIGHT_ATTACKS = _jump_table(((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)))
+KING_ATTACKS = _jump_table(((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)))
+# squares attacked by a white pawn (it moves up) and by a black pawn (it moves down)
+PAWN_ATTACKS = (_jump_table(((-1, -1), (-1, 1))), _jump_table(((1, -1), (1, 1))))
+
+ROOK_RAYS = _rays(((1, 0), (0, 1), (-1, 0), (0, -1)))
+BISHOP_RAYS = _rays(((1, 1), (1, -1), (-1, 1), (-1, -1)))
+
+
+def slider_attacks(sq, occupied, rays):
+    """
+    The squares a slider sees from a square: every ray stops at the first occupied square (included).
+    :param sq: int
+    :param occupied: int
+    :param rays: ROOK_RAYS or BISHOP_RAYS
+    :return: int
+    """
+    attacks = 0
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            blocker = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def is_attacked(sq, by, bitboards, occupied):
+    """
+    :param sq: int
+    :param by: int. Index of the attacking color.
+    :param bitboards: list of 12 ints
+    :param occupied: int
+    :return: bool
+    """
+    base = by * 6
+    if KNIGHT_ATTACKS[sq] & bitboards[base + KNIGHT] or KING_ATTACKS[sq] & bitboards[base + KING]:
+        return True
+    # a pawn attacks the square if a pawn of the other color standing on the square would attack the pawn
+    if PAWN_ATTACKS[1 - by][sq] & bitboards[base + PAWN]:
+        return True
+    queens = bitboards[base + QUEEN]
+    straight = bitboards[base + ROOK] | queens
+    if straight and slider_attacks(sq, occupied, ROOK_RAYS) & straight:
+        return True
+    diagonal = bitboards[base + BISHOP] | queens
+    if diagonal and slider_attacks(sq, occupied, BISHOP_RAYS) & diagonal:
+        return True
+    return False
+
+
+def _play(bitboards, base, moving, frm, to, promotion, enemy):
+    """
+    :return: list of 12 ints. The bitboards after moving a piece (and capturing whatever is on the new square).
+    """
+    child = bitboards[:]
+    to_bit = 1 << to
+    child[base + moving] ^= 1 << frm
+    child[base + (moving if promotion is None else promotion)] |= to_bit
+    if enemy & to_bit:
+        enemy_base = 6 - base
+        for index in range(enemy_base, enemy_base + 5):
+            if child[index] & to_bit:
+                child[index] ^= to_bit
+                break
+    return child
+
+
+def legal_children(bitboards, us, castling, en_passant=None):
+    """
+    All the legal moves of a position together with the positions they lead to. Every pseudo legal move is played
+    on a copy of the bitboards, and it is kept if the king is not attacked afterwards.
+    :param bitboards: list of 12 ints
+    :param us: int. Index of the color to move.
+    :param castling: int. Castling rights.
+    :param en_passant: int or None. The square a pawn can capture en passant.
+    :return: list of (from, to, promotion, bitboards, castling, en_passant)
+    """
+    them = 1 - us
+    base = us * 6
+    own = (bitboards[base] | bitboards[base + 1] | bitboards[base + 2]
+           | bitboards[base + 3] | bitboards[base + 4] | bitboards[base + 5])
+    enemy_base = them * 6
+    enemy = (bitboards[enemy_base] | bitboards[enemy_base + 1] | bitboards[enemy_base + 2]
+             | bitboards[enemy_base + 3] | bitboards[enemy_base + 4] | bitboards[enemy_base + 5])
+    occupied = own | enemy
+    empty = ~occupied & FULL
+    not_own = ~own & FULL
+    king_bit = bitboards[base + KING]
+    king = king_bit.bit_length() - 1
+
+    candidates = []
+
+    pawns = bitboards[base + PAWN]
+    if us == 0:
+        single = (pawns >> 8) & empty
+        double = ((single & ROW_5) >> 8) & empty
+        step = 8
+    else:
+        single = (pawns << 8) & empty
+        double = ((single & ROW_2) << 8) & empty
+        step = -8
+    while single:
+        bit = single & -single
+        single ^= bit
+        to = bit.bit_length() - 1
+        candidates.append((PAWN, to + step, to))
+    while double:
+        bit = double & -double
+        double ^= bit
+        to = bit.bit_length() - 1
+        candidates.append((PAWN, to + 2 * step, to))
+    pawn_attacks = PAWN_ATTACKS[us]
+    while pawns:
+        bit = pawns & -pawns
+        pawns ^= bit
+        frm = bit.bit_length() - 1
+        targets = pawn_attacks[frm] & enemy
+        while targets:
+            target = targets & -targets
+            targets ^= target
+            candidates.append((PAWN, frm, target.bit_length() - 1))
+    if en_passant is not None:
+        # our pawns attacking the square are the ones a pawn of the other color on the square would attack
+        attackers = PAWN_ATTACKS[them][en_passant] & bitboards[base + PAWN]
+        while attackers:
+            bit = attackers & -attackers
+            attackers ^= bit
+            candidates.append((PAWN, bit.bit_length() - 1, en_passant))
+
+    for moving, table in ((KNIGHT, KNIGHT_ATTACKS), (KING, KING_ATTACKS)):
+        pieces = bitboards[base + moving]
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            frm = bit.bit_length() - 1
+            targets = table[frm] & not_own
+            while targets:
+                target = targets & -targets
+                targets ^= target
+                candidates.append((moving, frm, target.bit_length() - 1))
+
+    for moving, rays in ((BISHOP, (BISHOP_RAYS,)), (ROOK, (ROOK_RAYS,)), (QUEEN, (BISHOP_RAYS, ROOK_RAYS))):
+        pieces = bitboards[base + moving]
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            frm = bit.bit_length() - 1
+            targets = 0
+            for ray in rays:
+                targets |= slider_attacks(frm, occupied, ray)
+            targets &= not_own
+            while targets:
+                target = targets & -targets
+                targets ^= target
+                candidates.append((moving, frm, target.bit_length() - 1))
+
+    children = []
+    for moving, frm, to in candidates:
+        to_bit = 1 << to
+        after = (occupied ^ (1 << frm)) | to_bit
+        child_castling = castling & CASTLING_KEEP[frm] & CASTLING_KEEP[to]
+        if moving == PAWN and to == en_passant:
+            # the captured pawn is behind the square, and both pawns leave the row of the king at once
+            captured = to + step
+            child = _play(bitboards, base, PAWN, frm, to, None, 0)
+            child[enemy_base + PAWN] ^= 1 << captured
+            if not is_attacked(king, them, child, after ^ (1 << captured)):
+                children.append((frm, to, None, child, child_castling, None))
+            continue
+        if moving == PAWN and (to < 8 or to >= 56):
+            child = _play(bitboards, base, PAWN, frm, to, None, enemy)
+            if is_attacked(king, them, child, after):
+                continue
+            for promotion in PROMOTIONS:
+                promoted = child[:]
+                promoted[base + PAWN] ^= to_bit
+                promoted[base + promotion] |= to_bit
+                children.append((frm, to, promotion, promoted, child_castling, None))
+            continue
+        child = _play(bitboards, base, moving, frm, to, None, enemy)
+        if not is_attacked(to if moving == KING else king, them, child, after):
+            child_en_passant = None
+            if moving == PAWN and abs(to - frm) == 16:
+                # as in Board, only if a pawn of the other color can capture it (it stands next to the new square)
+                middle = (frm + to) >> 1
+                if PAWN_ATTACKS[us][middle] & bitboards[enemy_base + PAWN]:
+                    child_en_passant = middle
+            children.append((frm, to, None, child, child_castling, child_en_passant))
+
+    if castling:
+        for flag, king_from, king_to, rook_from, rook_to, between, safe in CASTLES:
+            if not castling & flag or king_from != king:
+                continue
+            if any(occupied >> sq & 1 for sq in between):
+                continue
+            if any(is_attacked(sq, them, bitboards, occupied) for sq in safe):
+                continue
+            child = bitboards[:]
+            child[base + KING] ^= (1 << king_from) | (1 << king_to)
+            child[base + ROOK] ^= (1 << rook_from) | (1 << rook_to)
+            children.append((king_from, king_to, None, child, castling & CASTLING_KEEP[king_from], None))
+
+    return children
+
+
+def perft(bitboards, us, castling, en_passant, depth):
+    """
+    :param bitboards: list of 12 ints
+    :param us: int
+    :param castling: int
+    :param en_passant: int or None
+    :param depth: int
+    :return: int
+    """
+    if depth == 0:
+        return 1
+    children = legal_children(bitboards, us, castling, en_passant)
+    if depth == 1:
+        return len(children)
+    them = 1 - us
+    nodes = 0
+    for _, _, _, child, child_castling, child_en_passant in children:
+        nodes += perft(child, them, child_castling, child_en_passant, depth - 1)
+    return nodes
+
+
+class BitBoard(Board):
+
+    __slots__ = ('bitboards', 'occupancy', 'square_codes')
+
+    def __init__(self, fen=None, _bare=False):
+        """
+        The same board as Board (the grid of pieces is still there, so Game and the drawing work the same way)
+        plus one integer per type of piece and color, and the occupancy of every color. The integers are updated
+        in set_square, so they are always in sync with the grid.
+        """
+        self.bitboards = [0] * 12
+        self.occupancy = [0, 0]
+        self.square_codes = [None] * 64
+        super().__init__(fen, _bare)
+
+    def set_square(self, row, col, thing):
+        sq = row * 8 + col
+        bit = 1 << sq
+        old_code = self.square_codes[sq]
+        if old_code is not None:
+            self.bitboards[old_code] ^= bit
+            self.occupancy[old_code // 6] ^= bit
+            self.square_codes[sq] = None
+
+        if type(thing) is not Node and thing.row == row and thing.col == col:
+            color_index = COLOR_INDEX[thing.color]
+            code = color_index * 6 + PIECE_INDEX[type(thing)]
+            self.bitboards[code] |= bit
+            self.occupancy[color_index] |= bit
+            self.square_codes[sq] = code
+
+        super().set_square(row, col, thing)
+
+    def is_square_attacked(self, square, by_color):
+        row, col = square
+        return is_attacked(row * 8 + col, COLOR_INDEX[by_color], self.bitboards, self.occupancy[0] | self.occupancy[1])
+
+    def en_passant_square(self):
+        """
+        :return: int or None. The en passant square of the board as a bit index.
+        """
+        if self.en_passant is None:
+            return None
+        row, col = self.en_passant
+        return row * 8 + col
+
+    def legal_moves(self, color):
+        moves = []
+        children = legal_children(self.bitboards, COLOR_INDEX[color], self.castling_rights(), self.en_passant_square())
+        for frm, to, promotion, _, _, _ in children:
+            moves.append(Move(SQUARES[frm >> 3][frm & 7], SQUARES[to >> 3][to & 7], PROMOTION_NAMES.get(promotion)))
+        return moves
+
+    def perft(self, color, depth):
+        return perft(self.bitboards, COLOR_INDEX[color], self.castling_rights(), self.en_passant_square(), depth)
@@ -1,23 +1,100 @@
+import random
+from collections import namedtuple
+
 from .PiecesClasses import *
 
+FILES = 'abcdefgh'
 
-class Node:
 
-    def __init__(self, row, col):
-        """
-        :param row: int
-        :param col: int
+def square_name(position):
+    """
+    :param position: tuple. (row, col)
+    :return: str. The name of the square in algebraic notation: (7, 4) is 'e1'.
+    """
+    row, col = position
+    return FILES[col] + str(8 - row)
+
+
+def parse_square(name):
+    """
+    :param name: str. A square in algebraic notation, as 'e4'.
+    :return: tuple. (row, col)
+    """
+    if len(name) != 2 or name[0] not in FILES or name[1] not in '12345678':
+        raise ValueError(f"invalid square: {name!r}")
+    return SQUARES[8 - int(name[1])][FILES.index(name[0])]
+
+
+PROMOTION_LETTERS = {'Rook': 'r', 'Bishop': 'b', 'Queen': 'q', 'Knight': 'n'}
+PROMOTION_NAMES = {letter: name for name, letter in PROMOTION_LETTERS.items()}
+
+
+class Move(namedtuple('Move', ['old_position', 'new_position', 'promotion'], defaults=[None])):
+    """
+    A move of the board. promotion is the name of the new piece ('Rook', 'Bishop', 'Queen' or 'Knight') or None.
+    It is written in coordinate notation: the old square, the new square and the letter of the promotion, as
+    'e2e4' or 'e7e8q'.
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        text = square_name(self.old_position) + square_name(self.new_position)
+        if self.promotion is not None:
+            text += PROMOTION_LETTERS[self.promotion]
+        return text
 
-        width and height are calculated in the main file. It corresponds to SQUARE_WIDTH and SQUARE_HEIGHT
+    @classmethod
+    def parse(cls, text):
         """
-        self.row = row
-        self.col = col
+        :param text: str. A move in coordinate notation, as 'e2e4' or 'e7e8q'.
+        :return: Move. It is not checked against any position.
+        """
+        if len(text) not in (4, 5) or (len(text) == 5 and text[4] not in PROMOTION_NAMES):
+            raise ValueError(f"invalid move: {text!r}")
+        return cls(parse_square(text[:2]), parse_square(text[2:4]), PROMOTION_NAMES.get(text[4:]))
+
+
+# letters of the pieces in the FEN notation, the white ones in upper case
+FEN_PIECES = {'p': Pawn, 'n': Knight, 'b': Bishop, 'r': Rook, 'q': Queen, 'k': King}
+FEN_LETTERS = {type_of_piece: letter for letter, type_of_piece in FEN_PIECES.items()}
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# packed position (see Board.pack): 4 bits per square (0 is empty, 1 to 6 the white pieces and 7 to 12 the black
+# ones), then the castling rights and the turn, and then the en passant square (64 if there is none)
+PACKED_PIECES = (Pawn, Knight, Bishop, Rook, Queen, King)
+PACKED_CODES = {type_of_piece: code for code, type_of_piece in enumerate(PACKED_PIECES, 1)}
+PACKED_SIZE = 34
+
+# castling rights: white short, white long, black short, black long
+WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG = 1, 2, 4, 8
+# squares of the kings and the rooks that can castle: a move from or to them can change the castling rights
+CASTLE_SQUARES = {(7, 4), (7, 7), (7, 0), (0, 4), (0, 7), (0, 0)}
+
+# Zobrist keys: one random 64 bits number per piece, color and square, one for the black turn, one per
+# combination of castling rights and one per column of the en passant square. The seed is fixed so the keys are
+# the same in every process.
+_zobrist_random = random.Random(20230111)
+ZOBRIST_PIECES = {(type_of_piece, color): [[_zobrist_random.getrandbits(64) for _ in range(8)] for _ in range(8)]
+                  for type_of_piece in (Pawn, Knight, Bishop, Rook, Queen, King) for color in ('white', 'black')}
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]
+
+
+class Node:
+    """
+    A node is an empty square of the board. It has no state, so every empty square of every board is the same
+    node: EMPTY.
+    """
+
+    __slots__ = ()
 
     def __str__(self):
-        return f"Node({self.row}, {self.col})"
+        return "Node"
+
 
-    def draw(self, window):
-        pass
+EMPTY = Node()
 
 
 class Board:
@@ -40,9 +117,39 @@ class Board:
 
     color = {6: "white", 7: "white", 0: "black", 1: "black"}
 
-    def __init__(self):
+    __slots__ = ('grid', 'history', 'occupied_positions', 'pieces_positions', 'kings_positions', 'turn',
+                 'en_passant', 'halfmove_clock', 'fullmove_number', 'zobrist_key')
+
+    def __init__(self, fen=None, _bare=False):
+        """
+        :param fen: str. The position to set up (see from_fen), by default the start position.
+        :param _bare: bool. A board without pieces, to be filled with set_square (only for unpack).
+        """
+        self.grid = [[EMPTY] * self.COLS for _ in range(self.ROWS)]
+        self.history = []
+        self.turn = 'white'
+
+        # the square a pawn jumped over in the last move, if a pawn of the color to play can capture it en passant
+        self.en_passant = None
+        # plies since the last capture or pawn move, and the number of the move (it grows after the black move)
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+
+        # the zobrist key identifies the position (pieces, turn, castling rights and en passant square) with one
+        # integer. It is updated in set_square and make_move, so it never needs to be computed from scratch.
+        self.zobrist_key = 0
+
+        # these are kept up to date by set_square, so asking for them does not need to scan the grid
+        self.occupied_positions = set()
+        self.pieces_positions = {'white': set(), 'black': set()}
+        self.kings_positions = {'white': None, 'black': None}
 
-        self.grid = [[Node(j, i) for i in range(self.COLS)] for j in range(self.ROWS)]
+        if _bare:
+            self.zobrist_key ^= ZOBRIST_CASTLING[self.castling_rights()]
+            return
+        if fen is not None:
+            self.load_fen(fen)
+            return
 
         for j in (0, 1, 6, 7):
             for i in range(self.COLS):
@@ -52,14 +159,204 @@ class Board:
                     k = j + 7
                 else:
                     k = j
-                self.grid[j][i] = self.type_of_initial_pieces[(k, i)](self.color[j], j, i)
+                self.set_square(j, i, self.type_of_initial_pieces[(k, i)](self.color[j], j, i))
 
-        self.occupied_positions = set()
-        for row in self.grid:
-            for piece in row:
-                r, c = piece.row, piece.col
-                if not self.check_node((r, c)):
-                    self.occupied_positions.add((r, c))
+        self.zobrist_key ^= ZOBRIST_CASTLING[self.castling_rights()]
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        :param fen: str. A position in the FEN notation, as START_FEN.
+        :return: Board
+        """
+        return cls(fen)
+
+    def load_fen(self, fen):
+        """
+        Sets up an empty board with the position of a FEN string: the pieces, the color to play, the castling
+        rights, the en passant square and the move counters (0 and 1 if they are missing). The pawns on their
+        initial row can move two squares, and the castle flags of the kings and the rooks follow the castling
+        rights.
+        :param fen: str
+        :return: None
+        """
+        fields = fen.split()
+        if not 4 <= len(fields) <= 6:
+            raise ValueError(f"invalid FEN, it needs 4 to 6 fields: {fen!r}")
+        placement, turn, castling, en_passant = fields[:4]
+        try:
+            self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            self.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError(f"invalid FEN move counters: {fen!r}") from None
+        if self.halfmove_clock < 0 or self.fullmove_number < 1:
+            raise ValueError(f"invalid FEN move counters: {fen!r}")
+
+        rows = placement.split('/')
+        if len(rows) != self.ROWS:
+            raise ValueError(f"invalid FEN, it needs 8 rows: {fen!r}")
+        kings = {'white': 0, 'black': 0}
+        for row, line in enumerate(rows):
+            col = 0
+            for char in line:
+                if char.isdigit():
+                    col += int(char)
+                    continue
+                if char.lower() not in FEN_PIECES or col >= self.COLS:
+                    raise ValueError(f"invalid FEN row {line!r}: {fen!r}")
+                color = 'white' if char.isupper() else 'black'
+                piece = FEN_PIECES[char.lower()](color, row, col)
+                if type(piece) is Pawn:
+                    piece.first_move = row == (6 if color == 'white' else 1)
+                elif type(piece) in (King, Rook):
+                    piece.castle = True
+                    kings[color] += type(piece) is King
+                self.set_square(row, col, piece)
+                col += 1
+            if col != self.COLS:
+                raise ValueError(f"invalid FEN row {line!r}: {fen!r}")
+        # the moves of a side are found from its king, so there must be one
+        if kings['white'] != 1 or kings['black'] != 1:
+            raise ValueError(f"invalid FEN, it needs one king of each color: {fen!r}")
+
+        if turn not in ('w', 'b'):
+            raise ValueError(f"invalid FEN color to play {turn!r}: {fen!r}")
+        self.turn = 'white' if turn == 'w' else 'black'
+
+        if castling != '-':
+            for char in castling:
+                if char not in 'KQkq':
+                    raise ValueError(f"invalid FEN castling rights {castling!r}: {fen!r}")
+                row = 7 if char.isupper() else 0
+                king, rook = self.grid[row][4], self.grid[row][7 if char.lower() == 'k' else 0]
+                if type(king) is King and type(rook) is Rook and king.color == rook.color:
+                    king.castle = rook.castle = False
+
+        if en_passant != '-':
+            row, col = parse_square(en_passant)
+            # the pawn that jumped over the square is in front of it
+            pawn_row = row + 1 if self.turn == 'white' else row - 1
+            if row == (2 if self.turn == 'white' else 5) and self.can_capture_en_passant(pawn_row, col):
+                self.en_passant = SQUARES[row][col]
+
+        # set_square has already added the keys of the pieces
+        self.zobrist_key ^= ZOBRIST_CASTLING[self.castling_rights()]
+        if self.turn == 'black':
+            self.zobrist_key ^= ZOBRIST_BLACK_TO_MOVE
+        if self.en_passant is not None:
+            self.zobrist_key ^= ZOBRIST_EN_PASSANT[self.en_passant[1]]
+
+    def to_fen(self):
+        """
+        The position in the FEN notation. The en passant square is only written if a pawn can capture there.
+        :return: str
+        """
+        rows = []
+        for line in self.grid:
+            text = ''
+            empty = 0
+            for piece in line:
+                if piece is EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                letter = FEN_LETTERS[type(piece)]
+                text += letter.upper() if piece.color == 'white' else letter
+            if empty:
+                text += str(empty)
+            rows.append(text)
+
+        rights = self.castling_rights()
+        castling = ''.join(letter for flag, letter in ((WHITE_SHORT, 'K'), (WHITE_LONG, 'Q'), (BLACK_SHORT, 'k'),
+                                                       (BLACK_LONG, 'q')) if rights & flag) or '-'
+        en_passant = square_name(self.en_passant) if self.en_passant is not None else '-'
+        return (f"{'/'.join(rows)} {'w' if self.turn == 'white' else 'b'} {castling} {en_passant} "
+                f"{self.halfmove_clock} {self.fullmove_number}")
+
+    def can_capture_en_passant(self, row, col):
+        """
+        :param row: int
+        :param col: int. The square of a pawn that has just moved two squares.
+        :return: bool. If a pawn of the other color stands next to it.
+        """
+        pawn = self.grid[row][col]
+        if type(pawn) is not Pawn:
+            return False
+        for c in (col - 1, col + 1):
+            if 0 <= c < self.COLS:
+                piece = self.grid[row][c]
+                if type(piece) is Pawn and piece.color != pawn.color:
+                    return True
+        return False
+
+    def pack(self):
+        """
+        The position in 34 bytes, cheap to send to another process. The history of the moves is not packed.
+        :return: bytes
+        """
+        data = bytearray(PACKED_SIZE)
+        grid = self.grid
+        for (row, col) in self.occupied_positions:
+            piece = grid[row][col]
+            sq = row * 8 + col
+            code = PACKED_CODES[type(piece)] + (6 if piece.color == 'black' else 0)
+            data[sq >> 1] |= code << (4 * (sq & 1))
+        data[32] = self.castling_rights() | (16 if self.turn == 'black' else 0)
+        data[33] = 64 if self.en_passant is None else self.en_passant[0] * 8 + self.en_passant[1]
+        return bytes(data)
+
+    @classmethod
+    def unpack(cls, data):
+        """
+        :param data: bytes. A position packed with pack.
+        :return: Board. As in from_fen, the flags of the pawns and of the castle come from the position. A position
+                 that no board can have (castling rights without the king and the rook on their squares, an en
+                 passant square without a pawn to capture) raises ValueError.
+        """
+        if len(data) != PACKED_SIZE:
+            raise ValueError(f"a packed position has {PACKED_SIZE} bytes, not {len(data)}")
+        board = cls(_bare=True)
+        kings = {'white': 0, 'black': 0}
+        for sq in range(64):
+            code = (data[sq >> 1] >> (4 * (sq & 1))) & 15
+            if not code:
+                continue
+            row, col = sq >> 3, sq & 7
+            color = 'white' if code <= 6 else 'black'
+            piece = PACKED_PIECES[(code - 1) % 6](color, row, col)
+            if type(piece) is Pawn:
+                piece.first_move = row == (6 if color == 'white' else 1)
+            elif type(piece) in (King, Rook):
+                piece.castle = True
+                kings[color] += type(piece) is King
+            board.set_square(row, col, piece)
+        if kings['white'] != 1 or kings['black'] != 1:
+            raise ValueError("a packed position needs one king of each color")
+
+        rights = data[32] & 15
+        for flag, row, rook_col in ((WHITE_SHORT, 7, 7), (WHITE_LONG, 7, 0), (BLACK_SHORT, 0, 7), (BLACK_LONG, 0, 0)):
+            if rights & flag:
+                king, rook = board.grid[row][4], board.grid[row][rook_col]
+                if (type(king) is not King or type(rook) is not Rook
+                        or king.color != board.color[row] or rook.color != board.color[row]):
+                    raise ValueError("a packed position has a castling right without its king and rook")
+                king.castle = rook.castle = False
+        board.turn = 'black' if data[32] & 16 else 'white'
+        if data[33] > 64:
+            raise ValueError(f"invalid packed en passant square: {data[33]}")
+        if data[33] < 64:
+            row, col = data[33] >> 3, data[33] & 7
+            # the pawn that jumped over the square is in front of it, as in load_fen, and is of the other color
+            pawn_row = row + 1 if board.turn == 'white' else row - 1
+            pawn = board.grid[pawn_row][col]
+            if (row != (2 if board.turn == 'white' else 5) or board.grid[row][col] is not EMPTY
+                    or not board.can_capture_en_passant(pawn_row, col) or pawn.color == board.turn):
+                raise ValueError("a packed position has an en passant square without a pawn to capture")
+            board.en_passant = SQUARES[row][col]
+        board.zobrist_key = board.compute_zobrist_key()
+        return board
 
     def __repr__(self):
         output = [[] for _ in range(self.ROWS)]
@@ -91,106 +388,421 @@ class Board:
         :return: bool
         """
         row, col = position
-        thing = self.get_piece(row, col)
-        if type(thing) is Node:
-            return True
-        return False
+        return self.grid[row][col] is EMPTY
 
-    def check_move(self, position_to_move, old_position, check_comprobation=False, castle=False):
+    def set_square(self, row, col, thing):
         """
-        This method will change the necessary information in order to update the visual board, making possible
-        to move the pieces
-        :param position_to_move: tuple
-        :param old_position: tuple
-        :param check_comprobation: bool
-        :param castle: bool
+        Every change of the grid goes through this method, so the different backends of the board (see
+        BitboardClass.py) can keep their own representation of the position up to date.
+
+        A piece only occupies the square it has in its row and col, so the row and col of a moving piece must be
+        updated before placing it.
+        :param row: int
+        :param col: int
+        :param thing: Piece or Node
         :return: None
         """
-
-        if castle:
-            new_row, new_col = position_to_move
-            king_row, king_col = old_position
-            rook_row, rook_col = new_row, 5 if new_col == 6 else 3
-            rook = self.get_piece(new_row, 0) if new_col == 2 else self.get_piece(new_row, 7)
-            king = self.get_piece(king_row, king_col)
-
-            self.grid[rook.row][rook.col] = Node(rook.row, rook.col)
-            self.grid[new_row][new_col] = king
-            self.grid[king_row][king_col] = Node(king_row, king_col)
-
-            rook.row, rook.col = rook_row, rook_col
-            king.row, king.col = new_row, new_col
-
-            self.grid[rook_row][rook_col] = rook
-            self.grid[new_row][new_col].recalculate_distance(position_to_move)
-            self.grid[rook_row][rook_col].recalculate_distance((rook_row, rook_col))
-
-            self.occupations()
-
+        # the positions are shared by all the boards, so the sets do not create new tuples
+        position = SQUARES[row][col]
+        if position in self.occupied_positions:
+            old_thing = self.grid[row][col]
+            self.zobrist_key ^= ZOBRIST_PIECES[(type(old_thing), old_thing.color)][row][col]
+            self.occupied_positions.discard(position)
+            self.pieces_positions['white'].discard(position)
+            self.pieces_positions['black'].discard(position)
+
+        if type(thing) is not Node and thing.row == row and thing.col == col:
+            self.zobrist_key ^= ZOBRIST_PIECES[(type(thing), thing.color)][row][col]
+            self.occupied_positions.add(position)
+            self.pieces_positions[thing.color].add(position)
+            if type(thing) is King:
+                self.kings_positions[thing.color] = position
+
+        self.grid[row][col] = thing
+
+    def make_move(self, move):
+        """
+        Plays a move on the board: the piece moves (and promotes if the move says so), the captured piece leaves
+        the board (a pawn captured en passant too), the rook moves too if the king castles, and the pawns and the
+        castle flags are updated. The information needed to take the move back is returned and pushed to the
+        history.
+        :param move: Move
+        :return: tuple. (move, piece, captured, first_move, castle, rook, en_passant, halfmove_clock, zobrist_key)
+        """
+        old_position, new_position, promotion = move
+        (old_row, old_col), (new_row, new_col) = old_position, new_position
+        piece = self.grid[old_row][old_col]
+        captured = self.grid[new_row][new_col]
+        zobrist_key = self.zobrist_key
+        en_passant = self.en_passant
+        halfmove_clock = self.halfmove_clock
+
+        if en_passant is not None:
+            self.zobrist_key ^= ZOBRIST_EN_PASSANT[en_passant[1]]
+            self.en_passant = None
+            # the captured pawn is next to the moving one, behind the square it moves to
+            if new_position == en_passant and type(piece) is Pawn:
+                captured = self.grid[old_row][new_col]
+                self.set_square(old_row, new_col, EMPTY)
+
+        castle_squares = old_position in CASTLE_SQUARES or new_position in CASTLE_SQUARES
+        if castle_squares:
+            self.zobrist_key ^= ZOBRIST_CASTLING[self.castling_rights()]
+
+        first_move = getattr(piece, 'first_move', None)
+        castle = getattr(piece, 'castle', None)
+        rook = None
+
+        if type(piece) is King and abs(new_col - old_col) == 2:
+            rook_col, rook_new_col = (7, 5) if new_col == 6 else (0, 3)
+            moved_rook = self.grid[old_row][rook_col]
+            rook = (moved_rook, rook_col, moved_rook.castle)
+            moved_rook.col = rook_new_col
+            moved_rook.castle = True
+            self.set_square(old_row, rook_col, EMPTY)
+            self.set_square(old_row, rook_new_col, moved_rook)
+
+        piece.row, piece.col = new_row, new_col
+        if first_move:
+            piece.first_move = False
+        if castle is not None:
+            piece.castle = True
+
+        self.set_square(old_row, old_col, EMPTY)
+        if promotion is None:
+            self.set_square(new_row, new_col, piece)
         else:
-            new_row, new_col = position_to_move
-            old_row, old_col = old_position
-
-            original = self.get_piece(new_row, new_col)
+            self.set_square(new_row, new_col, self.type_pieces[promotion](piece.color, new_row, new_col))
 
-            old_thing = self.get_piece(old_row, old_col)
-            new_thing = old_thing
+        if first_move and abs(new_row - old_row) == 2 and self.can_capture_en_passant(new_row, new_col):
+            self.en_passant = SQUARES[(old_row + new_row) // 2][new_col]
+            self.zobrist_key ^= ZOBRIST_EN_PASSANT[new_col]
 
-            if type(old_thing) is Pawn and not check_comprobation:
-                if old_thing.first_move:
-                    new_thing.first_move = False
+        if castle_squares:
+            self.zobrist_key ^= ZOBRIST_CASTLING[self.castling_rights()]
+        self.zobrist_key ^= ZOBRIST_BLACK_TO_MOVE
+        self.turn = 'black' if self.turn == 'white' else 'white'
 
-            new_thing.row, new_thing.col = new_row, new_col
-            old_thing = Node(old_row, old_col) if not check_comprobation else original
+        if first_move is not None or captured is not EMPTY:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if self.turn == 'white':
+            self.fullmove_number += 1
 
-            self.grid[new_row][new_col] = new_thing
-            self.grid[old_row][old_col] = old_thing
+        undo_info = (move, piece, captured, first_move, castle, rook, en_passant, halfmove_clock, zobrist_key)
+        self.history.append(undo_info)
+        return undo_info
 
-            self.grid[new_row][new_col].recalculate_distance(position_to_move)
-            self.occupations()
+    def unmake_move(self, undo_info=None):
+        """
+        Takes back the last move of the history, leaving the board exactly as it was before the move.
+        :param undo_info: tuple. The one returned by make_move, by default the last one of the history.
+        :return: None
+        """
+        if undo_info is None:
+            undo_info = self.history[-1]
+        self.history.pop()
+
+        move, piece, captured, first_move, castle, rook, en_passant, halfmove_clock, zobrist_key = undo_info
+        (old_row, old_col), (new_row, new_col) = move.old_position, move.new_position
+
+        # the captured piece never changed its row and col: it is not on the new square if it was captured en
+        # passant
+        self.set_square(new_row, new_col, EMPTY)
+        if captured is not EMPTY:
+            self.set_square(captured.row, captured.col, captured)
+        piece.row, piece.col = old_row, old_col
+        self.set_square(old_row, old_col, piece)
+        if first_move is not None:
+            piece.first_move = first_move
+        if castle is not None:
+            piece.castle = castle
+
+        if rook is not None:
+            moved_rook, rook_col, rook_castle = rook
+            self.set_square(old_row, moved_rook.col, EMPTY)
+            moved_rook.col = rook_col
+            moved_rook.castle = rook_castle
+            self.set_square(old_row, rook_col, moved_rook)
+
+        self.turn = 'black' if self.turn == 'white' else 'white'
+        if self.turn == 'black':
+            self.fullmove_number -= 1
+        self.halfmove_clock = halfmove_clock
+        self.en_passant = en_passant
+        self.zobrist_key = zobrist_key
+
+    def check_move(self, position_to_move, old_position):
+        """
+        This method will change the necessary information in order to update the board, making possible
+        to move the pieces. The king castles if it moves two columns.
+        :param position_to_move: tuple
+        :param old_position: tuple
+        :return: tuple. The undo information of make_move.
+        """
+        return self.make_move(Move(old_position, position_to_move))
 
     def occupations(self):
         """
-        With this method we will get all the occupied positions on the board. Very important to put the
-        first line of code to reset the set.
+        With this method we will get all the occupied positions on the board scanning the whole grid. The
+        positions are kept up to date by set_square, so this is only needed if the grid is changed by hand.
         :return: None
         """
         self.occupied_positions = set()
-        for row in self.grid:
-            for piece in row:
-                if not self.check_node((piece.row, piece.col)):
-                    self.occupied_positions.add((piece.row, piece.col))
+        self.pieces_positions = {'white': set(), 'black': set()}
+        for row, line in enumerate(self.grid):
+            for col, piece in enumerate(line):
+                if piece is not EMPTY:
+                    self.occupied_positions.add((row, col))
+                    self.pieces_positions[piece.color].add((row, col))
+                    if type(piece) is King:
+                        self.kings_positions[piece.color] = (row, col)
+        self.zobrist_key = self.compute_zobrist_key()
+
+    def castling_rights(self):
+        """
+        The castling rights come from the pieces: the king and the rook must be on their squares and must not
+        have moved (their castle flag).
+        :return: int. WHITE_SHORT | WHITE_LONG | BLACK_SHORT | BLACK_LONG
+        """
+        rights = 0
+        for color, row, short, long in (('white', 7, WHITE_SHORT, WHITE_LONG), ('black', 0, BLACK_SHORT, BLACK_LONG)):
+            king = self.grid[row][4]
+            if type(king) is not King or king.color != color or king.castle:
+                continue
+            for col, flag in ((7, short), (0, long)):
+                rook = self.grid[row][col]
+                if type(rook) is Rook and rook.color == color and not rook.castle:
+                    rights |= flag
+        return rights
+
+    def compute_zobrist_key(self):
+        """
+        The zobrist key of the position computed from scratch. The board keeps it up to date by itself
+        (zobrist_key), this is only needed if the grid is changed by hand.
+        :return: int
+        """
+        key = ZOBRIST_CASTLING[self.castling_rights()]
+        if self.turn == 'black':
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        if self.en_passant is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant[1]]
+        for row, line in enumerate(self.grid):
+            for col, piece in enumerate(line):
+                if piece is not EMPTY:
+                    key ^= ZOBRIST_PIECES[(type(piece), piece.color)][row][col]
+        return key
+
+    def repetitions(self):
+        """
+        :return: int. How many times the current position has been on the board (the current one included).
+        """
+        key = self.zobrist_key
+        # a position before the last capture or pawn move can not come back
+        start = max(0, len(self.history) - self.halfmove_clock)
+        return 1 + sum(1 for undo_info in self.history[start:] if undo_info[-1] == key)
 
     def get_all_pieces_positions(self, color):
         """
         Given a color, we will separate the occupied positions of the board in same color positions (these are the
         positions occupied by pieces of the same color) and different color positions (positions occupied by different
-        color pieces)
+        color pieces). The sets are the ones of the board, so they must not be changed.
+        :param color: str
+        :return: tuple of sets
+        """
+        other_color = 'black' if color == 'white' else 'white'
+        return self.pieces_positions[color], self.pieces_positions[other_color]
+
+    def get_pieces(self, color):
+        """
+        :param color: str
+        :return: list of the pieces of the given color
+        """
+        return [self.grid[row][col] for (row, col) in self.pieces_positions[color]]
+
+    def get_king_position(self, color):
+        """
         :param color: str
-        :return: tuple of lists
+        :return: tuple or None
+        """
+        return self.kings_positions[color]
+
+    def is_square_attacked(self, square, by_color):
         """
+        Instead of generating all the moves of the other color, we look outward from the square: a knight jump
+        away, a king step away, the two squares a pawn attacks from, and along the straight and diagonal lines
+        until the first piece. We stop as soon as we find an attacker.
+        :param square: tuple
+        :param by_color: str. Color of the attacking pieces.
+        :return: bool
+        """
+        row, col = square
+        grid = self.grid
         occupied = self.occupied_positions
-        same_color = set()
-        diff_color = set()
-        for position in occupied:
-            row, col = position
-            piece = self.get_piece(row, col)
-            if piece.color == color:
-                same_color.add((row, col))
-            else:
-                diff_color.add((row, col))
-        return same_color, diff_color
 
-    def get_pieces_in_the_way(self, possible_moves, color):
+        for targets, type_of_piece in ((KNIGHT_TARGETS, Knight), (KING_TARGETS, King)):
+            for (r, c) in targets[row][col]:
+                if (r, c) in occupied:
+                    piece = grid[r][c]
+                    if type(piece) is type_of_piece and piece.color == by_color:
+                        return True
+
+        # white pawns move up the board, so they attack a square from the row below it
+        r = row + 1 if by_color == 'white' else row - 1
+        for c in (col - 1, col + 1):
+            if (r, c) in occupied:
+                piece = grid[r][c]
+                if type(piece) is Pawn and piece.color == by_color:
+                    return True
+
+        sliders = ((STRAIGHT_RAYS, (Rook, Queen)), (DIAGONAL_RAYS, (Bishop, Queen)))
+        for rays, types_of_piece in sliders:
+            for ray in rays[row][col]:
+                for (r, c) in ray:
+                    if (r, c) in occupied:
+                        piece = grid[r][c]
+                        if type(piece) in types_of_piece and piece.color == by_color:
+                            return True
+                        break
+        return False
+
+    def in_check(self, color):
         """
-        Given a color, and a list of possible moves, we will return the pices in the way, that is, the pieces on
-        a possible move (in the list of possible_moves).
-        :param possible_moves: list
+        This method checks if the king of the given color is under attack.
         :param color: str
-        :return: lst
+        :return: bool
         """
-        same_color_positions, different_color_positions = self.get_all_pieces_positions(color)
-        pieces_in_the_way_set = (same_color_positions | different_color_positions) & set(possible_moves)
-        pieces_in_the_way_list = list(pieces_in_the_way_set)
+        king_pos = self.kings_positions[color]
+        if king_pos is None:
+            return False
+        return self.is_square_attacked(king_pos, 'black' if color == 'white' else 'white')
 
-        return pieces_in_the_way_list
+    def checks_and_pins(self, color):
+        """
+        Looking outward from the king of the given color, we find once per position:
+
+            - checkers: the number of enemy pieces attacking the king.
+            - check_mask: if there is one checker, the squares that stop the check (capturing the checker or, for
+                          a slider, blocking the line between it and the king). None if there is no check.
+            - pins: for every piece that can not leave the line between the king and an enemy slider, the squares
+                    of that line where it can still move.
+
+        :param color: str
+        :return: tuple. (checkers, check_mask, pins)
+        """
+        king_row, king_col = self.kings_positions[color]
+        grid = self.grid
+        occupied = self.occupied_positions
+
+        checkers = 0
+        check_mask = None
+        pins = {}
+
+        for (r, c) in KNIGHT_TARGETS[king_row][king_col]:
+            if (r, c) in occupied:
+                piece = grid[r][c]
+                if type(piece) is Knight and piece.color != color:
+                    checkers += 1
+                    check_mask = {(r, c)}
+
+        # an enemy pawn attacks the king from the row in front of it
+        r = king_row - 1 if color == 'white' else king_row + 1
+        for c in (king_col - 1, king_col + 1):
+            if (r, c) in occupied:
+                piece = grid[r][c]
+                if type(piece) is Pawn and piece.color != color:
+                    checkers += 1
+                    check_mask = {(r, c)}
+
+        sliders = ((STRAIGHT_RAYS, (Rook, Queen)), (DIAGONAL_RAYS, (Bishop, Queen)))
+        for rays, types_of_piece in sliders:
+            for ray in rays[king_row][king_col]:
+                blocker = None
+                for i, (r, c) in enumerate(ray):
+                    if (r, c) not in occupied:
+                        continue
+                    piece = grid[r][c]
+                    if piece.color == color:
+                        if blocker is not None:
+                            break
+                        blocker = (r, c)
+                    else:
+                        if type(piece) in types_of_piece:
+                            if blocker is None:
+                                checkers += 1
+                                check_mask = set(ray[:i + 1])
+                            else:
+                                pins[blocker] = set(ray[:i + 1])
+                        break
+
+        return checkers, check_mask, pins
+
+    def legal_moves(self, color):
+        """
+        All the moves the given color can play. The checks and pins are computed once (see checks_and_pins), and
+        the valid moves of every piece are filtered with them without playing the moves. Only the king moves and
+        the en passant captures are played on the board: the king can not step on an attacked square, and an en
+        passant capture takes two pieces out of the row of the king at once. A pawn reaching the last row
+        gives one move for each piece it can be promoted to.
+        :param color: str
+        :return: list of Move
+        """
+        moves = []
+        checkers, check_mask, pins = self.checks_and_pins(color)
+        same_color, _ = self.get_all_pieces_positions(color)
+        for (row, col) in list(same_color):
+            piece = self.get_piece(row, col)
+
+            if type(piece) is King:
+                for target in piece.valid_move(self):
+                    undo_info = self.make_move(Move((row, col), target))
+                    king_under_attack = self.in_check(color)
+                    self.unmake_move(undo_info)
+                    if not king_under_attack:
+                        moves.append(Move((row, col), target))
+                # castle_move already checks that the king is safe on every square
+                if not piece.castle:
+                    moves.extend(Move((row, col), target) for target in piece.castle_move(self))
+                continue
+
+            # only the king can get out of a double check
+            if checkers > 1:
+                continue
+
+            pin = pins.get((row, col))
+            for target in piece.valid_move(self):
+                if target == self.en_passant and type(piece) is Pawn:
+                    undo_info = self.make_move(Move((row, col), target))
+                    king_under_attack = self.in_check(color)
+                    self.unmake_move(undo_info)
+                    if not king_under_attack:
+                        moves.append(Move((row, col), target))
+                    continue
+                if check_mask is not None and target not in check_mask:
+                    continue
+                if pin is not None and target not in pin:
+                    continue
+                if type(piece) is Pawn and target[0] in (0, 7):
+                    moves.extend(Move((row, col), target, piece_string) for piece_string in self.type_pieces)
+                else:
+                    moves.append(Move((row, col), target))
+        return moves
+
+    def perft(self, color, depth):
+        """
+        Counts the leaf nodes of the tree of legal moves to the given depth.
+        :param color: str
+        :param depth: int
+        :return: int
+        """
+        if depth == 0:
+            return 1
+
+        other_color = 'black' if color == 'white' else 'white'
+        nodes = 0
+        for move in self.legal_moves(color):
+            undo_info = self.make_move(move)
+            nodes += self.perft(other_color, depth - 1)
+            self.unmake_move(undo_info)
+        return nodes
@@ -0,0 +1,183 @@
+import mmap
+import random
+import struct
+
+from .BoardClass import *
+from .PgnClass import parse_san, read_games
+
+# An opening book is a file of entries of 16 bytes sorted by key, as in the Polyglot books: the zobrist key of the
+# position (8 bytes), the move (2 bytes), its weight (2 bytes) and 4 unused bytes, all of them big endian. The keys
+# are the zobrist keys of Board, not the Polyglot ones.
+ENTRY = struct.Struct('>QHHI')
+KEY = struct.Struct('>Q')
+
+# the move is to file, to rank, from file, from rank (3 bits each, the rank 0 is the row 7 of the board) and the
+# promotion. A castle is the king capturing its rook.
+BOOK_PROMOTIONS = {'Knight': 1, 'Bishop': 2, 'Rook': 3, 'Queen': 4}
+BOOK_PROMOTION_NAMES = {code: name for name, code in BOOK_PROMOTIONS.items()}
+
+MAX_WEIGHT = 0xFFFF
+
+
+def encode_move(board, move):
+    """
+    :param board: Board. The position before the move.
+    :param move: Move
+    :return: int
+    """
+    (old_row, old_col), (new_row, new_col) = move.old_position, move.new_position
+    if type(board.grid[old_row][old_col]) is King and abs(new_col - old_col) == 2:
+        new_col = 7 if new_col == 6 else 0
+    return (new_col | (7 - new_row) << 3 | old_col << 6 | (7 - old_row) << 9
+            | BOOK_PROMOTIONS.get(move.promotion, 0) << 12)
+
+
+def decode_move(board, code):
+    """
+    :param board: Board. The position before the move.
+    :param code: int
+    :return: Move
+    """
+    new_col, new_row = code & 7, 7 - (code >> 3 & 7)
+    old_col, old_row = code >> 6 & 7, 7 - (code >> 9 & 7)
+    if type(board.grid[old_row][old_col]) is King and old_col == 4 and old_row == new_row and new_col in (0, 7):
+        new_col = 6 if new_col == 7 else 2
+    return Move(SQUARES[old_row][old_col], SQUARES[new_row][new_col], BOOK_PROMOTION_NAMES.get(code >> 12 & 7))
+
+
+class OpeningBook:
+    """
+    A book file read through mmap: the entries of a position are found with a binary search on the keys, so the
+    file is never loaded and opening a book costs nothing.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: str
+        """
+        self.path = path
+        self.file = open(path, 'rb')
+        size = self.file.seek(0, 2)
+        if size % ENTRY.size:
+            self.file.close()
+            raise ValueError(f"{path} is not a book: its size is not a multiple of {ENTRY.size} bytes")
+        self.count = size // ENTRY.size
+        # an empty file can not be mapped
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def close(self):
+        if self.data:
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def entries(self, key):
+        """
+        :param key: int. A zobrist key.
+        :return: list of (move code, weight)
+        """
+        data = self.data
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        for index in range(low, self.count):
+            entry_key, move, weight, _ = ENTRY.unpack_from(data, index * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((move, weight))
+        return entries
+
+    def moves(self, board):
+        """
+        :param board: Board
+        :return: list of (Move, weight). Only the legal moves of the book, the heaviest first.
+        """
+        entries = self.entries(board.zobrist_key)
+        if not entries:
+            return []
+        legal_moves = set(board.legal_moves(board.turn))
+        moves = []
+        for code, weight in entries:
+            move = decode_move(board, code)
+            if move in legal_moves:
+                moves.append((move, weight))
+        return sorted(moves, key=lambda book_move: book_move[1], reverse=True)
+
+    def choose(self, board, chooser=random, best=False):
+        """
+        :param board: Board
+        :param chooser: random.Random. Used to choose a move with a probability proportional to its weight.
+        :param best: bool. Choose the heaviest move instead.
+        :return: Move or None if the position is not in the book.
+        """
+        moves = [(move, weight) for move, weight in self.moves(board) if weight]
+        if not moves:
+            return None
+        if best:
+            return moves[0][0]
+        return chooser.choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+
+
+def build_book(pgn_paths, output, max_plies=20, min_games=1, backend=Board):
+    """
+    Compiles the first moves of the games of PGN files into a book. The weight of a move is two points for every
+    game won by the color that played it and one point for every draw (or game without result), as in Polyglot.
+    :param pgn_paths: list of str
+    :param output: str. The book file.
+    :param max_plies: int. Moves of every game in the book.
+    :param min_games: int. The moves played in fewer games are left out.
+    :param backend: class
+    :return: tuple. (games, entries, games with errors)
+    """
+    # (key, move code): [games, points]
+    counts = {}
+    games = errors = 0
+    for path in pgn_paths:
+        with open(path, 'rb') as file:
+            for game in read_games(file):
+                if game.error is not None:
+                    errors += 1
+                    continue
+                result = game.headers.get('Result', game.result)
+                points = {'white': {'1-0': 2, '0-1': 0}.get(result, 1), 'black': {'1-0': 0, '0-1': 2}.get(result, 1)}
+                fen = game.headers.get('FEN')
+                # the moves of a game are counted only if all of them can be replayed
+                played = []
+                try:
+                    board = backend.from_fen(fen) if fen else backend()
+                    for san in game.moves[:max_plies]:
+                        move = parse_san(board, san)
+                        played.append((board.zobrist_key, encode_move(board, move), points[board.turn]))
+                        board.make_move(move)
+                except ValueError:
+                    # an illegal move (PgnError) or an invalid FEN tag
+                    errors += 1
+                    continue
+                for key, code, move_points in played:
+                    count = counts.setdefault((key, code), [0, 0])
+                    count[0] += 1
+                    count[1] += move_points
+                games += 1
+
+    entries = [(key, code, points) for (key, code), (played, points) in counts.items() if played >= min_games]
+    heaviest = max((points for _, _, points in entries), default=0)
+    with open(output, 'wb') as file:
+        for key, code, points in sorted(entries, key=lambda entry: (entry[0], -entry[2])):
+            # the weights are scaled down if they do not fit in 2 bytes, but a move never gets a weight of 0 by it
+            weight = points if heaviest <= MAX_WEIGHT else max(1 if points else 0, points * MAX_WEIGHT // heaviest)
+            file.write(ENTRY.pack(key, code, weight, 0))
+    return games, len(entries), errors
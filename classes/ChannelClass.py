@@ -0,0 +1,123 @@
+from .BoardClass import Move, Node, PROMOTION_LETTERS, PROMOTION_NAMES, parse_square, square_name
+
+# A delta is a line with the move in coordinate notation and an x between the squares if it captures: 'e2e4',
+# 'e4xd5', 'e7xd8q'. A snapshot is a line 'board <FEN>' followed by the deltas played from that position. A 'board'
+# line sent after the snapshot replaces the position, as when a move is taken back.
+KEYFRAME_PLIES = 32
+# bytes waiting to be sent to a subscriber, at most: one that reads slower than the game goes is dropped
+MAX_BUFFER = 1 << 18
+
+
+def encode_delta(move, capture):
+    """
+    :param move: Move
+    :param capture: bool
+    :return: bytes. The line of the delta, with its end of line.
+    """
+    text = square_name(move.old_position) + ('x' if capture else '') + square_name(move.new_position)
+    if move.promotion is not None:
+        text += PROMOTION_LETTERS[move.promotion]
+    return (text + '\n').encode()
+
+
+def decode_delta(line):
+    """
+    :param line: bytes or str
+    :return: tuple. (Move, capture)
+    """
+    text = line.decode() if isinstance(line, bytes) else line
+    text = text.strip()
+    capture = len(text) > 4 and text[2] == 'x'
+    if capture:
+        text = text[:2] + text[3:]
+    if len(text) not in (4, 5) or (len(text) == 5 and text[4] not in PROMOTION_NAMES):
+        raise ValueError(f"invalid delta: {line!r}")
+    return Move(parse_square(text[:2]), parse_square(text[2:4]), PROMOTION_NAMES.get(text[4:])), capture
+
+
+class SpectatorChannel:
+    """
+    The moves of a game for the people watching it. Every move is published once as a delta of a few bytes, and the
+    same bytes are written to every subscriber, so the cost of a move does not depend on the size of the board. A
+    new subscriber gets a snapshot of the position and the deltas played since then. The snapshot is taken again
+    every KEYFRAME_PLIES moves, so joining a long game does not replay all of it.
+    """
+
+    def __init__(self, board):
+        """
+        :param board: Board. The position of the game now.
+        """
+        self.keyframe = f"board {board.to_fen()}\n".encode()
+        # the deltas played since the keyframe
+        self.deltas = []
+        # objects with a write(bytes) method, as asyncio.StreamWriter
+        self.subscribers = []
+
+    def snapshot(self):
+        """
+        :return: bytes. The keyframe and the deltas played since then.
+        """
+        return self.keyframe + b''.join(self.deltas)
+
+    def subscribe(self, subscriber):
+        """
+        :param subscriber: object with a write(bytes) method. It gets the snapshot now and every delta afterwards.
+        :return: None
+        """
+        subscriber.write(self.snapshot())
+        self.subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber):
+        """
+        :param subscriber: object. It does not need to be subscribed.
+        :return: None
+        """
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def reset(self, board):
+        """
+        Starts again from a position that does not follow from the deltas, as after a move taken back: the keyframe
+        is taken again and sent to every subscriber.
+        :param board: Board. The position of the game now.
+        :return: bytes. The keyframe sent.
+        """
+        self.keyframe = f"board {board.to_fen()}\n".encode()
+        self.deltas = []
+        self.send(self.keyframe)
+        return self.keyframe
+
+    def publish(self, board, move, captured):
+        """
+        :param board: Board. The position after the move.
+        :param move: Move. The move played.
+        :param captured: Piece or Node. What was captured, from the undo information of the move.
+        :return: bytes. The delta sent.
+        """
+        data = encode_delta(move, type(captured) is not Node)
+        if len(self.deltas) + 1 >= KEYFRAME_PLIES:
+            self.keyframe = f"board {board.to_fen()}\n".encode()
+            self.deltas = []
+        else:
+            self.deltas.append(data)
+        self.send(data)
+        return data
+
+    def send(self, data):
+        """
+        :param data: bytes. Written to every subscriber, the same object for all of them. A subscriber with a
+                     transport (as asyncio.StreamWriter) that has more than MAX_BUFFER bytes waiting is unsubscribed
+                     and closed instead, so the memory of the server does not grow with the spectators that do not
+                     read.
+        :return: None
+        """
+        slow = []
+        for subscriber in self.subscribers:
+            transport = getattr(subscriber, 'transport', None)
+            if transport is not None and (transport.is_closing() or transport.get_write_buffer_size() > MAX_BUFFER):
+                slow.append(subscriber)
+            else:
+                subscriber.write(data)
+        for subscriber in slow:
+            self.subscribers.remove(subscriber)
+            subscriber.close()
@@ -0,0 +1,658 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .BoardClass import *
+from .TablebaseClass import Tablebases
+
+# scores are in centipawns from the point of view of the color to play. A mate is MATE minus the number of plies
+# to reach it, so the closest mate has the highest score.
+MATE = 100000
+MATE_BOUND = MATE - 1000
+INFINITY = MATE + 1
+
+PIECE_VALUES = {Pawn: 100, Knight: 320, Bishop: 330, Rook: 500, Queen: 900, King: 0}
+
+# bonus of every square for the white pieces (the row 0 is the top of the board), the black ones use the mirror
+PIECE_SQUARE_TABLES = {
+    Pawn: ((0, 0, 0, 0, 0, 0, 0, 0),
+           (50, 50, 50, 50, 50, 50, 50, 50),
+           (10, 10, 20, 30, 30, 20, 10, 10),
+           (5, 5, 10, 25, 25, 10, 5, 5),
+           (0, 0, 0, 20, 20, 0, 0, 0),
+           (5, -5, -10, 0, 0, -10, -5, 5),
+           (5, 10, 10, -20, -20, 10, 10, 5),
+           (0, 0, 0, 0, 0, 0, 0, 0)),
+    Knight: ((-50, -40, -30, -30, -30, -30, -40, -50),
+             (-40, -20, 0, 0, 0, 0, -20, -40),
+             (-30, 0, 10, 15, 15, 10, 0, -30),
+             (-30, 5, 15, 20, 20, 15, 5, -30),
+             (-30, 0, 15, 20, 20, 15, 0, -30),
+             (-30, 5, 10, 15, 15, 10, 5, -30),
+             (-40, -20, 0, 5, 5, 0, -20, -40),
+             (-50, -40, -30, -30, -30, -30, -40, -50)),
+    Bishop: ((-20, -10, -10, -10, -10, -10, -10, -20),
+             (-10, 0, 0, 0, 0, 0, 0, -10),
+             (-10, 0, 5, 10, 10, 5, 0, -10),
+             (-10, 5, 5, 10, 10, 5, 5, -10),
+             (-10, 0, 10, 10, 10, 10, 0, -10),
+             (-10, 10, 10, 10, 10, 10, 10, -10),
+             (-10, 5, 0, 0, 0, 0, 5, -10),
+             (-20, -10, -10, -10, -10, -10, -10, -20)),
+    Rook: ((0, 0, 0, 0, 0, 0, 0, 0),
+           (5, 10, 10, 10, 10, 10, 10, 5),
+           (-5, 0, 0, 0, 0, 0, 0, -5),
+           (-5, 0, 0, 0, 0, 0, 0, -5),
+           (-5, 0, 0, 0, 0, 0, 0, -5),
+           (-5, 0, 0, 0, 0, 0, 0, -5),
+           (-5, 0, 0, 0, 0, 0, 0, -5),
+           (0, 0, 0, 5, 5, 0, 0, 0)),
+    Queen: ((-20, -10, -10, -5, -5, -10, -10, -20),
+            (-10, 0, 0, 0, 0, 0, 0, -10),
+            (-10, 0, 5, 5, 5, 5, 0, -10),
+            (-5, 0, 5, 5, 5, 5, 0, -5),
+            (0, 0, 5, 5, 5, 5, 0, -5),
+            (-10, 5, 5, 5, 5, 5, 0, -10),
+            (-10, 0, 5, 0, 0, 0, 0, -10),
+            (-20, -10, -10, -5, -5, -10, -10, -20)),
+    King: ((-30, -40, -40, -50, -50, -40, -40, -30),
+           (-30, -40, -40, -50, -50, -40, -40, -30),
+           (-30, -40, -40, -50, -50, -40, -40, -30),
+           (-30, -40, -40, -50, -50, -40, -40, -30),
+           (-20, -30, -30, -40, -40, -30, -30, -20),
+           (-10, -20, -20, -20, -20, -20, -20, -10),
+           (20, 20, 0, 0, 0, 0, 20, 20),
+           (20, 30, 10, 0, 0, 10, 30, 20)),
+}
+
+# value of a piece of a color on a square: the value of the piece plus the bonus of the square
+SQUARE_VALUES = {(type_of_piece, color): [[PIECE_VALUES[type_of_piece]
+                                           + table[row if color == 'white' else 7 - row][col] for col in range(8)]
+                                          for row in range(8)]
+                 for type_of_piece, table in PIECE_SQUARE_TABLES.items() for color in ('white', 'black')}
+
+# a capture that can not raise the score above alpha even winning this much more is not searched (delta pruning)
+DELTA_MARGIN = 200
+
+# kinds of score stored in the transposition table: the exact score, or a bound if the search was cut
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+# book is True if the move comes from the opening book, tablebase if it comes from the tablebases (there was no
+# search)
+SearchResult = namedtuple('SearchResult', ['move', 'score', 'depth', 'nodes', 'seconds', 'nodes_per_second', 'book',
+                                           'tablebase'], defaults=[False, False])
+
+
+class SearchTimeout(Exception):
+    """
+    The time of the search is over. The search stops wherever it is, and the board is left as it was.
+    """
+
+
+def evaluate(board, color):
+    """
+    Material and position of the pieces.
+    :param board: Board
+    :param color: str. The score is from the point of view of this color.
+    :return: int. Centipawns.
+    """
+    grid = board.grid
+    score = 0
+    for same_color in (True, False):
+        positions = board.pieces_positions[color if same_color else ('black' if color == 'white' else 'white')]
+        total = 0
+        for (row, col) in positions:
+            piece = grid[row][col]
+            total += SQUARE_VALUES[(type(piece), piece.color)][row][col]
+        score += total if same_color else -total
+    return score
+
+
+def captured_piece(board, move):
+    """
+    :param board: Board
+    :param move: Move
+    :return: Piece or None. The piece the move captures (a pawn captured en passant too).
+    """
+    (old_row, old_col), (new_row, new_col) = move.old_position, move.new_position
+    piece = board.grid[new_row][new_col]
+    if piece is not EMPTY:
+        return piece
+    if move.new_position == board.en_passant and type(board.grid[old_row][old_col]) is Pawn:
+        return board.grid[old_row][new_col]
+    return None
+
+
+class TranspositionTable:
+    """
+    The positions already searched, keyed by their zobrist key. The table has a fixed number of slots (a key goes
+    to the slot key % size), so its memory does not grow during the game. When two positions want the same slot,
+    the new one replaces the old one if the old one comes from a previous search or if the new one was searched
+    at least as deep.
+    """
+
+    __slots__ = ('size', 'slots', 'generation')
+
+    def __init__(self, size=1 << 18):
+        """
+        :param size: int. Number of slots.
+        """
+        self.size = size
+        self.slots = [None] * size
+        self.generation = 0
+
+    def new_search(self):
+        """
+        The entries of the previous searches are still used, but any new entry can replace them.
+        :return: None
+        """
+        self.generation += 1
+
+    def get(self, key):
+        """
+        :param key: int
+        :return: tuple or None. (key, depth, score, flag, move, generation)
+        """
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        """
+        :param key: int
+        :param depth: int
+        :param score: int
+        :param flag: int. EXACT, LOWER_BOUND or UPPER_BOUND.
+        :param move: Move or None
+        :return: None
+        """
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is None or entry[5] != self.generation or depth >= entry[1]:
+            self.slots[index] = (key, depth, score, flag, move, self.generation)
+
+    def __len__(self):
+        return sum(1 for entry in self.slots if entry is not None)
+
+
+class Engine:
+    """
+    Negamax alpha-beta search with iterative deepening: the position is searched one ply deeper every iteration
+    until the time is over, and the best move found by the deepest iteration is played. The moves are tried in
+    this order: the best move found before for the position (transposition table), the captures (most valuable
+    victim first, least valuable attacker first), the promotions, the killer moves (quiet moves that cut the
+    search at the same ply) and the rest. At the end of the search only the captures are searched (quiescence),
+    so the evaluation is never taken in the middle of an exchange.
+    """
+
+    def __init__(self, table_size=1 << 18, book=None, tablebases=None):
+        """
+        :param table_size: int. Number of slots of the transposition table. It is kept between searches.
+        :param book: OpeningBook. The positions of the book are not searched.
+        :param tablebases: Tablebases. The positions of the tables are not searched, at the root or below it.
+        """
+        self.table = TranspositionTable(table_size)
+        self.book = book
+        self.tablebases = tablebases
+        self.killers = []
+        self.nodes = 0
+        self.deadline = None
+        # best move of the iteration that is running, among the root moves already searched
+        self.root_best = None
+
+    def best_move(self, game, time_limit=1.0, max_depth=64):
+        """
+        :param game: Game. The position is not changed.
+        :param time_limit: float or None. Seconds, or None to search until max_depth.
+        :param max_depth: int
+        :return: SearchResult. The move is None if there are no legal moves.
+        """
+        board = game.board
+        color = game.color
+        start = time.perf_counter()
+        if self.book is not None:
+            move = self.book.choose(board)
+            if move is not None:
+                return SearchResult(move, 0, 0, 0, time.perf_counter() - start, 0, True)
+        result = tablebase_move(self.tablebases, board, start)
+        if result is not None:
+            return result
+        self.deadline = start + time_limit if time_limit is not None else float('inf')
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(max_depth + 1)]
+        self.table.new_search()
+
+        moves = list(game.legal_moves())
+        best, best_score, reached = (moves[0] if moves else None), 0, 0
+        if len(moves) > 1:
+            for depth in range(1, max_depth + 1):
+                self.root_best = None
+                try:
+                    score, move = self.search_root(board, color, depth, moves)
+                except SearchTimeout:
+                    # the first move searched is the best one of the last iteration, so a move that beats it in
+                    # the unfinished iteration is a better choice
+                    if self.root_best is not None:
+                        best_score, best = self.root_best
+                    break
+                best, best_score, reached = move, score, depth
+                # the best move of this iteration is the first one of the next
+                moves.remove(move)
+                moves.insert(0, move)
+                if abs(score) >= MATE_BOUND or time.perf_counter() > self.deadline:
+                    break
+
+        seconds = time.perf_counter() - start
+        return SearchResult(best, best_score, reached, self.nodes, seconds, self.nodes / seconds if seconds else 0)
+
+    def search_root(self, board, color, depth, moves, alpha=-INFINITY, beta=INFINITY):
+        """
+        :param board: Board
+        :param color: str
+        :param depth: int
+        :param moves: list of Move. The legal moves of the position, in the order they are searched.
+        :param alpha: int
+        :param beta: int
+        :return: tuple. (score, move)
+        """
+        other_color = 'black' if color == 'white' else 'white'
+        best_score, best = -INFINITY, None
+        for move in moves:
+            undo_info = board.make_move(move)
+            try:
+                score = -self.search(board, other_color, depth - 1, -beta, -alpha, 1)
+            finally:
+                board.unmake_move(undo_info)
+            if score > best_score:
+                best_score, best = score, move
+                self.root_best = (score, move)
+            if score > alpha:
+                alpha = score
+        self.table.store(board.zobrist_key, depth, best_score, EXACT, best)
+        return best_score, best
+
+    def search(self, board, color, depth, alpha, beta, ply):
+        """
+        :param board: Board
+        :param color: str. The color to play.
+        :param depth: int. Plies left.
+        :param alpha: int
+        :param beta: int
+        :param ply: int. Plies from the root.
+        :return: int
+        """
+        if depth <= 0:
+            return self.quiescence(board, color, alpha, beta, ply)
+
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        if board.repetitions() > 1:
+            return 0
+
+        tablebases = self.tablebases
+        if tablebases is not None and len(board.occupied_positions) <= tablebases.max_pieces:
+            probe = tablebases.probe(board)
+            if probe is not None:
+                return tablebase_score(probe, ply)
+
+        key = board.zobrist_key
+        entry = self.table.get(key)
+        table_move = None
+        if entry is not None:
+            _, entry_depth, entry_score, flag, table_move, _ = entry
+            if entry_depth >= depth:
+                score = score_from_table(entry_score, ply)
+                if flag == EXACT or (flag == LOWER_BOUND and score >= beta) or (flag == UPPER_BOUND and score <= alpha):
+                    return score
+
+        moves = board.legal_moves(color)
+        if not moves:
+            return -MATE + ply if board.in_check(color) else 0
+
+        other_color = 'black' if color == 'white' else 'white'
+        original_alpha = alpha
+        best_score, best = -INFINITY, None
+        for move in self.order(board, moves, table_move, ply):
+            undo_info = board.make_move(move)
+            try:
+                score = -self.search(board, other_color, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move(undo_info)
+            if score > best_score:
+                best_score, best = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if captured_piece(board, move) is None and move.promotion is None:
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1], killers[0] = killers[0], move
+                        break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.table.store(key, depth, score_to_table(best_score, ply), flag, best)
+        return best_score
+
+    def quiescence(self, board, color, alpha, beta, ply):
+        """
+        Only the captures and the promotions are searched. The color to play can also stop capturing, so the
+        evaluation of the position is a lower bound of the score.
+        :param board: Board
+        :param color: str
+        :param alpha: int
+        :param beta: int
+        :param ply: int
+        :return: int
+        """
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        stand_pat = evaluate(board, color)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        grid = board.grid
+        captures = []
+        for move in board.legal_moves(color):
+            victim = captured_piece(board, move)
+            if victim is None and move.promotion is None:
+                continue
+            value = PIECE_VALUES[type(victim)] if victim is not None else 0
+            if move.promotion is not None:
+                value += PIECE_VALUES[board.type_pieces[move.promotion]] - PIECE_VALUES[Pawn]
+            if stand_pat + value + DELTA_MARGIN <= alpha:
+                continue
+            row, col = move.old_position
+            captures.append((10 * value - PIECE_VALUES[type(grid[row][col])], move))
+        captures.sort(key=lambda capture: capture[0], reverse=True)
+
+        other_color = 'black' if color == 'white' else 'white'
+        for _, move in captures:
+            undo_info = board.make_move(move)
+            try:
+                score = -self.quiescence(board, other_color, -beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move(undo_info)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def order(self, board, moves, table_move, ply):
+        """
+        :param board: Board
+        :param moves: list of Move
+        :param table_move: Move or None. The best move of the transposition table.
+        :param ply: int
+        :return: list of Move. The most promising moves first.
+        """
+        grid = board.grid
+        killers = self.killers[ply] if ply < len(self.killers) else (None, None)
+
+        def priority(move):
+            if move == table_move:
+                return 1000000
+            victim = captured_piece(board, move)
+            if victim is not None:
+                row, col = move.old_position
+                return 100000 + 10 * PIECE_VALUES[type(victim)] - PIECE_VALUES[type(grid[row][col])]
+            if move.promotion is not None:
+                return 90000 + PIECE_VALUES[board.type_pieces[move.promotion]]
+            if move == killers[0]:
+                return 80001
+            if move == killers[1]:
+                return 80000
+            return 0
+
+        return sorted(moves, key=priority, reverse=True)
+
+
+def tablebase_score(probe, ply):
+    """
+    :param probe: tuple. (result, plies to the mate) of Tablebases.probe.
+    :param ply: int. Plies from the root.
+    :return: int. The score of the result, a mate score for a win or a loss.
+    """
+    result, plies = probe
+    if result == 'win':
+        return MATE - ply - plies
+    if result == 'loss':
+        return -MATE + ply + plies
+    return 0
+
+
+def tablebase_move(tablebases, board, start):
+    """
+    :param tablebases: Tablebases or None
+    :param board: Board
+    :param start: float. time.perf_counter() when the search started.
+    :return: SearchResult or None if the position is not in the tablebases.
+    """
+    found = tablebases.best_move(board) if tablebases is not None else None
+    if found is None:
+        return None
+    move, result, plies = found
+    return SearchResult(move, tablebase_score((result, plies), 0), 0, 0, time.perf_counter() - start, 0,
+                        tablebase=True)
+
+
+def score_to_table(score, ply):
+    """
+    The mates are stored as the plies from the position, not from the root, so they are right from any root.
+    :param score: int
+    :param ply: int
+    :return: int
+    """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """
+    :param score: int
+    :param ply: int
+    :return: int
+    """
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+# the engine of a worker process of ParallelEngine, and the search it is working for
+_worker_engine = None
+_worker_search = None
+
+
+def _start_worker(table_size, tablebases_directory=None):
+    global _worker_engine
+    tablebases = Tablebases(tablebases_directory) if tablebases_directory is not None else None
+    _worker_engine = Engine(table_size, tablebases=tablebases)
+
+
+def _search_move(backend, packed, depth, alpha, beta, deadline, search):
+    """
+    Searches the position after a root move in a worker process.
+    :param backend: class. Board or one of its subclasses.
+    :param packed: bytes. The position after the move (Board.pack).
+    :param depth: int. Depth of the root.
+    :param alpha: int
+    :param beta: int
+    :param deadline: float or None. time.time() when the search must stop.
+    :param search: int. Number of the search, the entries of the older ones can be replaced in the table.
+    :return: tuple. (score of the move or None if the time was over, nodes)
+    """
+    global _worker_search
+    engine = _worker_engine
+    if search != _worker_search:
+        _worker_search = search
+        engine.table.new_search()
+    # the clock of time.perf_counter is not the same in every process
+    engine.deadline = time.perf_counter() + deadline - time.time() if deadline is not None else float('inf')
+    engine.nodes = 0
+    engine.killers = [[None, None] for _ in range(depth + 1)]
+
+    board = backend.unpack(packed)
+    try:
+        score = -engine.search(board, board.turn, depth - 1, -beta, -alpha, 1)
+    except SearchTimeout:
+        return None, engine.nodes
+    return score, engine.nodes
+
+
+class ParallelEngine:
+    """
+    The search of Engine spread over worker processes, one per core, splitting the moves of the root. In every
+    iteration the first move (the best one of the last iteration) is searched alone to get the score to beat.
+    Then the rest of the moves are searched at the same time with a null window: they only need to prove they are
+    not better. The ones that are better are searched again with a full window. Every worker keeps its own
+    Engine, and its transposition table, between the searches. The positions go to the workers as Board.pack
+    bytes, so the positions before the root are not known to them (they do not see a repetition with them).
+    """
+
+    def __init__(self, workers=None, table_size=1 << 18, book=None, tablebases=None):
+        """
+        :param workers: int. Number of processes, by default one per core.
+        :param table_size: int. Number of slots of the transposition table of every worker.
+        :param book: OpeningBook. The positions of the book are not searched.
+        :param tablebases: Tablebases. Every worker opens the tables of its directory.
+        """
+        self.book = book
+        self.tablebases = tablebases
+        self.workers = workers or os.cpu_count() or 1
+        directory = tablebases.directory if tablebases is not None else None
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_start_worker, initargs=(table_size, directory))
+        self.searches = 0
+
+    def close(self):
+        """
+        Stops the worker processes.
+        :return: None
+        """
+        self.pool.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def best_move(self, game, time_limit=1.0, max_depth=64):
+        """
+        :param game: Game. The position is not changed.
+        :param time_limit: float or None. Seconds, or None to search until max_depth.
+        :param max_depth: int
+        :return: SearchResult. The move is None if there are no legal moves.
+        """
+        board = game.board
+        start = time.perf_counter()
+        if self.book is not None:
+            move = self.book.choose(board)
+            if move is not None:
+                return SearchResult(move, 0, 0, 0, time.perf_counter() - start, 0, True)
+        result = tablebase_move(self.tablebases, board, start)
+        if result is not None:
+            return result
+        deadline = time.time() + time_limit if time_limit is not None else None
+        self.searches += 1
+
+        moves = list(game.legal_moves())
+        children = {}
+        for move in moves:
+            undo_info = board.make_move(move)
+            children[move] = board.pack()
+            board.unmake_move(undo_info)
+
+        nodes = 0
+        best, best_score, reached = (moves[0] if moves else None), 0, 0
+        if len(moves) > 1:
+            for depth in range(1, max_depth + 1):
+                score, move, complete, iteration_nodes = self.search_root(type(board), children, moves, depth,
+                                                                          deadline)
+                nodes += iteration_nodes
+                if move is not None:
+                    best, best_score = move, score
+                if not complete:
+                    break
+                reached = depth
+                moves.remove(move)
+                moves.insert(0, move)
+                if abs(score) >= MATE_BOUND or (deadline is not None and time.time() > deadline):
+                    break
+
+        seconds = time.perf_counter() - start
+        return SearchResult(best, best_score, reached, nodes, seconds, nodes / seconds if seconds else 0)
+
+    def search_root(self, backend, children, moves, depth, deadline):
+        """
+        :param backend: class
+        :param children: dict. {move: packed position after the move}
+        :param moves: list of Move. The first one is searched alone.
+        :param depth: int
+        :param deadline: float or None
+        :return: tuple. (score, best move or None, if the iteration is complete, nodes). If it is not complete,
+                 the move is the best one among the moves searched, and None if the first one was not searched.
+        """
+        submit = self.pool.submit
+        first = moves[0]
+        score, nodes = submit(_search_move, backend, children[first], depth, -INFINITY, INFINITY, deadline,
+                              self.searches).result()
+        if score is None:
+            return 0, None, False, nodes
+        best_score, best, complete = score, first, True
+
+        # future: (move, alpha, beta)
+        pending = {}
+        for move in moves[1:]:
+            future = submit(_search_move, backend, children[move], depth, best_score, best_score + 1, deadline,
+                            self.searches)
+            pending[future] = (move, best_score, best_score + 1)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                move, alpha, beta = pending.pop(future)
+                score, move_nodes = future.result()
+                nodes += move_nodes
+                if score is None:
+                    complete = False
+                elif beta == INFINITY:
+                    if score > best_score:
+                        best_score, best = score, move
+                elif score > alpha:
+                    # the move is better than the first one: search it again to get its score
+                    future = submit(_search_move, backend, children[move], depth, best_score, INFINITY, deadline,
+                                    self.searches)
+                    pending[future] = (move, best_score, INFINITY)
+
+        return best_score, best, complete, nodes
+
+
+def best_move(game, time_limit=1.0, engine=None):
+    """
+    :param game: Game
+    :param time_limit: float. Seconds.
+    :param engine: Engine. A new one by default; using the same engine for a whole game keeps its transposition
+                   table.
+    :return: SearchResult
+    """
+    if engine is None:
+        engine = Engine()
+    return engine.best_move(game, time_limit)
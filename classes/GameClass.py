@@ -1,26 +1,59 @@
+from .BoardClass import Board, Move, Node, Pawn
+
+
 class Game:
 
     def __init__(self, board, piece=None):
         self.board = board
 
-        self.color = "white"
+        self.color = self.board.turn
         self.piece = piece
 
         self.current_valid_moves = []
 
-        self.kings_positions = {'white': None, 'black': None}
-        for row in self.board.grid:
-            for piece in row:
-                if "King" in repr(piece):
-                    self.kings_positions[piece.color] = (piece.row, piece.col)
+        self.kings_positions = dict(self.board.kings_positions)
+
+        # legal moves of the current position, computed the first time they are needed (see legal_moves)
+        self.legal_moves_cache = None
+
+        # a SpectatorChannel the moves are published to, if the game is watched
+        self.spectators = None
+
+    @classmethod
+    def from_fen(cls, fen, backend=Board):
+        """
+        :param fen: str. A position in the FEN notation.
+        :param backend: class. Board or one of its subclasses (BitBoard).
+        :return: Game. The color to play is the one of the position.
+        """
+        return cls(backend.from_fen(fen))
+
+    def to_fen(self):
+        """
+        :return: str. The position of the game in the FEN notation.
+        """
+        return self.board.to_fen()
 
     def change_turn(self):
         """
-        This method allows to change turns in the game.
+        This method allows to change turns in the game. The position has changed, so the legal moves must be
+        computed again.
         :return: None
         """
         turns = {'white': 'black', 'black': 'white'}
         self.color = turns[self.color]
+        self.legal_moves_cache = None
+
+    def legal_moves(self):
+        """
+        All the legal moves of the color to play. They are computed once per position and kept until the next
+        move, so selecting pieces, validating moves and looking for checkmate or stalemate cost nothing between
+        moves.
+        :return: list of Move
+        """
+        if self.legal_moves_cache is None:
+            self.legal_moves_cache = self.board.legal_moves(self.color)
+        return self.legal_moves_cache
 
     def check_turn(self):
         """
@@ -42,10 +75,13 @@ class Game:
     @property
     def return_valid_moves(self):
         """
-        This method returns the valid moves of the selected piece.
+        This method returns the valid moves of the selected piece, taken from the legal moves of the position.
+        A promotion appears once: the piece is chosen afterwards.
         :return: list
         """
-        return self.piece.valid_move(self.board)
+        position = (self.piece.row, self.piece.col)
+        return list(dict.fromkeys(move.new_position for move in self.legal_moves()
+                                  if move.old_position == position))
 
     def move(self, new_position):
         """
@@ -57,32 +93,41 @@ class Game:
         new_row, new_col = new_position
         row, col = self.piece.row, self.piece.col
 
-        if (row, col) == self.kings_positions[self.color]:
-            castles_moves = self.piece.castle_move(self.board)
-            if (new_row, new_col) in castles_moves and not self.piece.castle:
-                king_under_attack = self.is_king_under_attack(new_position, (row, col))
-                if not king_under_attack:
-                    self.board.check_move((new_row, new_col), (row, col), castle=True)
-                    self.check_castle()
-                    self.change_turn()
-                    self.reset()
-                    return
-
-        if (new_row, new_col) in self.current_valid_moves[:]:
-            king_under_attack = self.is_king_under_attack(new_position, (row, col))
-            protected_king = self.protect_king(new_position, (row, col))
-
-            if not king_under_attack and protected_king:
-                eaten = not self.board.check_node((new_row, new_col))
-                old_piece = self.board.get_piece(new_row, new_col)
-                self.board.check_move((new_row, new_col), (row, col))
-                self.check_castle()
-                self.change_turn()
-                self.reset()
-                if eaten:
-                    return old_piece
+        # the valid moves of the selected piece come from the legal moves, so they are all safe for the king
+        if (new_row, new_col) in self.current_valid_moves:
+            castle = (row, col) == self.kings_positions[self.color] and abs(new_col - col) == 2
+            # the captured piece is not on the new square if it is captured en passant
+            move = Move((row, col), (new_row, new_col))
+            captured = self.board.make_move(move)[2]
+            # a promotion is published when the piece is chosen (see promote)
+            if self.spectators is not None and not (type(self.piece) is Pawn and new_row in (0, 7)):
+                self.spectators.publish(self.board, move, captured)
+            self.change_turn()
+            self.reset()
+            if castle:
+                return
+            if type(captured) is not Node:
+                return captured
         return new_row, new_col
 
+    def play(self, move):
+        """
+        Plays a legal move without selecting the piece first, as the computer does. A promotion is part of the
+        move, so there is no piece to choose afterwards.
+        :param move: Move
+        :return: Piece or None. The captured piece, if any.
+        """
+        if move not in self.legal_moves():
+            raise ValueError(f"illegal move: {move}")
+        captured = self.board.make_move(move)[2]
+        if self.spectators is not None:
+            self.spectators.publish(self.board, move, captured)
+        self.change_turn()
+        self.reset()
+        self.track_kings()
+        if type(captured) is not Node:
+            return captured
+
     def select_piece(self, row, col, x, y):
         """
         If the selected piece matches the turn (by color), we select it.
@@ -102,67 +147,19 @@ class Game:
         self.reset()
         return None, []
 
-    def is_king_under_attack(self, new_position, old_position):
-        """
-        With this method we check if by moving a piece, the king will be attacked. If this is the case, the
-        method will return False, else True.
-
-        :param new_position: tuple. Position to move the selected piece
-        :param old_position: tuple. Initial position of the piece.
-        :return: bool
-        """
-        self.board.check_move(new_position, old_position, True)
-        if self.check_to_king():
-            self.board.check_move(old_position, new_position, True)
-            return True
-        self.board.check_move(old_position, new_position, True)
-        return False
-
     def check_to_king(self):
         """
         This method checks if the king is under attack.
         :return: bool
         """
-        # this line of code is very important because is the one that allows to see the future outcome
-        self.track_kings()
-
-        king_pos = self.kings_positions[self.color]
-        _, different_color = self.board.get_all_pieces_positions(self.color)
-
-        for (row, col) in different_color:
-            piece = self.board.get_piece(row, col)
-            valid_moves = piece.valid_move(self.board)
-            for move in valid_moves:
-                if move == king_pos:
-                    return True
-        return False
-
-    def protect_king(self, new_position, old_position):
-        """
-        If we are on check, we need to protect the king in order for a move to be valid. If by moving
-        the selected piece we protect the king this method returns True, else false.
-        :param new_position: tuple
-        :param old_position: tuple
-        :return: bool
-        """
-        check = self.check_to_king()
-        if check:
-            self.board.check_move(new_position, old_position, True)
-            if self.check_to_king():
-                self.board.check_move(old_position, new_position, True)
-                return False
-            self.board.check_move(old_position, new_position, True)
-        return True
+        return self.board.in_check(self.color)
 
     def track_kings(self):
         """
         This method tracks the positions of the kings.
         :return: None
         """
-        for row in self.board.grid:
-            for piece in row:
-                if "King" in str(piece):
-                    self.kings_positions[piece.color] = (piece.row, piece.col)
+        self.kings_positions.update(self.board.kings_positions)
 
     def promote(self, piece_string, col):
         """
@@ -175,9 +172,17 @@ class Game:
         row = 0 if self.color == 'black' else 7
         self.piece = type_of_piece('white' if self.color == 'black' else 'black', row, col)
 
-        self.board.grid[row][col] = type_of_piece('white' if self.color == 'black' else 'black', row, col)
-        self.board.occupations()
+        self.board.set_square(row, col, type_of_piece('white' if self.color == 'black' else 'black', row, col))
+        self.legal_moves_cache = None
         self.reset()
+        if not self.board.history:
+            return
+        # the pawn was moved without a promotion, the history keeps the piece it became
+        undo_info = self.board.history[-1]
+        move = Move(undo_info[0].old_position, undo_info[0].new_position, piece_string)
+        self.board.history[-1] = (move,) + undo_info[1:]
+        if self.spectators is not None:
+            self.spectators.publish(self.board, move, undo_info[2])
 
     def any_promotion(self):
         """
@@ -196,25 +201,57 @@ class Game:
                             return True, piece.row, piece.col
         return
 
-    def check_castle(self):
+    def take_back(self):
         """
-        This method checks if the king has been castled.
-        :return: None
+        Takes back the last move (the board keeps the history of the moves), and gives the turn back.
+        :return: Piece or None. The piece that was captured by the move, if any.
         """
-        if "Rook" in str(self.piece) or "King" in str(self.piece):
-            self.piece.castle = True
+        if not self.board.history:
+            return
+        captured = self.board.history[-1][2]
+        self.board.unmake_move()
+        self.change_turn()
+        self.reset()
+        self.track_kings()
+        if self.spectators is not None:
+            self.spectators.reset(self.board)
+        if type(captured) is not Node:
+            return captured
 
     def check_mate(self):
-        same_color, _ = self.board.get_all_pieces_positions(self.color)
+        """
+        The player to move has no legal moves and the king is under attack.
+        :return: str or None. The color of the winner.
+        """
         other_color = 'black' if self.color == 'white' else 'white'
-        for (row, col) in same_color:
-            piece = self.board.get_piece(row, col)
-            valid_moves = piece.valid_move(self.board)
-            for move in valid_moves:
-                if self.protect_king(move, (piece.row, piece.col)):
-                    return None
+        if self.legal_moves() or not self.check_to_king():
+            return None
         return other_color
 
+    def stalemate(self):
+        """
+        The player to move has no legal moves but the king is not under attack: the game is a draw.
+        :return: bool
+        """
+        return not self.legal_moves() and not self.check_to_king()
+
+    def adjudicate(self, tablebases):
+        """
+        The result of the game with the best play from both sides, if the position is in the tablebases, without
+        playing it to the end.
+        :param tablebases: Tablebases
+        :return: tuple or None. (color of the winner or None for a draw, plies to the mate), None if the position
+                 is not in the tablebases.
+        """
+        probe = tablebases.probe(self.board)
+        if probe is None:
+            return None
+        result, plies = probe
+        if result == 'draw':
+            return None, 0
+        other_color = 'black' if self.color == 'white' else 'white'
+        return (self.color if result == 'win' else other_color), plies
+
     @staticmethod
     def another_game(pressed_key):
         if pressed_key == 768:
@@ -0,0 +1,345 @@
+import re
+from collections import namedtuple
+
+from .BoardClass import *
+
+# a game read from a PGN file. moves are the SAN moves of the main line, result the result at the end of the
+# moves (or None), offset the position in bytes of its first line in the file, and error the reason why the game
+# can not be read (or None).
+PgnGame = namedtuple('PgnGame', ['headers', 'moves', 'result', 'offset', 'error'])
+
+GAME_RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# comments, annotations, variations, move numbers, results and moves
+TOKEN = re.compile(r'\{[^}]*\}?|;[^\n]*|\$\d+|[()]|1-0|0-1|1/2-1/2|\*|\d+\.+|[^\s(){};$]+')
+SAN = re.compile(r'([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?')
+
+SAN_PIECES = {'N': Knight, 'B': Bishop, 'R': Rook, 'Q': Queen, 'K': King}
+SAN_LETTERS = {type_of_piece: letter for letter, type_of_piece in SAN_PIECES.items()}
+SAN_PROMOTIONS = {letter.upper(): name for name, letter in PROMOTION_LETTERS.items()}
+
+
+class PgnError(ValueError):
+    """
+    A game that can not be read or replayed: a malformed tag or movetext, or a move that is not legal.
+    """
+
+    def __init__(self, message, ply=None, san=None):
+        """
+        :param message: str
+        :param ply: int. The number of the move (1 is the first white move) if the error is in a move.
+        :param san: str. The move.
+        """
+        super().__init__(message if ply is None else f"ply {ply} ({san}): {message}")
+        self.ply = ply
+        self.san = san
+
+
+def parse_movetext(text):
+    """
+    :param text: str. The moves of a game, with comments, annotations and variations.
+    :return: tuple. (list of the SAN moves of the main line, result or None)
+    """
+    moves = []
+    result = None
+    depth = 0
+    for token in TOKEN.findall(text):
+        first = token[0]
+        if first == '{':
+            if token[-1] != '}':
+                raise PgnError("unclosed comment")
+        elif first in ';$':
+            continue
+        elif token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+            if depth < 0:
+                raise PgnError("unbalanced variation")
+        elif depth:
+            continue
+        elif result is not None:
+            # a game without tags after this one can not be told apart from it
+            raise PgnError(f"text after the result: {token}")
+        elif token in GAME_RESULTS:
+            result = token
+        elif first.isdigit() and token.rstrip('.').isdigit():
+            continue
+        else:
+            moves.append(token)
+    if depth:
+        raise PgnError("unclosed variation")
+    return moves, result
+
+
+def read_games(file, start=0, end=None):
+    """
+    Reads the games of a PGN file one at a time, so the file is never loaded at once. A malformed game is yielded
+    with its error, and the reading goes on with the next one. A game ends where a tag line follows its movetext, so
+    the text after the result of a game, until the next tag line, is an error of that game.
+
+    With start and end, only the games whose first line starts in [start, end) are read, so a big file can be split
+    in parts read by different processes. The part starts at the first tag line that follows a movetext line, which
+    is where the part before stops.
+    :param file: file opened in binary mode
+    :param start: int. Offset in bytes.
+    :param end: int or None. Offset in bytes.
+    :return: generator of PgnGame
+    """
+    offset = 0
+    skipping = after_movetext = False
+    if start:
+        # the line with the byte start - 1 belongs to the part before
+        file.seek(start - 1)
+        offset = start - 1 + len(file.readline())
+        previous = _line_before(file, offset)
+        after_movetext = bool(previous) and previous[0] not in '[%'
+        file.seek(offset)
+        skipping = True
+
+    headers, movetext, game_offset, error = {}, [], None, None
+    for line in file:
+        line_offset = offset
+        offset += len(line)
+        text = line.decode('utf-8', 'replace').strip()
+        if not text or text[0] == '%':
+            continue
+        if skipping:
+            # the lines of the game that started in the part before
+            if text[0] != '[':
+                after_movetext = True
+                continue
+            if not after_movetext:
+                continue
+            skipping = False
+
+        if text[0] == '[':
+            if movetext:
+                yield _game(headers, movetext, game_offset, error)
+                headers, movetext, game_offset, error = {}, [], None, None
+            if game_offset is None:
+                if end is not None and line_offset >= end:
+                    return
+                game_offset = line_offset
+            match = TAG.fullmatch(text)
+            if match is not None:
+                headers[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+            elif error is None:
+                error = f"invalid tag: {text}"
+        else:
+            if game_offset is None:
+                if end is not None and line_offset >= end:
+                    return
+                game_offset = line_offset
+            movetext.append(text)
+
+    if game_offset is not None:
+        yield _game(headers, movetext, game_offset, error)
+
+
+def _line_before(file, position, block=4096):
+    """
+    :param file: file opened in binary mode
+    :param position: int. Offset in bytes of the start of a line.
+    :param block: int. Bytes read at a time, going back.
+    :return: str. The last line before the position that is not blank nor an escaped line, stripped, or '' if there
+             is none.
+    """
+    data = b''
+    while position > 0:
+        begin = max(0, position - block)
+        file.seek(begin)
+        data = file.read(position - begin) + data
+        position = begin
+        lines = data.split(b'\n')
+        # the first line may go on in the block before
+        for line in reversed(lines if position == 0 else lines[1:]):
+            text = line.decode('utf-8', 'replace').strip()
+            if text and text[0] != '%':
+                return text
+    return ''
+
+
+def _game(headers, movetext, offset, error):
+    """
+    :return: PgnGame
+    """
+    moves, result = [], None
+    if error is None:
+        try:
+            moves, result = parse_movetext(' '.join(movetext))
+        except PgnError as exception:
+            error = str(exception)
+        if error is None and result is not None and headers.get('Result', result) != result:
+            error = f"the result {result} does not match the Result tag {headers['Result']}"
+    return PgnGame(headers, moves, result, offset, error)
+
+
+def parse_san(board, san, moves=None):
+    """
+    :param board: Board
+    :param san: str. A move in the standard algebraic notation, as 'Nf3', 'exd5', 'O-O' or 'e8=Q+'.
+    :param moves: list of Move. The legal moves of the position, if they are known. If not, only the moves of the
+                  pieces the move can be are generated.
+    :return: Move. The only legal move that matches.
+    """
+    grid = board.grid
+    text = san.rstrip('+#!?')
+
+    if text in ('O-O', 'O-O-O', '0-0', '0-0-0'):
+        col = 6 if len(text) == 3 else 2
+        king_position = board.kings_positions[board.turn]
+        if king_position is None:
+            raise PgnError("no king to castle")
+        if moves is None:
+            king = grid[king_position[0]][king_position[1]]
+            moves = [] if king.castle else [Move(king_position, target) for target in king.castle_move(board)]
+        for move in moves:
+            (row, old_col), (_, new_col) = move.old_position, move.new_position
+            if move.old_position == king_position and new_col == col and abs(new_col - old_col) == 2:
+                return move
+        raise PgnError("illegal castle")
+
+    match = SAN.fullmatch(text)
+    if match is None:
+        raise PgnError(f"invalid move {san!r}")
+    letter, file, rank, square, promotion = match.groups()
+    type_of_piece = SAN_PIECES[letter] if letter else Pawn
+    target = parse_square(square)
+    promotion = SAN_PROMOTIONS[promotion] if promotion else None
+    if moves is None:
+        moves = _moves_to(board, type_of_piece, target, promotion)
+
+    candidates = []
+    for move in moves:
+        if move.new_position != target or move.promotion != promotion:
+            continue
+        row, col = move.old_position
+        if type(grid[row][col]) is not type_of_piece:
+            continue
+        if (file is not None and FILES[col] != file) or (rank is not None and 8 - row != int(rank)):
+            continue
+        candidates.append(move)
+
+    if len(candidates) != 1:
+        raise PgnError("illegal move" if not candidates else "ambiguous move")
+    return candidates[0]
+
+
+def _moves_to(board, type_of_piece, target, promotion):
+    """
+    :param board: Board
+    :param type_of_piece: class
+    :param target: tuple
+    :param promotion: str or None
+    :return: list of Move. The legal moves of the pieces of that type of the color to play to the square.
+    """
+    # only a pawn reaching the last row is promoted, and it must be
+    if (promotion is not None) != (type_of_piece is Pawn and target[0] in (0, 7)):
+        return []
+    color = board.turn
+    grid = board.grid
+    moves = []
+    for (row, col) in list(board.pieces_positions[color]):
+        piece = grid[row][col]
+        if type(piece) is not type_of_piece or target not in piece.valid_move(board):
+            continue
+        # the move is legal if it does not leave the king under attack
+        move = Move((row, col), target, promotion)
+        undo_info = board.make_move(move)
+        king_under_attack = board.in_check(color)
+        board.unmake_move(undo_info)
+        if not king_under_attack:
+            moves.append(move)
+    return moves
+
+
+def move_to_san(board, move, moves=None):
+    """
+    :param board: Board. The position before the move.
+    :param move: Move. A legal move.
+    :param moves: list of Move. The legal moves of the position, if they are known.
+    :return: str. The move in the standard algebraic notation, with + or # if it gives check or checkmate.
+    """
+    if moves is None:
+        moves = board.legal_moves(board.turn)
+    grid = board.grid
+    (old_row, old_col), (new_row, new_col) = move.old_position, move.new_position
+    piece = grid[old_row][old_col]
+    capture = grid[new_row][new_col] is not EMPTY or (type(piece) is Pawn and old_col != new_col)
+
+    if type(piece) is King and abs(new_col - old_col) == 2:
+        text = 'O-O' if new_col == 6 else 'O-O-O'
+    elif type(piece) is Pawn:
+        text = (FILES[old_col] + 'x' if capture else '') + square_name(move.new_position)
+        if move.promotion is not None:
+            text += '=' + PROMOTION_LETTERS[move.promotion].upper()
+    else:
+        others = [other.old_position for other in moves if other.new_position == move.new_position
+                  and other.old_position != move.old_position
+                  and type(grid[other.old_position[0]][other.old_position[1]]) is type(piece)]
+        disambiguation = ''
+        if others:
+            if all(col != old_col for _, col in others):
+                disambiguation = FILES[old_col]
+            elif all(row != old_row for row, _ in others):
+                disambiguation = str(8 - old_row)
+            else:
+                disambiguation = square_name(move.old_position)
+        text = SAN_LETTERS[type(piece)] + disambiguation + ('x' if capture else '') + square_name(move.new_position)
+
+    undo_info = board.make_move(move)
+    if board.in_check(board.turn):
+        text += '#' if not board.legal_moves(board.turn) else '+'
+    board.unmake_move(undo_info)
+    return text
+
+
+def replay(game, backend=Board):
+    """
+    Plays the moves of a game on a board, from the start position or from the position of its FEN tag. An invalid
+    FEN tag raises PgnError, as an illegal move does.
+    :param game: PgnGame
+    :param backend: class. Board or one of its subclasses.
+    :return: Board. The board at the end of the game.
+    """
+    if game.error is not None:
+        raise PgnError(game.error)
+    fen = game.headers.get('FEN')
+    try:
+        board = backend.from_fen(fen) if fen else backend()
+    except ValueError as error:
+        raise PgnError(str(error)) from None
+    for ply, san in enumerate(game.moves, 1):
+        try:
+            move = parse_san(board, san)
+        except PgnError as error:
+            raise PgnError(str(error), ply, san) from None
+        board.make_move(move)
+    return board
+
+
+def format_game(headers, moves, result='*'):
+    """
+    :param headers: dict. The tags of the game.
+    :param moves: list of str. SAN moves.
+    :param result: str
+    :return: str. The game in the PGN notation, lines of 80 characters at most.
+    """
+    lines = [f'[{tag} "{value}"]' for tag, value in headers.items()]
+    lines.append('')
+    tokens = []
+    for i, san in enumerate(moves):
+        tokens.append(f"{i // 2 + 1}. {san}" if i % 2 == 0 else san)
+    tokens.append(result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
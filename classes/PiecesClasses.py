@@ -1,12 +1,86 @@
-from main import (WIDTH_DISTANCE, HEIGHT_DISTANCE,
-                  SQUARE_HEIGHT, SQUARE_WIDTH, IMAGES)
+# (row, col) steps of the pieces. Remember that the row 0 is the top of the board (black side).
+KNIGHT_STEPS = ((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))
+KING_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+STRAIGHT_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+DIAGONAL_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def jump_table(steps):
+    """
+    :param steps: tuple of (row, col) steps
+    :return: list. table[row][col] is the tuple of squares of the board reached from (row, col) with one step.
+    """
+    return [[tuple((row + dr, col + dc) for dr, dc in steps if 0 <= row + dr < 8 and 0 <= col + dc < 8)
+             for col in range(8)] for row in range(8)]
+
+
+def ray_table(directions):
+    """
+    :param directions: tuple of (row, col) directions
+    :return: list. table[row][col] is a tuple with one ray per direction: the squares from (row, col) to the edge
+             of the board, ordered outward, so a ray can be walked until the first piece.
+    """
+    table = [[[] for _ in range(8)] for _ in range(8)]
+    for row in range(8):
+        for col in range(8):
+            for dr, dc in directions:
+                ray = []
+                r, c = row + dr, col + dc
+                while 0 <= r < 8 and 0 <= c < 8:
+                    ray.append((r, c))
+                    r, c = r + dr, c + dc
+                if ray:
+                    table[row][col].append(tuple(ray))
+            table[row][col] = tuple(table[row][col])
+    return table
+
+
+# computed once, when the module is imported
+SQUARES = [[(row, col) for col in range(8)] for row in range(8)]
+KNIGHT_TARGETS = jump_table(KNIGHT_STEPS)
+KING_TARGETS = jump_table(KING_STEPS)
+STRAIGHT_RAYS = ray_table(STRAIGHT_DIRECTIONS)
+DIAGONAL_RAYS = ray_table(DIAGONAL_DIRECTIONS)
+QUEEN_RAYS = [[STRAIGHT_RAYS[row][col] + DIAGONAL_RAYS[row][col] for col in range(8)] for row in range(8)]
+
+
+def slide(bo, color, rays):
+    """
+    Walks every ray until the first piece: an enemy piece can be captured, a piece of the same color stops
+    the ray before it.
+    :param bo: Board
+    :param color: str
+    :param rays: tuple of rays
+    :return: list
+    """
+    valid_moves = []
+    occupied = bo.occupied_positions
+    grid = bo.grid
+    for ray in rays:
+        for square in ray:
+            if square in occupied:
+                row, col = square
+                if grid[row][col].color != color:
+                    valid_moves.append(square)
+                break
+            valid_moves.append(square)
+    return valid_moves
+
+
+def jump(bo, color, targets):
+    """
+    :param bo: Board
+    :param color: str
+    :param targets: tuple of squares
+    :return: list. The targets that are not occupied by a piece of the same color.
+    """
+    same_color, _ = bo.get_all_pieces_positions(color)
+    return [square for square in targets if square not in same_color]
 
 
 class Piece:
 
-    IMAGES = IMAGES
-    COL_OFF_SET = WIDTH_DISTANCE
-    ROW_OFF_SET = HEIGHT_DISTANCE
+    __slots__ = ('color', 'row', 'col')
 
     def __init__(self, color, row, col):
         """
@@ -14,59 +88,50 @@ class Piece:
         :param row: int
         :param col: int
 
-        Besides that: we want to resize the images.
+        The pieces only know the rules of the game. Everything related to the drawing (images, pixel distances)
+        lives in the main file, so this module can be imported without pygame or a window.
         """
         self.color = color
         self.row = row
         self.col = col
-        self.horizontal_distance = self.col * SQUARE_WIDTH
-        self.vertical_distance = self.row * SQUARE_HEIGHT
-
-        self.image = None
-
-    def draw(self, win):
-        win.blit(self.image, (self.COL_OFF_SET + self.horizontal_distance,
-                              self.ROW_OFF_SET + self.vertical_distance))
-
-    def recalculate_distance(self, new_position):
-        new_row, new_col = new_position
-        self.horizontal_distance = new_col * SQUARE_WIDTH
-        self.vertical_distance = new_row * SQUARE_HEIGHT
 
 
 class Pawn(Piece):
 
+    __slots__ = ('first_move', 'index')
+
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
         self.first_move = True
         self.index = -1 if self.color == 'white' else 1
 
-        self.image = self.IMAGES['pawn'][self.color]
-
     def valid_move(self, bo):
-
+        """
+        The pawn moves one square forward (two if it is its first move) to empty squares, and captures
+        diagonally forward, en passant too (the square the other pawn jumped over, see Board.en_passant).
+        :param bo: Board
+        :return: list
+        """
         valid_moves = []
-        if self.first_move:
-            possible_moves = ((self.row + 2 * self.index, self.col), (self.row + self.index, self.col),
-                              (self.row + self.index, self.col - 1), (self.row + self.index, self.col + 1))
-
-        else:
-            # the possibles moves are checked by looking at front, front left, front right
-            possible_moves = ((self.row + self.index, self.col), (self.row + self.index, self.col - 1),
-                              (self.row + self.index, self.col + 1))
-
-        for i, move in enumerate(possible_moves):
-            row, col = move
-            if 0 <= row < 8 and 0 <= col < 8:
-                thing = bo.get_piece(row, col)
-                is_node = bo.check_node((row, col))
-                thing_row, thing_col = thing.row, thing.col
-                if is_node and i == 0:
-                    valid_moves.append(move)
-                if is_node and i == 1 and self.first_move:
-                    valid_moves.append(move)
-                if not is_node and thing_col != self.col and thing.color != self.color:
-                    valid_moves.append(move)
+        occupied = bo.occupied_positions
+        row = self.row + self.index
+        if not 0 <= row < 8:
+            return valid_moves
+
+        if (row, self.col) not in occupied:
+            valid_moves.append((row, self.col))
+            # the two squares move can not jump over a piece
+            if self.first_move and 0 <= row + self.index < 8 and (row + self.index, self.col) not in occupied:
+                valid_moves.append((row + self.index, self.col))
+
+        for col in (self.col - 1, self.col + 1):
+            if (row, col) in occupied:
+                if bo.grid[row][col].color != self.color:
+                    valid_moves.append((row, col))
+            elif (row, col) == bo.en_passant:
+                pawn = bo.grid[self.row][col]
+                if type(pawn) is Pawn and pawn.color != self.color:
+                    valid_moves.append((row, col))
 
         return valid_moves
 
@@ -76,70 +141,20 @@ class Pawn(Piece):
 
 class Rook(Piece):
 
+    __slots__ = ('castle', 'index')
+
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
-
-        self.image = self.IMAGES['rook'][self.color]
         self.castle = False
         self.index = -1 if self.color == 'white' else 1
 
     def valid_move(self, bo):
         """
-        The directions that will be used in this code block are defined the way they are because of the following
-        reason. In pygame, the origin is the left top corner. Because of that, the 8th row (7th for python) is the
-        bottom row of the chess board. So if we want to go:
-
-            -up: we need to go as nearest as possible to the 0th row (that is way we put max, because if there is a
-                 piece before the 0th row, we can't pass the piece).
-
-            -down: the goal is to go as nearest as possible to the 7th row. We put min because if there is a piece
-                   before the 7th row, we will not pass.
-
-            -left: same
-            -right: same
-
-        Since the position we want to filter in order to become a valid move must be in the square delimited by
-        this directions, we need to define very well this square.  The directions that are defined by min will be 0
-        (min movement) if they are empty. The directions defined by max will be 7 (max movement) if they are empty.
-        With this definition, we will get the right valid moves even if there are no pieces in between.
-
+        The rook moves along its row and its column until the first piece.
         :param bo: Board
-        :return: None
+        :return: list
         """
-
-        possible_moves = [(self.row + k, self.col) for k in range(-8, 8)
-                          if (self.row + k, self.col) != (self.row, self.col)]
-        possible_moves += [(self.row, self.col + k) for k in range(-8, 8)
-                           if (self.row, self.col + k) != (self.row, self.col)]
-
-        pieces_in_the_way_list = bo.get_pieces_in_the_way(possible_moves, self.color)
-        possible_moves_copy = possible_moves.copy()
-
-        up_pieces, down_pieces, left_pieces, right_pieces = [], [], [], []
-        for move in pieces_in_the_way_list:
-            piece_row, piece_col = move
-            if piece_row < self.row:
-                up_pieces.append(piece_row)
-            elif piece_row > self.row:
-                down_pieces.append(piece_row)
-            if piece_col < self.col:
-                left_pieces.append(piece_col)
-            elif piece_col > self.col:
-                right_pieces.append(piece_col)
-
-        max_left = max(left_pieces) if left_pieces else 0
-        max_right = min(right_pieces) if right_pieces else 7
-        max_up = max(up_pieces) if up_pieces else 0
-        max_down = min(down_pieces) if down_pieces else 7
-
-        same_color, _ = bo.get_all_pieces_positions(self.color)
-        for move in possible_moves_copy:
-            row, col = move
-            if max_up <= row <= max_down and max_left <= col <= max_right and move not in same_color:
-                continue
-            possible_moves.remove(move)
-
-        return possible_moves
+        return slide(bo, self.color, STRAIGHT_RAYS[self.row][self.col])
 
     def __str__(self):
         return f"Rook({self.row}, {self.col}, {self.color})"
@@ -147,15 +162,10 @@ class Rook(Piece):
 
 class Queen(Piece):
 
-    def __init__(self, color, row, col):
-        super().__init__(color, row, col)
-
-        self.image = self.IMAGES['queen'][self.color]
+    __slots__ = ()
 
     def valid_move(self, bo):
-        possible_moves = (Bishop(self.color, self.row, self.col).valid_move(bo)
-                          + Rook(self.color, self.row, self.col).valid_move(bo))
-        return possible_moves
+        return slide(bo, self.color, QUEEN_RAYS[self.row][self.col])
 
     def __str__(self):
         return f"Queen({self.row}, {self.col}, {self.color})"
@@ -163,86 +173,51 @@ class Queen(Piece):
 
 class King(Piece):
 
+    __slots__ = ('castle',)
+
     def __init__(self, color, row, col):
         super().__init__(color, row, col)
-
-        self.image = self.IMAGES['king'][self.color]
         self.castle = False
 
     def valid_move(self, bo):
-        possible_moves = [(self.row - 1, self.col), (self.row + 1, self.col), (self.row, self.col - 1),
-                          (self.row, self.col + 1), (self.row - 1, self.col + 1), (self.row - 1, self.col - 1),
-                          (self.row + 1, self.col - 1), (self.row + 1, self.col + 1)]
-
-        possible_moves_copy = possible_moves.copy()
-        same_color, _ = bo.get_all_pieces_positions(self.color)
-        for move in possible_moves_copy:
-            row, col = move
-            if 0 <= row <= 7 and 0 <= col <= 7 and move not in same_color:
-                continue
-            possible_moves.remove(move)
-
-        return possible_moves
+        return jump(bo, self.color, KING_TARGETS[self.row][self.col])
 
     def castle_move(self, bo):
+        """
+        The king can castle if neither the king nor the rook have moved (castle flag), the squares between them
+        are empty, and the king is not under attack on its square nor on the squares it goes through.
+        :param bo: Board
+        :return: list. The positions of the king after castling.
+        """
+        if self.castle:
+            return []
 
         rook_positions = {'white': {'short': (7, 7), 'long': (7, 0)},
                           'black': {'short': (0, 7), 'long': (0, 0)}}
 
         king_positions = {'white': (7, 4), 'black': (0, 4)}
 
-        rook_to_castle = rook_positions[self.color]
-        row_short, col_short = rook_to_castle['short']
-        row_long, col_long = rook_to_castle['long']
-
-        try:
-            short_castle_possible = not bo.get_piece(row_short, col_short).castle
-        except:
-            short_castle_possible = False
-
-        try:
-            long_castle_possible = not bo.get_piece(row_long, col_long).castle
-        except:
-            long_castle_possible = False
+        king_row, king_col = king_positions[self.color]
+        other_color = 'black' if self.color == 'white' else 'white'
+        if (self.row, self.col) != (king_row, king_col) or bo.is_square_attacked((king_row, king_col), other_color):
+            return []
 
-        # max long squares = 3, max short squares = 2
-        long_squares = []
-        short_squares = []
+        # empty squares between the king and the rook, squares the king goes through
+        castle_squares = {'short': ((5, 6), (5, 6)), 'long': ((1, 2, 3), (3, 2))}
 
-        castle_king_positions = [(rook_to_castle['short'][0], rook_to_castle['short'][1] - 1),
-                                 (rook_to_castle['long'][0], rook_to_castle['long'][1] + 2)]
+        castle_king_positions = []
+        for side in ('short', 'long'):
+            rook = bo.get_piece(*rook_positions[self.color][side])
+            if type(rook) is not Rook or rook.color != self.color or rook.castle:
+                continue
+            empty_cols, king_cols = castle_squares[side]
+            if not all(bo.check_node((king_row, col)) for col in empty_cols):
+                continue
+            if any(bo.is_square_attacked((king_row, col), other_color) for col in king_cols):
+                continue
+            castle_king_positions.append((king_row, king_cols[-1]))
 
-        _, diff_color = bo.get_all_pieces_positions(self.color)
-        king_row, king_col = king_positions[self.color]
-        for col in range(1, 7):
-            if col != king_col:
-                for (r, c) in diff_color:
-                    for move in bo.get_piece(r, c).valid_move(bo):
-                        if move == (king_row, col):
-                            return []
-
-                if not bo.check_node((king_row, col)):
-                    if col < king_col:
-                        long_squares.append(False)
-                    else:
-                        short_squares.append(False)
-                else:
-                    if col < king_col:
-                        long_squares.append(True)
-                    else:
-                        short_squares.append(True)
-
-        if all(short_squares) and all(long_squares) and short_castle_possible and long_castle_possible:
-            return castle_king_positions
-        if all(short_squares) and not all(long_squares) and short_castle_possible:
-            return [castle_king_positions[0]]
-        if not all(short_squares) and all(long_squares) and long_castle_possible:
-            return [castle_king_positions[1]]
-        if all(short_squares) and all(long_squares) and short_castle_possible:
-            return [castle_king_positions[0]]
-        if all(short_squares) and all(long_squares) and long_castle_possible:
-            return [castle_king_positions[1]]
-        return []
+        return castle_king_positions
 
     def __str__(self):
         return f"King({self.row}, {self.col}, {self.color})"
@@ -250,124 +225,26 @@ class King(Piece):
 
 class Bishop(Piece):
 
-    def __init__(self, color, row, col):
-        super().__init__(color, row, col)
-
-        self.image = self.IMAGES['bishop'][self.color]
+    __slots__ = ()
 
     def __str__(self):
         return f"Bishop({self.row}, {self.col}, {self.color})"
 
     def valid_move(self, bo):
         """
-        The idea is the same as the tower but know the possible moves are different. The bishop moves along the
-        diagonals, so the criteria to determinate if there is a piece in the way (making impossible
-        to continue along the same diagonal as the piece) changes.
-
-        We have calculated the pieces along the four diagonals the bishop has access to:
-
-            - top_right_diagonal. The max position in which the bishop can stand will be determined by the
-                                  min column to the right and the max row.
-            - The same reason for the others.
+        The bishop moves along its four diagonals until the first piece.
         :param bo: Board
         :return: list
         """
-
-        possible_moves = [(self.row + k, self.col + k) for k in range(-8, 8)
-                          if (self.row + k, self.col + k) != (self.row, self.col)]
-        possible_moves += [(self.row + k, self.col - k) for k in range(-8, 8)
-                           if (self.row + k, self.col - k) != (self.row, self.col)]
-        possible_moves_copy = possible_moves.copy()
-
-        pieces_in_the_way_list = bo.get_pieces_in_the_way(possible_moves, self.color)
-
-        right_top_diagonal, left_top_diagonal, right_bottom_diagonal, left_bottom_diagonal = [], [], [], []
-        max_top_right_col, max_top_left_col, max_bottom_right_col, max_bottom_left_col = [], [], [], []
-
-        for move in pieces_in_the_way_list:
-            row, col = move
-            # we check the diagonal where the position belongs.
-            if row < self.row and col > self.col:
-                right_top_diagonal.append(row)
-                max_top_right_col.append(col)
-            elif row < self.row and col < self.col:
-                left_top_diagonal.append(row)
-                max_top_left_col.append(col)
-            elif row > self.row and col > self.col:
-                right_bottom_diagonal.append(row)
-                max_bottom_right_col.append(col)
-            elif row > self.row and col < self.col:
-                left_bottom_diagonal.append(row)
-                max_bottom_left_col.append(col)
-
-        """
-        In the next block we are getting the limits of the bishop's movement. The top left and top right 
-        will be the maximum because for pygame up is bottom. The left and the right bottom diagonals use min. 
-        """
-        max_top_left = max(left_top_diagonal) if left_top_diagonal else 0
-        max_top_right = max(right_top_diagonal) if right_top_diagonal else 0
-        min_bottom_left = min(left_bottom_diagonal) if left_bottom_diagonal else 7
-        min_bottom_right = min(right_bottom_diagonal) if right_bottom_diagonal else 7
-
-        col_top_right = min(max_top_right_col) if max_top_right_col else 7
-        col_top_left = max(max_top_left_col) if max_top_left_col else 0
-        col_bottom_right = min(max_bottom_right_col) if max_bottom_right_col else 7
-        col_bottom_left = max(max_bottom_left_col) if max_bottom_left_col else 0
-
-        same_color, _ = bo.get_all_pieces_positions(self.color)
-
-        for move in possible_moves_copy:
-            row, col = move
-            condition = None
-            if 0 <= col <= 7 and 0 <= row <= 7 and move not in same_color:
-                # check top right, top left, bottom right, bottom left
-                top_right = row < self.row and col > self.col
-                top_left = row < self.row and col < self.col
-                bottom_right = row > self.row and col > self.col
-                bottom_left = row > self.row and col < self.col
-
-                if top_right:
-                    if max_top_right <= row and col <= col_top_right:
-                        condition = True
-                elif top_left:
-                    if max_top_left <= row and col >= col_top_left:
-                        condition = True
-                elif bottom_right:
-                    if row <= min_bottom_right and col <= col_bottom_right:
-                        condition = True
-                elif bottom_left:
-                    if row <= min_bottom_left and col >= col_bottom_left:
-                        condition = True
-                if not condition:
-                    possible_moves.remove((row, col))
-            else:
-                possible_moves.remove((row, col))
-
-        return possible_moves
+        return slide(bo, self.color, DIAGONAL_RAYS[self.row][self.col])
 
 
 class Knight(Piece):
 
-    def __init__(self, color, row, col):
-        super().__init__(color, row, col)
-
-        self.image = self.IMAGES['knight'][self.color]
+    __slots__ = ()
 
     def valid_move(self, bo):
-        possible_moves = [(self.row + 2, self.col + 1), (self.row + 2, self.col - 1),
-                          (self.row - 2, self.col + 1), (self.row - 2, self.col - 1),
-                          (self.row + 1, self.col + 2), (self.row + 1, self.col - 2),
-                          (self.row - 1, self.col + 2), (self.row - 1, self.col - 2)]
-        possible_moves_copy = possible_moves.copy()
-        same_color, _ = bo.get_all_pieces_positions(self.color)
-
-        for move in possible_moves_copy:
-            row, col = move
-            if 0 <= row <= 7 and 0 <= col <= 7 and move not in same_color:
-                continue
-            possible_moves.remove(move)
-
-        return possible_moves
+        return jump(bo, self.color, KNIGHT_TARGETS[self.row][self.col])
 
     def __str__(self):
         return f"Knight({self.row}, {self.col}, {self.color})"
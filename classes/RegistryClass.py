@@ -0,0 +1,300 @@
+import os
+import struct
+import time
+from array import array
+from collections import OrderedDict, deque
+
+from .BoardClass import Board, Move, PACKED_SIZE, SQUARES
+from .GameClass import Game
+from .StatsClass import percentile
+
+# A packed game is a header (halfmove clock and fullmove number of the start position), the start position packed
+# with Board.pack and the moves played from it, 2 bytes each: from square (6 bits), to square (6 bits) and promotion
+# (3 bits). A square is row * 8 + col. It is about 120 bytes for a game of 40 moves.
+GAME_HEADER = struct.Struct('>HH')
+MOVE_PROMOTIONS = {'Knight': 1, 'Bishop': 2, 'Rook': 3, 'Queen': 4}
+MOVE_PROMOTION_NAMES = {code: name for name, code in MOVE_PROMOTIONS.items()}
+LATENCY_SAMPLES = 10000
+
+
+def encode_move(move):
+    """
+    :param move: Move
+    :return: int
+    """
+    (old_row, old_col), (new_row, new_col) = move.old_position, move.new_position
+    return old_row << 9 | old_col << 6 | new_row << 3 | new_col | MOVE_PROMOTIONS.get(move.promotion, 0) << 12
+
+
+def decode_move(code):
+    """
+    :param code: int
+    :return: Move
+    """
+    return Move(SQUARES[code >> 9 & 7][code >> 6 & 7], SQUARES[code >> 3 & 7][code & 7],
+                MOVE_PROMOTION_NAMES.get(code >> 12))
+
+
+def pack_game(game, start):
+    """
+    :param game: Game
+    :param start: bytes. The start position of the game, from start_position.
+    :return: bytes
+    """
+    moves = array('H', (encode_move(undo_info[0]) for undo_info in game.board.history))
+    if moves.itemsize != 2:
+        raise ValueError("2 bytes moves are not supported on this platform")
+    return start + moves.tobytes()
+
+
+def unpack_game(data, backend=Board):
+    """
+    :param data: bytes. A game packed with pack_game.
+    :param backend: class. Board or one of its subclasses.
+    :return: Game. With the history of the moves, so the repetitions count and the moves can be taken back.
+    """
+    start = GAME_HEADER.size + PACKED_SIZE
+    halfmove_clock, fullmove_number = GAME_HEADER.unpack_from(data)
+    board = backend.unpack(data[GAME_HEADER.size:start])
+    board.halfmove_clock, board.fullmove_number = halfmove_clock, fullmove_number
+    moves = array('H')
+    moves.frombytes(data[start:])
+    # the moves were legal when they were played, so they are not checked again
+    for code in moves:
+        board.make_move(decode_move(code))
+    return Game(board)
+
+
+def start_position(board):
+    """
+    :param board: Board
+    :return: bytes. The header and the packed position before the first move of the history.
+    """
+    history = list(board.history)
+    for undo_info in reversed(history):
+        board.unmake_move(undo_info)
+    start = GAME_HEADER.pack(board.halfmove_clock, board.fullmove_number) + board.pack()
+    for undo_info in history:
+        board.make_move(undo_info[0])
+    return start
+
+
+class GameStore:
+    """
+    The packed games written to disk: one file where the games are appended, and the offset and size of every game
+    in memory. The space of the games taken out of the store is reused when the file is compacted, which happens
+    when more than half of it is not used.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: str. The file is created, or emptied if it exists: the store only lives as long as the process.
+        """
+        self.path = path
+        self.file = open(path, 'w+b')
+        # game id: (offset, size)
+        self.index = {}
+        self.size = 0
+        self.used = 0
+
+    def close(self):
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, game_id):
+        return game_id in self.index
+
+    def put(self, game_id, data):
+        """
+        :param game_id: int
+        :param data: bytes
+        :return: None
+        """
+        self.discard(game_id)
+        self.file.seek(self.size)
+        self.file.write(data)
+        self.index[game_id] = (self.size, len(data))
+        self.size += len(data)
+        self.used += len(data)
+
+    def pop(self, game_id):
+        """
+        :param game_id: int
+        :return: bytes. The game, which is not in the store anymore.
+        """
+        offset, size = self.index[game_id]
+        self.file.seek(offset)
+        data = self.file.read(size)
+        self.discard(game_id)
+        return data
+
+    def discard(self, game_id):
+        """
+        :param game_id: int. It does not need to be in the store.
+        :return: None
+        """
+        entry = self.index.pop(game_id, None)
+        if entry is None:
+            return
+        self.used -= entry[1]
+        if self.size > 1 << 20 and self.used < self.size // 2:
+            self.compact()
+
+    def compact(self):
+        """
+        Writes the games again at the start of the file, one after the other.
+        :return: None
+        """
+        self.file.flush()
+        entries = sorted(self.index.items(), key=lambda item: item[1][0])
+        offset = 0
+        for game_id, (old_offset, size) in entries:
+            # the games only move towards the start, so a game is never overwritten before it is read
+            if old_offset != offset:
+                self.file.seek(old_offset)
+                data = self.file.read(size)
+                self.file.seek(offset)
+                self.file.write(data)
+            self.index[game_id] = (offset, size)
+            offset += size
+        self.file.truncate(offset)
+        self.size = self.used = offset
+
+
+class GameRegistry:
+    """
+    Many games in one process with a bounded memory. Only the games used recently are kept as Game objects (a board
+    of piece objects, a few kilobytes each); the others are packed in bytes (about a hundred per game), and with a
+    store, only the most recent packed games stay in memory and the others are written to disk. A packed game is
+    rebuilt when it is asked for, by replaying its moves.
+    """
+
+    def __init__(self, capacity=1000, packed_capacity=None, store_path=None, backend=Board):
+        """
+        :param capacity: int. Games kept as Game objects.
+        :param packed_capacity: int or None. Packed games kept in memory when there is a store, the others go to the
+                                store. None for all of them.
+        :param store_path: str or None. The file of the store, None to keep every packed game in memory.
+        :param backend: class. Board or one of its subclasses, for the rebuilt games.
+        """
+        if capacity < 1:
+            raise ValueError(f"the capacity must be at least 1, not {capacity}")
+        self.capacity = capacity
+        self.packed_capacity = packed_capacity
+        self.backend = backend
+        self.store = GameStore(store_path) if store_path is not None else None
+        # game id: (Game, start position), the least recently used first
+        self.games = OrderedDict()
+        # game id: packed game, the least recently used first
+        self.packed = OrderedDict()
+        self.next_id = 1
+        self.rebuilds = 0
+        # seconds to rebuild a game, from memory or from the store
+        self.rebuild_times = deque(maxlen=LATENCY_SAMPLES)
+        self.store_rebuild_times = deque(maxlen=LATENCY_SAMPLES)
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.games) + len(self.packed) + (len(self.store) if self.store is not None else 0)
+
+    def __contains__(self, game_id):
+        return game_id in self.games or game_id in self.packed or (self.store is not None and game_id in self.store)
+
+    def add(self, game=None):
+        """
+        :param game: Game or None for a new game from the start position.
+        :return: int. The id of the game.
+        """
+        if game is None:
+            game = Game(self.backend())
+        game_id = self.next_id
+        self.next_id += 1
+        self.games[game_id] = (game, start_position(game.board))
+        self.evict()
+        return game_id
+
+    def get(self, game_id):
+        """
+        The game becomes the most recently used one. The Game of a game that was packed is a new object, so a Game
+        must not be kept after other games of the registry are used: it can be packed again.
+        :param game_id: int
+        :return: Game
+        """
+        entry = self.games.get(game_id)
+        if entry is not None:
+            self.games.move_to_end(game_id)
+            return entry[0]
+
+        start = time.perf_counter()
+        data = self.packed.pop(game_id, None)
+        times = self.rebuild_times
+        if data is None:
+            if self.store is None or game_id not in self.store:
+                raise KeyError(game_id)
+            data = self.store.pop(game_id)
+            times = self.store_rebuild_times
+        game = unpack_game(data, self.backend)
+        times.append(time.perf_counter() - start)
+        self.rebuilds += 1
+        self.games[game_id] = (game, data[:GAME_HEADER.size + PACKED_SIZE])
+        self.evict()
+        return game
+
+    def remove(self, game_id):
+        """
+        :param game_id: int
+        :return: None
+        """
+        if self.games.pop(game_id, None) is None and self.packed.pop(game_id, None) is None:
+            if self.store is None or game_id not in self.store:
+                raise KeyError(game_id)
+            self.store.discard(game_id)
+
+    def evict(self):
+        """
+        Packs the least recently used games over the capacity, and writes the packed games over the packed capacity
+        to the store.
+        :return: None
+        """
+        while len(self.games) > self.capacity:
+            game_id, (game, start) = self.games.popitem(last=False)
+            self.packed[game_id] = pack_game(game, start)
+        if self.store is None or self.packed_capacity is None:
+            return
+        while len(self.packed) > self.packed_capacity:
+            game_id, data = self.packed.popitem(last=False)
+            self.store.put(game_id, data)
+
+    def stats(self):
+        """
+        :return: dict. The games of every kind, the rebuilds, and the p50 and p99 latency of a rebuild in seconds,
+                 from memory and from the store.
+        """
+        stats = {'games': len(self.games), 'packed': len(self.packed),
+                 'stored': len(self.store) if self.store is not None else 0, 'rebuilds': self.rebuilds}
+        for name, times in (('rebuild', self.rebuild_times), ('store rebuild', self.store_rebuild_times)):
+            times = sorted(times)
+            for p in (50, 99):
+                stats[f"{name} p{p}"] = percentile(times, p)
+        return stats
@@ -0,0 +1,361 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .BoardClass import Board, Move
+from .BitboardClass import BitBoard
+from .ChannelClass import SpectatorChannel
+from .RegistryClass import GameRegistry
+from .StatsClass import percentile
+
+# The protocol is a line of ASCII text per message, ended by '\n'.
+#
+#   client                      server
+#   new                         game <id> white
+#   join <id>                   game <id> black, and start to both players
+#   watch <id>                  a snapshot of the game (see ChannelClass), and then its moves as deltas
+#   e2e4 (a move)               e2e4 to both players and the delta to the spectators, and end <result> <reason> to
+#                               all of them if the game ended
+#   stats                       stats <moves> <p50 ms> <p99 ms> (validation latency)
+#   quit                        the connection is closed
+#
+# A message that can not be served gets error <reason>, and a line longer than MAX_LINE bytes gets error line too
+# long before the connection is closed. A game ends by checkmate, stalemate, threefold repetition, or when a player
+# leaves (abandoned).
+BACKENDS = {'board': Board, 'bitboard': BitBoard}
+RESULTS = {'white': '1-0', 'black': '0-1', None: '1/2-1/2'}
+OTHER_COLOR = {'white': 'black', 'black': 'white'}
+MAX_LINE = 64
+# the moves sent to a worker process at once, at most
+MAX_BATCH = 256
+LATENCY_SAMPLES = 100000
+
+
+def validate_moves(backend, jobs):
+    """
+    Checks moves on packed positions, so it can run in a worker process: only 34 bytes and the move are sent for
+    every move.
+    :param backend: str. A key of BACKENDS.
+    :param jobs: list of (bytes, str). The positions, from Board.pack, and the moves in coordinate notation.
+    :return: list of tuple. As in check_move.
+    """
+    backend = BACKENDS[backend]
+    return [check_move(backend.unpack(packed), text) for packed, text in jobs]
+
+
+def check_move(board, text):
+    """
+    :param board: Board. It is left as it was.
+    :param text: str. The move in coordinate notation.
+    :return: tuple. (error or None if the move is legal, 'checkmate', 'stalemate' or None after the move)
+    """
+    try:
+        move = Move.parse(text)
+    except ValueError as error:
+        return str(error), None
+    if move not in board.legal_moves(board.turn):
+        return f"illegal move: {text}", None
+    undo_info = board.make_move(move)
+    status = None
+    if not board.legal_moves(board.turn):
+        status = 'checkmate' if board.in_check(board.turn) else 'stalemate'
+    board.unmake_move(undo_info)
+    return None, status
+
+
+class GameSession:
+    """
+    A game between two connections. Only one move of a game is validated at a time: the player to move is the only
+    one who can send a move, and the moves it sends while its last one is being validated are refused. The game
+    itself is in the registry of the server.
+    """
+
+    __slots__ = ('id', 'players', 'channel', 'pending', 'result')
+
+    def __init__(self, game_id, board):
+        """
+        :param game_id: int. The id of the game in the registry.
+        :param board: Board. The position the game starts from.
+        """
+        self.id = game_id
+        # color: asyncio.StreamWriter
+        self.players = {}
+        self.channel = SpectatorChannel(board)
+        self.pending = False
+        # (result, reason) when the game is over
+        self.result = None
+
+    def send(self, line):
+        """
+        :param line: str. Sent to both players, without waiting for them to read it.
+        :return: bytes. The line sent.
+        """
+        data = (line + '\n').encode()
+        for writer in self.players.values():
+            if not writer.is_closing():
+                writer.write(data)
+        return data
+
+
+class GameServer:
+    """
+    Hosts games between remote players over TCP. The connections are served by an asyncio event loop, and the moves
+    are validated in worker processes, so a slow validation never holds the other connections: the loop only reads,
+    writes and plays the moves that were found legal. The moves read in the same iteration of the loop are sent to
+    the workers in a few batches instead of one by one, since with thousands of connections the cost of sending a
+    task to a process is higher than the cost of validating a move.
+
+    The workers import the main module of the program, so a program that creates a server with workers must do it
+    under an if __name__ == "__main__" guard: without it, the first validation fails and the moves never get an
+    answer.
+    """
+
+    def __init__(self, workers=None, backend='bitboard', capacity=10000, store_path=None, packed_capacity=None):
+        """
+        :param workers: int or None. Worker processes that validate the moves, None for one per CPU, 0 to validate
+                        them in the event loop.
+        :param backend: str. A key of BACKENDS.
+        :param capacity: int. Games kept as Game objects, the others are packed (see GameRegistry).
+        :param store_path: str or None. A file for the packed games over packed_capacity.
+        :param packed_capacity: int or None
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend: {backend!r}")
+        self.backend = backend
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        # forked workers would keep a copy of the sockets open when they start, and a connection closed by the
+        # server would not end for the client: the workers are started from a clean process instead (forkserver
+        # where there is one, as on Linux, spawn elsewhere, as on Windows)
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.executor = (ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(start_method))
+                         if self.workers else None)
+        # (packed position, move, asyncio.Future) waiting to be sent to the workers
+        self.queue = []
+        self.registry = GameRegistry(capacity, packed_capacity, store_path, BACKENDS[backend])
+        # the games waiting for a player or being played: game id: GameSession
+        self.sessions = {}
+        self.server = None
+        self.moves = 0
+        # seconds from a move being read to its validation being done
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """
+        :param host: str
+        :param port: int. 0 for any free port.
+        :return: int. The port.
+        """
+        self.server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE, backlog=4096)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self, host='127.0.0.1', port=8765):
+        await self.start(host, port)
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+        self.registry.close()
+
+    def stats(self):
+        """
+        :return: tuple. (moves played, p50 and p99 validation latency in seconds)
+        """
+        latencies = sorted(self.latencies)
+        return self.moves, percentile(latencies, 50), percentile(latencies, 99)
+
+    async def handle(self, reader, writer):
+        """
+        Serves a connection until it is closed.
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        :return: None
+        """
+        session = color = None
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # a line longer than MAX_LINE: the connection is closed, as the rest of the line can not be read
+                    writer.write(b"error line too long\n")
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                received = time.perf_counter()
+                words = line.decode('ascii', 'replace').split()
+                if not words:
+                    continue
+                command = words[0]
+                if command == 'quit':
+                    break
+                elif command in ('new', 'join', 'watch') and session is not None and session.result is None:
+                    writer.write(b"error already in a game\n")
+                elif command == 'new':
+                    if session is not None:
+                        self.leave(session, color, writer)
+                    game_id = self.registry.add()
+                    session = GameSession(game_id, self.registry.get(game_id).board)
+                    color = 'white'
+                    session.players[color] = writer
+                    self.sessions[session.id] = session
+                    writer.write(f"game {session.id} white\n".encode())
+                elif command in ('join', 'watch') and len(words) == 2:
+                    joined = self.sessions.get(int(words[1])) if words[1].isdigit() else None
+                    if joined is None or (command == 'join' and 'black' in joined.players):
+                        writer.write(f"error no game {words[1]} to {command}\n".encode())
+                    elif command == 'watch':
+                        if session is not None:
+                            self.leave(session, color, writer)
+                        session, color = joined, None
+                        session.channel.subscribe(writer)
+                    else:
+                        if session is not None:
+                            self.leave(session, color, writer)
+                        session, color = joined, 'black'
+                        session.players[color] = writer
+                        writer.write(f"game {session.id} black\n".encode())
+                        session.send('start')
+                elif command == 'stats':
+                    moves, p50, p99 = self.stats()
+                    writer.write(f"stats {moves} {p50 * 1000:.3f} {p99 * 1000:.3f}\n".encode())
+                elif session is not None and len(words) == 1:
+                    await self.play(session, color, command, received, writer)
+                else:
+                    writer.write(f"error unexpected {command}\n".encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if session is not None:
+                self.leave(session, color, writer)
+            writer.close()
+
+    async def play(self, session, color, text, received, writer):
+        """
+        :param session: GameSession
+        :param color: str. The color of the player who sent the move.
+        :param text: str. The move.
+        :param received: float. When it was read, for the latency.
+        :param writer: asyncio.StreamWriter. The connection of the player.
+        :return: None
+        """
+        if session.result is not None:
+            error = "the game is over"
+        elif len(session.players) < 2:
+            error = "the game has not started"
+        elif session.pending or self.registry.get(session.id).board.turn != color:
+            error = "not your turn"
+        else:
+            board = self.registry.get(session.id).board
+            session.pending = True
+            try:
+                if self.executor is None:
+                    error, status = check_move(board, text)
+                else:
+                    error, status = await self.validate(board, text)
+            finally:
+                session.pending = False
+            self.latencies.append(time.perf_counter() - received)
+            if session.result is not None:
+                # the other player left while the move was validated
+                return
+        if error is not None:
+            writer.write(f"error {error}\n".encode())
+            return
+
+        # the game may have been packed and rebuilt while the move was validated
+        game = self.registry.get(session.id)
+        board = game.board
+        undo_info = board.make_move(Move.parse(text))
+        game.change_turn()
+        self.moves += 1
+        session.send(text)
+        session.channel.publish(board, undo_info[0], undo_info[2])
+        if status == 'checkmate':
+            self.end(session, RESULTS[color], status)
+        elif status == 'stalemate':
+            self.end(session, RESULTS[None], status)
+        elif board.repetitions() >= 3:
+            self.end(session, RESULTS[None], 'repetition')
+
+    def validate(self, board, text):
+        """
+        :param board: Board
+        :param text: str. The move.
+        :return: asyncio.Future. Its result is the one of check_move.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self.queue:
+            # after the other connections that are ready have been read
+            loop.call_soon(self.flush)
+        self.queue.append((board.pack(), text, future))
+        return future
+
+    def flush(self):
+        """
+        Sends the moves of the queue to the workers, a batch per worker.
+        :return: None
+        """
+        queue, self.queue = self.queue, []
+        loop = asyncio.get_running_loop()
+        size = min(MAX_BATCH, -(-len(queue) // self.workers))
+        for start in range(0, len(queue), size):
+            batch = queue[start:start + size]
+            results = loop.run_in_executor(self.executor, validate_moves, self.backend,
+                                           [(packed, text) for packed, text, _ in batch])
+            results.add_done_callback(functools.partial(self.resolve, batch))
+
+    @staticmethod
+    def resolve(batch, results):
+        """
+        :param batch: list of (packed position, move, asyncio.Future)
+        :param results: asyncio.Future. The results of validate_moves for the batch.
+        :return: None
+        """
+        if results.cancelled() or results.exception() is not None:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(results.exception() if not results.cancelled() else
+                                         asyncio.CancelledError())
+            return
+        for (_, _, future), result in zip(batch, results.result()):
+            # the connection can be gone
+            if not future.done():
+                future.set_result(result)
+
+    def end(self, session, result, reason):
+        """
+        :param session: GameSession
+        :param result: str
+        :param reason: str
+        :return: None
+        """
+        session.result = result, reason
+        session.channel.send(session.send(f"end {result} {reason}"))
+        self.sessions.pop(session.id, None)
+        self.registry.remove(session.id)
+
+    def leave(self, session, color, writer):
+        """
+        :param session: GameSession
+        :param color: str or None. The color of the player who left, None for a spectator.
+        :param writer: asyncio.StreamWriter. The connection that left.
+        :return: None
+        """
+        if color is None:
+            session.channel.unsubscribe(writer)
+            return
+        del session.players[color]
+        if session.result is None:
+            self.end(session, RESULTS[OTHER_COLOR[color]] if session.players else '*', 'abandoned')
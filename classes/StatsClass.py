@@ -0,0 +1,12 @@
+import math
+
+
+def percentile(values, p):
+    """
+    :param values: sorted list of numbers
+    :param p: float. Between 0 and 100.
+    :return: float. The nearest rank percentile.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values), max(1, math.ceil(p / 100 * len(values)))) - 1]
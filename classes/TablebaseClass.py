@@ -0,0 +1,532 @@
+import mmap
+import os
+import struct
+from array import array
+from itertools import product
+
+from .BoardClass import *
+
+# A tablebase has the value of every position of a material for the color to play, one byte per position:
+#   0: draw, an odd value v: the color to play mates in v plies, an even value v >= 2: it is mated in v - 2 plies,
+#   255: not a legal position.
+# A material is written as 'KQvK': the white pieces, 'v' and the black ones. Only the material with the stronger
+# pieces on the white side has a table, the other one is its mirror. The positions have no castling rights and no
+# en passant square, so the materials with pawns of both colors, where a pawn could be captured en passant, have no
+# table.
+#
+# The index of a position is the color to play (0 white, 1 black) followed by the square (row * 8 + col) of every
+# piece, 6 bits each, in the order of the material: the white pieces and then the black ones, kings first.
+# A file is a header of 16 bytes (magic and number of pieces) and the values of all the indexes.
+HEADER = struct.Struct('>4sB11x')
+MAGIC = b'CTB1'
+
+DRAW = 0
+ILLEGAL = 255
+# a legal position without a value yet, only while a table is generated
+UNKNOWN = 254
+MAX_PLIES = 253
+
+MATERIAL_ORDER = 'KQRBNP'
+DEFAULT_MATERIALS = ('KQvK', 'KRvK', 'KPvK')
+# nobody can mate with these pieces
+INSUFFICIENT_MATERIALS = {'KvK', 'KBvK', 'KNvK'}
+PROMOTION_PIECES = (Queen, Rook, Bishop, Knight)
+
+OTHER_COLOR = {'white': 'black', 'black': 'white'}
+COLOR_BITS = {'white': 0, 'black': 1}
+COLORS = ('white', 'black')
+
+# the geometry of the pieces, with the squares as numbers
+KING_SQUARES = [tuple(row * 8 + col for row, col in KING_TARGETS[sq >> 3][sq & 7]) for sq in range(64)]
+KNIGHT_SQUARES = [tuple(row * 8 + col for row, col in KNIGHT_TARGETS[sq >> 3][sq & 7]) for sq in range(64)]
+STRAIGHT, DIAGONAL = 1, 2
+SLIDER_LINES = {Rook: STRAIGHT, Bishop: DIAGONAL, Queen: STRAIGHT | DIAGONAL}
+SLIDER_RAYS = {
+    Rook: [tuple(tuple(r * 8 + c for r, c in ray) for ray in STRAIGHT_RAYS[sq >> 3][sq & 7]) for sq in range(64)],
+    Bishop: [tuple(tuple(r * 8 + c for r, c in ray) for ray in DIAGONAL_RAYS[sq >> 3][sq & 7]) for sq in range(64)],
+    Queen: [tuple(tuple(r * 8 + c for r, c in ray) for ray in QUEEN_RAYS[sq >> 3][sq & 7]) for sq in range(64)],
+}
+# for two squares on the same line: the kind of line and the squares between them (a bit per square)
+LINES = [[0] * 64 for _ in range(64)]
+BETWEEN = [[0] * 64 for _ in range(64)]
+for _sq in range(64):
+    for _line, _rays in ((STRAIGHT, STRAIGHT_RAYS), (DIAGONAL, DIAGONAL_RAYS)):
+        for _ray in _rays[_sq >> 3][_sq & 7]:
+            _mask = 0
+            for _row, _col in _ray:
+                LINES[_sq][_row * 8 + _col] = _line
+                BETWEEN[_sq][_row * 8 + _col] = _mask
+                _mask |= 1 << (_row * 8 + _col)
+# squares attacked by a pawn of every color
+PAWN_CAPTURES = {color: [tuple(row * 8 + col for row, col in ((sq // 8 + step, sq % 8 - 1),
+                                                                (sq // 8 + step, sq % 8 + 1))
+                               if 0 <= row < 8 and 0 <= col < 8) for sq in range(64)]
+                 for color, step in (('white', -1), ('black', 1))}
+
+
+def material_pieces(material):
+    """
+    :param material: str. As 'KQvK'.
+    :return: tuple of (type of piece, color) in the order of the index.
+    """
+    sides = material.split('v')
+    if (len(sides) != 2 or any(side.count('K') != 1 for side in sides)
+            or any(letter not in MATERIAL_ORDER for side in sides for letter in side)):
+        raise ValueError(f"invalid material {material!r}: it must be the white and the black pieces, with one king "
+                         f"each, as 'KQvK'")
+    return tuple((FEN_PIECES[letter.lower()], color) for color, side in zip(COLORS, sides)
+                 for letter in sorted(side, key=MATERIAL_ORDER.index))
+
+
+def material_of(pieces):
+    """
+    :param pieces: iterable of (type of piece, color, ...)
+    :return: str. The material, as 'KQvK'.
+    """
+    sides = {'white': [], 'black': []}
+    for type_of_piece, color, *_ in pieces:
+        sides[color].append(FEN_LETTERS[type_of_piece].upper())
+    return 'v'.join(''.join(sorted(sides[color], key=MATERIAL_ORDER.index)) for color in COLORS)
+
+
+def _strength(side):
+    """
+    :param side: str. The pieces of a color, in MATERIAL_ORDER.
+    :return: tuple. The side with more pieces, and then with the stronger pieces, is greater.
+    """
+    return len(side), tuple(-MATERIAL_ORDER.index(letter) for letter in side)
+
+
+def canonical_material(material):
+    """
+    :param material: str
+    :return: str. The same material with the stronger pieces on the white side, the one with a table.
+    """
+    white, black = material_of(material_pieces(material)).split('v')
+    return f"{white}v{black}" if _strength(white) >= _strength(black) else f"{black}v{white}"
+
+
+def has_pawns_of_both_colors(material):
+    """
+    :param material: str
+    :return: bool. Whether a pawn can be captured en passant, which the tables do not model.
+    """
+    white, _, black = material.partition('v')
+    return 'P' in white and 'P' in black
+
+
+def required_materials(material):
+    """
+    :param material: str
+    :return: list of str. The materials reached with a capture or a promotion, whose tables are needed to generate
+             the table of the material.
+    """
+    pieces = material_pieces(material)
+    reached = set()
+    for i, (type_of_piece, color) in enumerate(pieces):
+        rest = pieces[:i] + pieces[i + 1:]
+        if type_of_piece is not King:
+            reached.add(material_of(rest))
+        if type_of_piece is Pawn:
+            for promotion in PROMOTION_PIECES:
+                reached.add(material_of(rest + ((promotion, color),)))
+                # a capture that promotes
+                for j, (other_type, other_color) in enumerate(rest):
+                    if other_color != color and other_type is not King:
+                        reached.add(material_of(rest[:j] + rest[j + 1:] + ((promotion, color),)))
+    return sorted({canonical_material(reached_material) for reached_material in reached} - INSUFFICIENT_MATERIALS)
+
+
+def decode_value(value):
+    """
+    :param value: int or None. A byte of a table.
+    :return: tuple or None. ('win' | 'draw' | 'loss', plies to the mate) for the color to play, None if the
+             position is not legal or not in the tables.
+    """
+    if value is None or value == ILLEGAL:
+        return None
+    if value == DRAW:
+        return 'draw', 0
+    if value & 1:
+        return 'win', value
+    return 'loss', value - 2
+
+
+def _attacks(type_of_piece, color, sq, target, occupied):
+    """
+    :param type_of_piece: class
+    :param color: str
+    :param sq: int. The square of the piece.
+    :param target: int
+    :param occupied: int. A bit per occupied square.
+    :return: bool. The piece attacks the target square.
+    """
+    if type_of_piece is King:
+        return target in KING_SQUARES[sq]
+    if type_of_piece is Knight:
+        return target in KNIGHT_SQUARES[sq]
+    if type_of_piece is Pawn:
+        return target in PAWN_CAPTURES[color][sq]
+    return bool(LINES[sq][target] & SLIDER_LINES[type_of_piece]) and not BETWEEN[sq][target] & occupied
+
+
+class Tablebases:
+    """
+    The tables of a directory, one file per material ('KQvK.tb'), read through mmap the first time a position of
+    their material is probed: a probe is a lookup of one byte.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: str. It does not need to exist: then there are no tables.
+        """
+        self.directory = directory
+        self.tables = {}
+        self.files = []
+        names = os.listdir(directory) if os.path.isdir(directory) else []
+        # a table with pawns of both colors, from another generator, would miss the en passant captures
+        self.materials = {name[:-3] for name in names
+                          if name.endswith('.tb') and not has_pawns_of_both_colors(name[:-3])}
+        # positions with more pieces are never in the tables, and are not looked up
+        self.max_pieces = max((len(material) - 1 for material in self.materials), default=0)
+
+    def close(self):
+        for table in self.tables.values():
+            if table is not None:
+                table.close()
+        for file in self.files:
+            file.close()
+        self.tables = {}
+        self.files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def table(self, material):
+        """
+        :param material: str. A canonical material.
+        :return: mmap or None if there is no table for the material.
+        """
+        if material in self.tables:
+            return self.tables[material]
+        table = None
+        if material in self.materials:
+            path = os.path.join(self.directory, material + '.tb')
+            file = open(path, 'rb')
+            pieces = len(material) - 1
+            magic, count = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or count != pieces or file.seek(0, 2) != HEADER.size + 2 * 64 ** pieces:
+                file.close()
+                raise ValueError(f"{path} is not a tablebase of {material}")
+            table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.files.append(file)
+        self.tables[material] = table
+        return table
+
+    def value(self, pieces, turn):
+        """
+        :param pieces: list of (type of piece, color, square)
+        :param turn: str. The color to play.
+        :return: int or None. The byte of the position, None if its material has no table.
+        """
+        white, black = material_of(pieces).split('v')
+        if _strength(white) < _strength(black):
+            # the mirror position: the colors are swapped and the board is upside down
+            pieces = [(type_of_piece, OTHER_COLOR[color], sq ^ 56) for type_of_piece, color, sq in pieces]
+            turn = OTHER_COLOR[turn]
+            white, black = black, white
+        material = f"{white}v{black}"
+        if material in INSUFFICIENT_MATERIALS:
+            return DRAW
+        table = self.table(material)
+        if table is None:
+            return None
+        index = COLOR_BITS[turn]
+        for _, _, sq in sorted(pieces, key=lambda piece: (COLOR_BITS[piece[1]],
+                                                          MATERIAL_ORDER.index(FEN_LETTERS[piece[0]].upper()),
+                                                          piece[2])):
+            index = index << 6 | sq
+        return table[HEADER.size + index]
+
+    def probe(self, board):
+        """
+        :param board: Board
+        :return: tuple or None. ('win' | 'draw' | 'loss', plies to the mate) for the color to play, None if the
+                 position is not in the tables.
+        """
+        if (len(board.occupied_positions) > self.max_pieces or board.en_passant is not None
+                or board.castling_rights()):
+            return None
+        grid = board.grid
+        pieces = [(type(grid[row][col]), color, row * 8 + col)
+                  for color in COLORS for row, col in board.pieces_positions[color]]
+        return decode_value(self.value(pieces, board.turn))
+
+    def best_move(self, board):
+        """
+        The move that wins in the fewest plies, keeps the draw or loses in the most plies.
+        :param board: Board. The position is not changed.
+        :return: tuple or None. (Move, result, plies) as probe, None if the position is not in the tables.
+        """
+        probe = self.probe(board)
+        if probe is None:
+            return None
+        best, best_rank = None, None
+        for move in board.legal_moves(board.turn):
+            undo_info = board.make_move(move)
+            child = self.probe(board)
+            board.unmake_move(undo_info)
+            if child is None:
+                continue
+            result, plies = child
+            rank = {'loss': (2, -plies), 'draw': (1, 0), 'win': (0, plies)}[result]
+            if best_rank is None or rank > best_rank:
+                best, best_rank = move, rank
+        if best is None:
+            return None
+        return best, probe[0], probe[1]
+
+
+def generate_tablebase(material, directory):
+    """
+    Retrograde analysis: the checkmates are found first, and the values go back from them one ply at a time. A
+    position is won in n plies if a move reaches a position lost in n - 1 plies, and lost in n plies if all its moves
+    reach positions won in n - 1 plies at most. The positions left without a value are draws. The moves that capture
+    or promote leave the material, their values come from the tables of the materials they reach, which must be in
+    the directory (see generate_tablebases).
+    :param material: str. A canonical material, without pawns of both colors.
+    :param directory: str. The table is written to directory/material.tb.
+    :return: tuple. (legal positions, wins, draws, losses, longest mate in plies)
+    """
+    pieces = material_pieces(material)
+    if has_pawns_of_both_colors(material):
+        raise ValueError(f"{material} has pawns of both colors: the tables do not model the en passant captures")
+    tablebases = Tablebases(directory)
+    n = len(pieces)
+    per_color = 64 ** n
+    weights = [64 ** (n - 1 - i) for i in range(n)]
+    sides = {color: [i for i, (_, piece_color) in enumerate(pieces) if piece_color == color] for color in COLORS}
+    kings = {color: pieces.index((King, color)) for color in COLORS}
+    pawns = [i for i, (type_of_piece, _) in enumerate(pieces) if type_of_piece is Pawn]
+
+    values = bytearray([ILLEGAL]) * (2 * per_color)
+    # legal moves of every position that are not known to lose yet
+    counts = bytearray(2 * per_color)
+    mates = []
+    # ply: positions won or with one more losing move at that ply, because of a move that leaves the material
+    external_wins, external_losses = {}, {}
+
+    for turn, color in enumerate(COLORS):
+        other_color = OTHER_COLOR[color]
+        ours, theirs = sides[color], sides[other_color]
+        base = turn * per_color
+        for offset, squares in enumerate(product(range(64), repeat=n)):
+            if len(set(squares)) != n or any(squares[i] < 8 or squares[i] >= 56 for i in pawns):
+                continue
+            occupied = our_occupied = 0
+            for sq in squares:
+                occupied |= 1 << sq
+            for i in ours:
+                our_occupied |= 1 << squares[i]
+            # the king of the color that has just moved can not be in check
+            their_king = squares[kings[other_color]]
+            if any(_attacks(pieces[i][0], color, squares[i], their_king, occupied) for i in ours):
+                continue
+            index = base + offset
+
+            moves = 0
+            for i in ours:
+                type_of_piece = pieces[i][0]
+                sq = squares[i]
+                for target, captured, promotions in _moves(type_of_piece, color, sq, squares, theirs, occupied):
+                    if our_occupied >> target & 1:
+                        continue
+                    after = occupied & ~(1 << sq) | 1 << target
+                    king = target if i == kings[color] else squares[kings[color]]
+                    if any(_attacks(pieces[j][0], other_color, squares[j], king, after)
+                           for j in theirs if j != captured):
+                        continue
+                    if captured is None and promotions is None:
+                        moves += 1
+                        continue
+                    for promotion in promotions or (type_of_piece,):
+                        child = [(promotion if j == i else pieces[j][0], pieces[j][1], target if j == i else squares[j])
+                                 for j in range(n) if j != captured]
+                        value = tablebases.value(child, other_color)
+                        if value is None:
+                            raise ValueError(f"the table of {canonical_material(material_of(child))} is needed to "
+                                             f"generate {material}")
+                        moves += 1
+                        if value == DRAW:
+                            continue
+                        if value & 1:
+                            # the move loses: the position after it is won
+                            external_losses.setdefault(value + 1, array('I')).append(index)
+                        else:
+                            external_wins.setdefault(value - 1, array('I')).append(index)
+
+            if not moves:
+                in_check = any(_attacks(pieces[j][0], other_color, squares[j], squares[kings[color]], occupied)
+                               for j in theirs)
+                values[index] = 2 if in_check else DRAW
+                if in_check:
+                    mates.append(index)
+            else:
+                values[index] = UNKNOWN
+                counts[index] = moves
+    tablebases.close()
+
+    level, ply = mates, 0
+    last_external = max(list(external_wins) + list(external_losses), default=0)
+    while level or ply < last_external:
+        ply += 1
+        if ply > MAX_PLIES:
+            raise ValueError(f"{material} has mates longer than {MAX_PLIES} plies")
+        next_level = []
+        for index in external_wins.pop(ply, ()):
+            if values[index] == UNKNOWN:
+                values[index] = ply
+                next_level.append(index)
+        for index in external_losses.pop(ply, ()):
+            if values[index] == UNKNOWN:
+                counts[index] -= 1
+                if not counts[index]:
+                    values[index] = ply + 2
+                    next_level.append(index)
+        for index in level:
+            lost = not values[index] & 1
+            for parent in _parents(index, pieces, sides, weights, per_color):
+                if values[parent] != UNKNOWN:
+                    continue
+                if lost:
+                    values[parent] = ply
+                    next_level.append(parent)
+                else:
+                    counts[parent] -= 1
+                    if not counts[parent]:
+                        values[parent] = ply + 2
+                        next_level.append(parent)
+        level = next_level
+
+    values = values.translate(bytes(range(UNKNOWN)) + bytes((DRAW, ILLEGAL)))
+    path = os.path.join(directory, material + '.tb')
+    with open(path + '.tmp', 'wb') as file:
+        file.write(HEADER.pack(MAGIC, n))
+        file.write(values)
+    os.replace(path + '.tmp', path)
+
+    wins = sum(values.count(value) for value in range(1, MAX_PLIES + 1, 2))
+    draws = values.count(DRAW)
+    legal = len(values) - values.count(ILLEGAL)
+    longest = max((value - (0 if value & 1 else 2) for value in set(values) - {DRAW, ILLEGAL}), default=0)
+    return legal, wins, draws, legal - wins - draws, longest
+
+
+def _moves(type_of_piece, color, sq, squares, theirs, occupied):
+    """
+    The moves of a piece, without looking at the safety of the king.
+    :param type_of_piece: class
+    :param color: str
+    :param sq: int
+    :param squares: tuple. The squares of the pieces of the material.
+    :param theirs: list of int. The pieces of the other color.
+    :param occupied: int
+    :return: generator of (target, index of the captured piece or None, promotions or None). A target occupied by a
+             piece of the same color is also generated.
+    """
+    captures = {squares[j]: j for j in theirs}
+    if type_of_piece is Pawn:
+        step = -8 if color == 'white' else 8
+        target = sq + step
+        promotions = None if 8 <= target < 56 else PROMOTION_PIECES
+        if not occupied >> target & 1:
+            yield target, None, promotions
+            start_row = 6 if color == 'white' else 1
+            if sq >> 3 == start_row and not occupied >> (target + step) & 1:
+                yield target + step, None, None
+        for target in PAWN_CAPTURES[color][sq]:
+            if target in captures:
+                yield target, captures[target], promotions
+        return
+    if type_of_piece is King or type_of_piece is Knight:
+        for target in (KING_SQUARES if type_of_piece is King else KNIGHT_SQUARES)[sq]:
+            yield target, captures.get(target), None
+        return
+    for ray in SLIDER_RAYS[type_of_piece][sq]:
+        for target in ray:
+            if occupied >> target & 1:
+                yield target, captures.get(target), None
+                break
+            yield target, None, None
+
+
+def _parents(index, pieces, sides, weights, per_color):
+    """
+    The positions of the same material one move before: the color that is not to play takes back a move that does not
+    capture or promote.
+    :param index: int
+    :param pieces: tuple of (type of piece, color)
+    :param sides: dict. {color: indexes of its pieces}
+    :param weights: list of int
+    :param per_color: int
+    :return: generator of int
+    """
+    turn, offset = divmod(index, per_color)
+    squares = [offset // weight % 64 for weight in weights]
+    occupied = 0
+    for sq in squares:
+        occupied |= 1 << sq
+    color = COLORS[1 - turn]
+    base = (1 - turn) * per_color + offset
+    for i in sides[color]:
+        type_of_piece = pieces[i][0]
+        target = squares[i]
+        weight = weights[i]
+        if type_of_piece is Pawn:
+            step = 8 if color == 'white' else -8
+            origin = target + step
+            # a pawn is never on the first or the last row
+            if 8 <= origin < 56 and not occupied >> origin & 1:
+                yield base + (origin - target) * weight
+                if target >> 3 == (4 if color == 'white' else 3) and not occupied >> (origin + step) & 1:
+                    yield base + 2 * step * weight
+        elif type_of_piece is King or type_of_piece is Knight:
+            for origin in (KING_SQUARES if type_of_piece is King else KNIGHT_SQUARES)[target]:
+                if not occupied >> origin & 1:
+                    yield base + (origin - target) * weight
+        else:
+            for ray in SLIDER_RAYS[type_of_piece][target]:
+                for origin in ray:
+                    if occupied >> origin & 1:
+                        break
+                    yield base + (origin - target) * weight
+
+
+def generate_tablebases(materials, directory):
+    """
+    Generates the tables of the materials and, first, the missing tables they need.
+    :param materials: iterable of str. Without pawns of both colors.
+    :param directory: str. It is created if it does not exist.
+    :return: generator of (material, tuple of generate_tablebase), one per table as it is written
+    """
+    requested = [canonical_material(material) for material in materials]
+    for material in requested:
+        if has_pawns_of_both_colors(material):
+            raise ValueError(f"{material} has pawns of both colors: the tables do not model the en passant captures")
+    os.makedirs(directory, exist_ok=True)
+    done = set()
+
+    def visit(material, needed):
+        if material in done or material in INSUFFICIENT_MATERIALS:
+            return
+        done.add(material)
+        for required in required_materials(material):
+            yield from visit(required, True)
+        if not needed or not os.path.exists(os.path.join(directory, material + '.tb')):
+            yield material, generate_tablebase(material, directory)
+
+    for material in requested:
+        yield from visit(material, False)
@@ -0,0 +1,205 @@
+import numpy as np
+
+from .BoardClass import (Board, PACKED_PIECES, PACKED_SIZE, WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG)
+from .EngineClass import PIECE_VALUES
+
+# A batch of positions is a tensor of shape (N, PLANES, 8, 8) of uint8 (0 or 1), with the squares as in Board.grid
+# (the row 0 is the 8th rank). The planes 0 to 5 are the white pieces and 6 to 11 the black ones, in the order of
+# PACKED_PIECES (pawn, knight, bishop, rook, queen, king), so tensor[:, :12] is the board alone. The plane 12 is all
+# ones if black is to play, the planes 13 to 16 are all ones if the castle (white short, white long, black short,
+# black long) is allowed, and the plane 17 has the en passant square. It has what Board.pack has, so a position can
+# go from a board to a tensor and back.
+PIECE_PLANES = 12
+SIDE_PLANE = 12
+CASTLING_PLANES = (13, 14, 15, 16)
+CASTLING_FLAGS = (WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG)
+EN_PASSANT_PLANE = 17
+PLANES = 18
+
+PLANE_VALUES = np.array([PIECE_VALUES[type_of_piece] for type_of_piece in PACKED_PIECES], dtype=np.int32)
+
+# (row, col) steps
+KNIGHT_STEPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_STEPS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+ROOK_STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_STEPS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+
+
+def pack_boards(boards):
+    """
+    :param boards: iterable of Board
+    :return: numpy.ndarray. Shape (N, 34), uint8: the boards packed with Board.pack.
+    """
+    data = b''.join(board.pack() for board in boards)
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, PACKED_SIZE)
+
+
+def encode_packed(packed):
+    """
+    :param packed: numpy.ndarray. Shape (N, 34), uint8, as from pack_boards.
+    :return: numpy.ndarray. Shape (N, PLANES, 8, 8), uint8.
+    """
+    packed = np.asarray(packed, dtype=np.uint8).reshape(-1, PACKED_SIZE)
+    count = len(packed)
+    # the square 2 * i is in the low half of the byte i, the square 2 * i + 1 in the high half
+    codes = np.empty((count, 64), dtype=np.uint8)
+    codes[:, 0::2] = packed[:, :32] & 15
+    codes[:, 1::2] = packed[:, :32] >> 4
+
+    tensor = np.zeros((count, PLANES, 8, 8), dtype=np.uint8)
+    tensor[:, :PIECE_PLANES] = (codes[:, None, :] == np.arange(1, PIECE_PLANES + 1, dtype=np.uint8)[None, :, None]
+                                ).reshape(count, PIECE_PLANES, 8, 8)
+    flags = packed[:, 32]
+    tensor[:, SIDE_PLANE] = (flags >> 4 & 1)[:, None, None]
+    for plane, flag in zip(CASTLING_PLANES, CASTLING_FLAGS):
+        tensor[:, plane] = (flags & flag != 0)[:, None, None]
+    en_passant = packed[:, 33]
+    has_en_passant = np.nonzero(en_passant < 64)[0]
+    squares = en_passant[has_en_passant]
+    tensor[has_en_passant, EN_PASSANT_PLANE, squares >> 3, squares & 7] = 1
+    return tensor
+
+
+def encode(boards):
+    """
+    :param boards: iterable of Board
+    :return: numpy.ndarray. Shape (N, PLANES, 8, 8), uint8.
+    """
+    return encode_packed(pack_boards(boards))
+
+
+def decode_packed(tensor):
+    """
+    :param tensor: numpy.ndarray. Shape (N, PLANES, 8, 8), as from encode.
+    :return: numpy.ndarray. Shape (N, 34), uint8: the positions as Board.pack packs them.
+    """
+    tensor = np.asarray(tensor)
+    count = len(tensor)
+    pieces = tensor[:, :PIECE_PLANES].reshape(count, PIECE_PLANES, 64).astype(bool)
+    if (pieces.sum(axis=1) > 1).any():
+        raise ValueError("a square has more than one piece")
+    # the code of a piece is its plane + 1, and 0 is an empty square
+    codes = (pieces * np.arange(1, PIECE_PLANES + 1, dtype=np.uint8)[None, :, None]).max(axis=1).astype(np.uint8)
+
+    packed = np.zeros((count, PACKED_SIZE), dtype=np.uint8)
+    packed[:, :32] = codes[:, 0::2] | codes[:, 1::2] << 4
+    flags = np.where(tensor[:, SIDE_PLANE, 0, 0] != 0, 16, 0).astype(np.uint8)
+    for plane, flag in zip(CASTLING_PLANES, CASTLING_FLAGS):
+        flags |= np.where(tensor[:, plane, 0, 0] != 0, flag, 0).astype(np.uint8)
+    packed[:, 32] = flags
+    en_passant = tensor[:, EN_PASSANT_PLANE].reshape(count, 64).astype(bool)
+    packed[:, 33] = np.where(en_passant.any(axis=1), en_passant.argmax(axis=1), 64)
+    return packed
+
+
+def decode(tensor, backend=Board):
+    """
+    :param tensor: numpy.ndarray. Shape (N, PLANES, 8, 8).
+    :param backend: class. Board or one of its subclasses.
+    :return: list of Board. As in Board.unpack, without the history of the moves. Planes that no board can have
+             (castling rights without the king and the rook, an en passant square without a pawn to capture, not
+             one king of each color) raise ValueError, as a square with more than one piece does.
+    """
+    return [backend.unpack(row.tobytes()) for row in decode_packed(tensor)]
+
+
+def _shift(planes, row_step, col_step):
+    """
+    :param planes: numpy.ndarray. Shape (..., 8, 8).
+    :param row_step: int
+    :param col_step: int
+    :return: numpy.ndarray. Every square moved by the steps, the ones leaving the board are lost.
+    """
+    shifted = np.zeros_like(planes)
+    shifted[..., max(row_step, 0):8 + min(row_step, 0), max(col_step, 0):8 + min(col_step, 0)] = \
+        planes[..., max(-row_step, 0):8 + min(-row_step, 0), max(-col_step, 0):8 + min(-col_step, 0)]
+    return shifted
+
+
+def piece_counts(tensor):
+    """
+    :param tensor: numpy.ndarray. Shape (N, PLANES, 8, 8).
+    :return: numpy.ndarray. Shape (N, 12): the pieces of every plane.
+    """
+    return tensor[:, :PIECE_PLANES].sum(axis=(2, 3), dtype=np.int32)
+
+
+def material(tensor):
+    """
+    :param tensor: numpy.ndarray. Shape (N, PLANES, 8, 8).
+    :return: numpy.ndarray. Shape (N, 2): the value of the pieces of white and black, with the values of the
+             engine (a pawn is 100).
+    """
+    return piece_counts(tensor).reshape(-1, 2, 6) @ PLANE_VALUES
+
+
+def _moves(tensor, color):
+    """
+    The squares the pieces of a color attack, and how many pseudo-legal moves they have, for the whole batch at once.
+    A ray is followed one step at a time for every board: the rays of two pieces never meet in the same direction,
+    since a ray stops at the first piece, so counting the squares of every step counts every move once.
+    :param tensor: numpy.ndarray. Shape (N, PLANES, 8, 8).
+    :param color: int. 0 for white, 1 for black.
+    :return: tuple. (attacked squares, shape (N, 8, 8) of bool, moves, shape (N,) of int)
+    """
+    pieces = tensor[:, :PIECE_PLANES].astype(bool)
+    own = pieces[:, 6 * color:6 * color + 6]
+    other = pieces[:, 6 - 6 * color:12 - 6 * color]
+    own_occupied = own.any(axis=1)
+    other_occupied = other.any(axis=1)
+    occupied = own_occupied | other_occupied
+    free = ~own_occupied
+    attacked = np.zeros(occupied.shape, dtype=bool)
+    moves = np.zeros(len(tensor), dtype=np.int64)
+
+    for plane, steps in ((KNIGHT, KNIGHT_STEPS), (KING, KING_STEPS)):
+        for row_step, col_step in steps:
+            targets = _shift(own[:, plane], row_step, col_step)
+            attacked |= targets
+            moves += (targets & free).sum(axis=(1, 2))
+
+    for planes, steps in (((ROOK, QUEEN), ROOK_STEPS), ((BISHOP, QUEEN), BISHOP_STEPS)):
+        sliders = own[:, planes[0]] | own[:, planes[1]]
+        for row_step, col_step in steps:
+            ray = sliders
+            for _ in range(7):
+                ray = _shift(ray, row_step, col_step)
+                if not ray.any():
+                    break
+                attacked |= ray
+                moves += (ray & free).sum(axis=(1, 2))
+                ray = ray & ~occupied
+
+    pawns = own[:, PAWN]
+    forward = -1 if color == 0 else 1
+    for col_step in (-1, 1):
+        targets = _shift(pawns, forward, col_step)
+        attacked |= targets
+        moves += (targets & other_occupied).sum(axis=(1, 2))
+    pushes = _shift(pawns, forward, 0) & ~occupied
+    moves += pushes.sum(axis=(1, 2))
+    # a pawn pushed from its first row can be pushed again
+    first_push_row = np.zeros((8, 8), dtype=bool)
+    first_push_row[5 if color == 0 else 2] = True
+    jumps = _shift(pushes & first_push_row, forward, 0) & ~occupied
+    moves += jumps.sum(axis=(1, 2))
+    return attacked, moves
+
+
+def attack_maps(tensor):
+    """
+    :param tensor: numpy.ndarray. Shape (N, PLANES, 8, 8).
+    :return: numpy.ndarray. Shape (N, 2, 8, 8) of bool: the squares attacked by white and by black.
+    """
+    return np.stack([_moves(tensor, color)[0] for color in (0, 1)], axis=1)
+
+
+def mobility(tensor):
+    """
+    The pseudo-legal moves of every color: the moves that may leave the own king in check are counted, castles and
+    en passant captures are not, and a promotion is one move.
+    :param tensor: numpy.ndarray. Shape (N, PLANES, 8, 8).
+    :return: numpy.ndarray. Shape (N, 2): the moves of white and of black.
+    """
+    return np.stack([_moves(tensor, color)[1] for color in (0, 1)], axis=1)
@@ -0,0 +1,35 @@
+"""
+Generates endgame tablebases by retrograde analysis (see classes/TablebaseClass.py): the result and the distance to
+the mate of every position of the materials, for the engine, the hints and the adjudication of self_play.py.
+
+    python generate_tablebases.py
+    python generate_tablebases.py KQvKR KRvKB --directory tablebases
+
+By default the 3 pieces tables (KQvK, KRvK, KPvK) are generated, in about a minute. A 4 pieces table has 64 times
+more positions and takes much longer. The tables a material needs (the materials reached with a capture or a
+promotion) are generated first if they are not in the directory. Any 3 or 4 pieces material works but the ones with
+pawns of both colors (as KPvKP): the tables have no en passant square, so they would miss the en passant captures.
+"""
+import argparse
+import time
+
+from classes.TablebaseClass import DEFAULT_MATERIALS, generate_tablebases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('materials', nargs='*', default=list(DEFAULT_MATERIALS), help="materials, as KQvK")
+    parser.add_argument('--directory', default='tablebases')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        for material, (legal, wins, draws, losses, longest) in generate_tablebases(args.materials, args.directory):
+            print(f"{material:<7} {legal:9} positions: {wins} won, {draws} drawn, {losses} lost, longest mate "
+                  f"{longest} plies ({time.perf_counter() - start:.1f} s)")
+    except ValueError as error:
+        parser.error(str(error))
+
+
+if __name__ == "__main__":
+    main()
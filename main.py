@@ -1,5 +1,11 @@
 import pygame
+from concurrent.futures import ThreadPoolExecutor
+from classes.BoardClass import Board, Node
 from classes.GameClass import Game
+from classes.EngineClass import Engine
+from classes.BookClass import OpeningBook
+from classes.TablebaseClass import Tablebases
+from classes.AssetsClass import PIECE_COLORS, PIECE_NAMES, AssetSet
 import os
 
 pygame.init()
@@ -38,27 +44,64 @@ HEIGHT_DISTANCE = off_sets['up'] + SQUARE_OFF_SET['vertical']
 RECTANGLE_WIDTH = SQUARE_WIDTH - SQUARE_OFF_SET['horizontal'] / 2
 RECTANGLE_HEIGHT = SQUARE_HEIGHT - SQUARE_OFF_SET['vertical'] / 2
 
+# seconds the computer thinks every move, and every hint
+ENGINE_TIME = 1.0
+HINT_TIME = 0.5
+# opening book used by the computer and the hints, if the file exists (see build_book.py)
+BOOK_PATH = 'book.bin'
+# endgame tablebases used by the computer and the hints (see generate_tablebases.py)
+TABLEBASES_PATH = 'tablebases'
+# the scaled images are kept here between launches
+ASSET_CACHE = '.asset_cache'
+
+# frames per second at most. With EVENT_DRIVEN the loop sleeps until the next event when nothing is going on,
+# without it the window is drawn MAX_FPS times per second all the time.
+MAX_FPS = 60
+EVENT_DRIVEN = True
+# posted by the thread of the engine when a search is over
+SEARCH_DONE = pygame.USEREVENT + 1
+
 win = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
 pygame.display.set_caption('Chess multiplayer game')
 
-BACKGROUND = pygame.image.load(f'{Asset}/board_alt.png')
-BACKGROUND = pygame.transform.scale(BACKGROUND, (WIDTH, HEIGHT))
+# the board and the pieces of the asset set, scaled and converted once (see classes/AssetsClass.py)
+SPRITES = AssetSet(Asset, ASSET_CACHE).atlas((WIDTH, HEIGHT), (PIECE_WIDTH, PIECE_HEIGHT))
+BACKGROUND = SPRITES.board
+IMAGES = {piece: {color: SPRITES.pieces[(piece, color)] for color in PIECE_COLORS} for piece in PIECE_NAMES}
 
 font = pygame.font.Font(None, 50)
 
-IMAGES = {}
-for file in os.listdir(f"./Assets/"):
-    if file.endswith('.png') and "alt" not in file:
-        color, _ = file.split("_")
-        piece, _ = file.split("_")[1].split(".")
-        file = f"Assets/{file}"
-        if str(piece) not in IMAGES:
-            IMAGES[str(piece)] = [pygame.transform.scale(pygame.image.load(file), (PIECE_WIDTH, PIECE_HEIGHT))]
-            IMAGES[str(piece)] = {color: pygame.transform.scale(pygame.image.load(file),
-                                                                (PIECE_WIDTH, PIECE_HEIGHT))}
-        else:
-            IMAGES[str(piece)][color] = pygame.transform.scale(pygame.image.load(file),
-                                                               (PIECE_WIDTH, PIECE_HEIGHT))
+BACKGROUND_COLOR = (100, 100, 100)
+# the captured pieces are drawn above and below the board
+TRAY_RECTS = (pygame.Rect(0, 0, WINDOW_WIDTH, int(off_sets['up'])),
+              pygame.Rect(0, int(off_sets['down']), WINDOW_WIDTH, WINDOW_HEIGHT - int(off_sets['down'])))
+
+# what is on the screen since the last frame, so draw only redraws what changed
+last_frame = {}
+
+
+def piece_image(piece):
+    """
+    The pieces of the rules core do not know anything about images, so we look the image up by the name of the
+    class and the color of the piece.
+    :param piece: Piece
+    :return: pygame.Surface
+    """
+    return IMAGES[type(piece).__name__.lower()][piece.color]
+
+
+def piece_distance(piece):
+    """
+    Pixel position of the top left corner of a piece. It replaces the horizontal and vertical distances that the
+    pieces used to carry around.
+    :param piece: Piece
+    :return: tuple
+    """
+    return WIDTH_DISTANCE + piece.col * SQUARE_WIDTH, HEIGHT_DISTANCE + piece.row * SQUARE_HEIGHT
+
+
+def draw_piece(window, piece):
+    window.blit(piece_image(piece), piece_distance(piece))
 
 
 def display_menu(window, piece_color):
@@ -140,7 +183,7 @@ def draw_eaten_pieces(eaten_pieces, window):
             information = pieces_information[color]
             type_piece, _ = str(piece).split("(")
             positions = pieces_positions[color][type_piece]
-            pieces_colors[color][type_piece] = {piece.image}
+            pieces_colors[color][type_piece] = {piece_image(piece)}
             if type_piece not in information and type_piece not in ('Pawn', 'King', 'Queen'):
                 information[type_piece] = [(positions[0], positions[-1])]
             elif type_piece not in information and type_piece == 'Queen':
@@ -169,11 +212,97 @@ def draw_eaten_pieces(eaten_pieces, window):
                     window.blit(image, top_left_corner)
 
 
+def square_rect(row, col):
+    """
+    :param row: int
+    :param col: int
+    :return: pygame.Rect. The pixels of the square, the piece, its circle and its selection rectangle included.
+    """
+    return pygame.Rect(int(off_sets['left'] + col * SQUARE_WIDTH), int(off_sets['up'] + row * SQUARE_HEIGHT),
+                       int(SQUARE_WIDTH) + 1, int(SQUARE_HEIGHT) + 1)
+
+
+def clear(window, background, rect):
+    """
+    Draws the empty window (the background color and the board image) in a region.
+    :param window: pygame.Surface
+    :param background: pygame.Surface
+    :param rect: pygame.Rect
+    :return: None
+    """
+    window.fill(BACKGROUND_COLOR, rect)
+    window.blit(background, rect.topleft, rect.move(-OFF_SET, -OFF_SET))
+
+
+def draw_square(window, background, board, row, col, selection, marks):
+    """
+    :param window: pygame.Surface
+    :param background: pygame.Surface
+    :param board: Board
+    :param row: int
+    :param col: int
+    :param selection: tuple or None. (x, y, row, col) of the selected piece.
+    :param marks: tuple of the squares with a circle.
+    :return: pygame.Rect. The region drawn.
+    """
+    rect = square_rect(row, col)
+    clear(window, background, rect)
+    piece = board.grid[row][col]
+    if type(piece) is not Node:
+        draw_piece(window, piece)
+    if (row, col) in marks:
+        pygame.draw.circle(window, 'red', get_center_square(row, col), CIRCLE_RADIUS)
+    if selection is not None and selection[2:] == (row, col):
+        pygame.draw.rect(window, 'red', pygame.Rect(selection[0], selection[1], RECTANGLE_WIDTH, RECTANGLE_HEIGHT), 4)
+    return rect
+
+
 def draw(window, background, board, menu_info, click_info=None,
          valid_moves=None, pieces_eaten=None, show_valid_moves=True, check_mate_information=None):
-    from classes.BoardClass import Node
-
-    win.fill((100, 100, 100))
+    """
+    Only what changed since the last frame is drawn again and sent to the screen with display.update(rects): the
+    squares whose piece changed, the squares of the old and the new selection and circles, and the trays of the
+    captured pieces if a piece was captured or given back. The promotion menu and the end of game message are drawn
+    over the board, so the whole frame is drawn when they show up or go away, or when something changes under them.
+    :return: list of pygame.Rect. The regions of the window that were updated.
+    """
+    squares = tuple(None if type(piece) is Node else (type(piece), piece.color)
+                    for line in board.grid for piece in line)
+    selection, marks = None, ()
+    if click_info is not None and type(board.get_piece(click_info[2], click_info[3])) is not Node:
+        selection = tuple(click_info)
+        if valid_moves and show_valid_moves:
+            marks = tuple(valid_moves)
+    eaten = list(pieces_eaten or ())
+    overlay = (menu_info, check_mate_information)
+
+    previous = last_frame
+    if previous.get('window') is window and previous['background'] is background:
+        dirty = {i for i, square in enumerate(squares) if square != previous['squares'][i]}
+        if selection != previous['selection'] or marks != previous['marks']:
+            for old_selection in (previous['selection'], selection):
+                if old_selection is not None:
+                    dirty.add(old_selection[2] * 8 + old_selection[3])
+            dirty.update(row * 8 + col for row, col in previous['marks'] + marks)
+        eaten_changed = eaten != previous['eaten']
+        full = overlay != previous['overlay'] or (any(overlay) and (dirty or eaten_changed))
+    else:
+        full = True
+
+    last_frame.update(window=window, background=background, squares=squares, selection=selection, marks=marks,
+                      eaten=eaten, overlay=overlay)
+    if not full:
+        rects = [draw_square(window, background, board, i // 8, i % 8, selection, marks) for i in sorted(dirty)]
+        if eaten_changed:
+            for rect in TRAY_RECTS:
+                clear(window, background, rect)
+            draw_eaten_pieces(eaten, window)
+            rects.extend(TRAY_RECTS)
+        if rects:
+            pygame.display.update(rects)
+        return rects
+
+    win.fill(BACKGROUND_COLOR)
     window.blit(background, (OFF_SET, OFF_SET))
 
     if menu_info:
@@ -183,32 +312,29 @@ def draw(window, background, board, menu_info, click_info=None,
 
     for row in board.grid:
         for piece in row:
-            piece.draw(window)
+            if type(piece) is not Node:
+                draw_piece(window, piece)
 
-    if click_info is None:
-        pass
-    else:
-        x, y, row, col = click_info
-        if type(board.get_piece(row, col)) is Node:
-            pass
-        else:
-            if valid_moves and show_valid_moves:
-                for move in valid_moves:
-                    r, c = move
-                    center = get_center_square(r, c)
-                    pygame.draw.circle(window, 'red', center, CIRCLE_RADIUS)
-
-            pygame.draw.rect(window, 'red', pygame.Rect(x, y, RECTANGLE_WIDTH, RECTANGLE_HEIGHT), 4)
-    draw_eaten_pieces(pieces_eaten, win)
+    if selection is not None:
+        x, y, row, col = selection
+        for r, c in marks:
+            center = get_center_square(r, c)
+            pygame.draw.circle(window, 'red', center, CIRCLE_RADIUS)
+
+        pygame.draw.rect(window, 'red', pygame.Rect(x, y, RECTANGLE_WIDTH, RECTANGLE_HEIGHT), 4)
+    draw_eaten_pieces(eaten, win)
     if promotion:
         display_menu(window, menu_color)
     if check_mate_information:
-        text = font.render(f"{check_mate_information} player wins!", True, 'green', 'blue')
+        message = "Stalemate, it is a draw!" if check_mate_information == 'draw' else \
+            f"{check_mate_information} player wins!"
+        text = font.render(message, True, 'green', 'blue')
         another_game = font.render('If you want to play again press the SPACE key.', True, 'black', 'red')
         window.blit(text, (250, 100))
         window.blit(another_game, (10, 400))
 
     pygame.display.update()
+    return [window.get_rect()]
 
 
 def get_row_col(mouse_position):
@@ -244,36 +370,100 @@ def initial_state():
     return True, None, [], [], None, False, None
 
 
-def main():
+def start_search(searches, engine, game, time_limit):
+    """
+    :param searches: ThreadPoolExecutor
+    :param engine: Engine
+    :param game: Game. Its board is the one of the engine until the search is over.
+    :param time_limit: float
+    :return: Future of the SearchResult. SEARCH_DONE is posted when it is over.
+    """
+    search = searches.submit(engine.best_move, game, time_limit)
+    search.add_done_callback(lambda _: pygame.event.post(pygame.event.Event(SEARCH_DONE)))
+    return search
 
-    from classes.BoardClass import Board
 
+def event_loop(show_valid_moves=True, computer_color=None):
+    """
+    The window of the game until it is closed. When nothing happens the loop sleeps until the next event (see
+    EVENT_DRIVEN), and it never draws more than MAX_FPS frames per second. The computer and the hints think in a
+    thread, so the window keeps drawing and reading events while they do, and the end of the game is looked for
+    after the move is on the screen.
+    :param show_valid_moves: bool
+    :param computer_color: str or None. The color the computer plays.
+    :return: None
+    """
     (run, click_info, valid_moves, pieces_eaten, menu_info,
      select_piece_from_menu, check_mate_information) = initial_state()
 
     board = Board()
     game = Game(board)
+    engine = Engine(book=OpeningBook(BOOK_PATH) if os.path.exists(BOOK_PATH) else None,
+                    tablebases=Tablebases(TABLEBASES_PATH))
 
-    print("If you want to see the possible moves of the different pieces write True."
-          "If you do not want to see them write False")
-    show_valid_moves_string = input()
-
-    if show_valid_moves_string == 'True':
-        show_valid_moves = True
-    elif show_valid_moves_string == 'False':
-        show_valid_moves = False
+    # the engine plays on the board of the game, so a copy of it is drawn while it thinks
+    searches = ThreadPoolExecutor(max_workers=1)
+    search, search_kind, shown_board = None, None, None
+    status_pending = False
+    clock = pygame.time.Clock()
+    # moving the mouse does not wake the loop up
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
 
     promotion = None
 
     while run:
 
-        for event in pygame.event.get():
+        events = pygame.event.get()
+        if status_pending:
+            # the last move is already on the screen
+            check_mate_information = game.check_mate() or ('draw' if game.stalemate() else None)
+            status_pending = False
+        elif not events and EVENT_DRIVEN:
+            events = [pygame.event.wait()]
+
+        if game.color == computer_color and search is None and not check_mate_information and not promotion:
+            search, search_kind, shown_board = start_search(searches, engine, game, ENGINE_TIME), 'move', \
+                Board.unpack(game.board.pack())
+
+        for event in events:
             if event.type == pygame.QUIT:
+                if search is not None:
+                    # the search stops at its next look at the clock
+                    engine.deadline = 0
                 run = False
                 break
 
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # the window was covered: everything must be drawn again
+                last_frame.clear()
+
+            if event.type == SEARCH_DONE and search is not None and search.done():
+                result = search.result()
+                search, shown_board = None, None
+                if search_kind == 'move':
+                    print(f"computer plays {result.move}: depth {result.depth}, {result.nodes} nodes, "
+                          f"{result.nodes_per_second:.0f} nodes/s")
+                    captured = game.play(result.move)
+                    if captured is not None:
+                        pieces_eaten.append(captured)
+                    click_info, valid_moves = None, []
+                    status_pending = True
+                elif result.move is not None:
+                    # hint: the piece of the best move is selected and only its new square is shown
+                    hint = result.move
+                    print(f"hint: {hint}")
+                    row, col = hint.old_position
+                    x, y = normalize_position((row, col))
+                    click_info, valid_moves = game.select_piece(row, col, x, y)
+                    valid_moves = [hint.new_position]
+                continue
+
+            if search is not None:
+                # the board belongs to the engine until the search is over
+                continue
+
             if event.type == pygame.MOUSEBUTTONDOWN and not promotion and not select_piece_from_menu:
-                x, y = pygame.mouse.get_pos()
+                x, y = event.pos
                 if off_sets['left'] <= x <= off_sets['right'] and off_sets['up'] <= y <= off_sets['down']:
                     game.track_kings()
                     if game.piece is None:
@@ -290,20 +480,38 @@ def main():
                             pieces_eaten.append(old_piece)
 
                 promotion = game.any_promotion()
-                check_mate_information = game.check_mate()
+                status_pending = True
                 if promotion:
                     menu_info = game.color, promotion[0]
                     select_piece_from_menu = True
 
             elif event.type == pygame.MOUSEBUTTONDOWN and promotion and select_piece_from_menu:
-                x, y = pygame.mouse.get_pos()
+                x, y = event.pos
                 if choose_piece_of_menu(x, y):
                     menu_piece = choose_piece_of_menu(x, y)
                     game.promote(menu_piece, promotion[-1])
+                    status_pending = True
                     menu_info = None
                 select_piece_from_menu = False
                 promotion = False
 
+            if (event.type == pygame.KEYDOWN and event.key == pygame.K_BACKSPACE
+                    and not promotion and not check_mate_information):
+                # take back the last move, and the answer of the computer too
+                captured = game.take_back()
+                if captured in pieces_eaten:
+                    pieces_eaten.remove(captured)
+                while game.color == computer_color and game.board.history:
+                    captured = game.take_back()
+                    if captured in pieces_eaten:
+                        pieces_eaten.remove(captured)
+                click_info, valid_moves = None, []
+
+            if (event.type == pygame.KEYDOWN and event.key == pygame.K_h
+                    and not promotion and not check_mate_information):
+                search, search_kind, shown_board = start_search(searches, engine, game, HINT_TIME), 'hint', \
+                    Board.unpack(game.board.pack())
+
             if event.type == pygame.KEYDOWN and check_mate_information:
                 key = pygame.KEYDOWN
                 another_game = game.another_game(key)
@@ -316,9 +524,35 @@ def main():
                     board = Board()
                     game = Game(board)
 
-        draw(win, BACKGROUND, game.board, menu_info,
+        if not run:
+            break
+        draw(win, BACKGROUND, shown_board or game.board, menu_info,
              click_info, valid_moves, pieces_eaten,
              show_valid_moves, check_mate_information)
+        clock.tick(MAX_FPS)
+
+    searches.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+
+    print("If you want to see the possible moves of the different pieces write True."
+          "If you do not want to see them write False")
+    show_valid_moves_string = input()
+
+    show_valid_moves = True
+    if show_valid_moves_string == 'True':
+        show_valid_moves = True
+    elif show_valid_moves_string == 'False':
+        show_valid_moves = False
+
+    print("If you want to play against the computer write the color it plays (white or black). "
+          "If you want to play against another player press Enter")
+    computer_color = input().strip().lower()
+    if computer_color not in ('white', 'black'):
+        computer_color = None
+
+    event_loop(show_valid_moves, computer_color)
     quit()
 
 
@@ -0,0 +1,147 @@
+"""
+Counts the leaf nodes of the tree of legal moves (perft) of the start position and of a set of standard tricky
+positions, and checks them against the known counts. It measures how fast the move generation is and catches the
+bugs of the rules (castling, promotions, en passant, pins and checks).
+
+    python perft.py --depth 3
+    python perft.py --depth 4 --position kiwipete --divide
+    python perft.py --depth 3 --backend board --output perft.json
+    python perft.py --depth 2 --fen "8/8/8/8/8/8/8/K6k w - - 0 1"
+
+The exit code is 1 if a count does not match the known one.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from classes.BoardClass import Board
+from classes.BitboardClass import BitBoard
+
+BACKENDS = {'board': Board, 'bitboard': BitBoard}
+
+# name: (fen, leaf nodes at depth 1, 2, ...)
+POSITIONS = {
+    'start': ('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+              (20, 400, 8902, 197281, 4865609, 119060324)),
+    'kiwipete': ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+                 (48, 2039, 97862, 4085603, 193690690)),
+    'endgame': ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+                (14, 191, 2812, 43238, 674624, 11030083)),
+    'promotions': ('r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+                   (6, 264, 9467, 422333, 15833292)),
+    'discovered': ('rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+                   (44, 1486, 62379, 2103487, 89941194)),
+    'middlegame': ('r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+                   (46, 2079, 89890, 3894594, 164075551)),
+}
+
+
+def divide(board, depth):
+    """
+    The leaf nodes under every legal move of the position.
+    :param board: Board
+    :param depth: int. At least 1.
+    :return: dict. {move in coordinate notation: nodes}
+    """
+    color = board.turn
+    other_color = 'black' if color == 'white' else 'white'
+    counts = {}
+    for move in board.legal_moves(color):
+        undo_info = board.make_move(move)
+        counts[str(move)] = board.perft(other_color, depth - 1)
+        board.unmake_move(undo_info)
+    return counts
+
+
+def run(backend, name, fen, depth, expected=None, split=False):
+    """
+    :param backend: class. Board or BitBoard.
+    :param name: str
+    :param fen: str
+    :param depth: int
+    :param expected: int or None. The known count.
+    :param split: bool. Count the nodes under every move too (divide).
+    :return: dict
+    """
+    board = backend.from_fen(fen)
+    start = time.perf_counter()
+    if split:
+        counts = divide(board, depth)
+        nodes = sum(counts.values())
+    else:
+        counts = None
+        nodes = board.perft(board.turn, depth)
+    elapsed = time.perf_counter() - start
+
+    result = {'name': name, 'fen': fen, 'depth': depth, 'nodes': nodes, 'expected': expected,
+              'ok': expected is None or nodes == expected, 'seconds': elapsed,
+              'nodes_per_second': nodes / elapsed if elapsed else None}
+    if counts is not None:
+        result['divide'] = counts
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--position', action='append', choices=sorted(POSITIONS),
+                        help="a standard position (can be repeated), by default all of them")
+    parser.add_argument('--fen', action='append', default=[], help="a position of your own (can be repeated)")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='bitboard')
+    parser.add_argument('--divide', action='store_true', help="count the nodes under every legal move")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.depth < 1:
+        parser.error("the depth must be at least 1")
+
+    jobs = []
+    names = args.position or ([] if args.fen else list(POSITIONS))
+    for name in names:
+        fen, counts = POSITIONS[name]
+        jobs.append((name, fen, counts[args.depth - 1] if args.depth <= len(counts) else None))
+    for i, fen in enumerate(args.fen, 1):
+        try:
+            BACKENDS[args.backend].from_fen(fen)
+        except ValueError as error:
+            parser.error(str(error))
+        jobs.append((f"fen {i}", fen, None))
+
+    backend = BACKENDS[args.backend]
+    results = []
+    for name, fen, expected in jobs:
+        result = run(backend, name, fen, args.depth, expected, args.divide)
+        results.append(result)
+
+        if args.divide:
+            for move, nodes in sorted(result['divide'].items()):
+                print(f"  {move:<6} {nodes:>12}")
+        if expected is None:
+            status = '-'
+        else:
+            status = 'ok' if result['ok'] else f"FAIL (expected {expected})"
+        nodes_per_second = f"{result['nodes_per_second']:12.0f}" if result['nodes_per_second'] else f"{'-':>12}"
+        print(f"{name:<12} depth {args.depth}: {result['nodes']:>12} nodes in {result['seconds']:8.3f} s "
+              f"({nodes_per_second} nodes/s) {status}")
+
+    total_nodes = sum(result['nodes'] for result in results)
+    total_seconds = sum(result['seconds'] for result in results)
+    if len(results) > 1 and total_seconds:
+        print(f"{'total':<12} depth {args.depth}: {total_nodes:>12} nodes in {total_seconds:8.3f} s "
+              f"({total_nodes / total_seconds:12.0f} nodes/s)")
+
+    if args.output:
+        report = {'backend': args.backend, 'depth': args.depth, 'python': platform.python_version(),
+                  'nodes': total_nodes, 'seconds': total_seconds,
+                  'nodes_per_second': total_nodes / total_seconds if total_seconds else None, 'results': results}
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if not all(result['ok'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
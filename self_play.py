@@ -0,0 +1,147 @@
+"""
+Plays complete games without the window, choosing the moves at random or with the engine, in worker processes. Every
+game is played until checkmate, stalemate, threefold repetition, a move cap or, with --tablebases, a position of the
+tablebases, and written to a JSON lines file as soon as it ends. It stresses the rules of the game: checkmate,
+promotions, castling and en passant show up in thousands of positions nobody would play by hand.
+
+    python self_play.py --games 1000 --output games.jsonl
+    python self_play.py --games 20 --players engine --engine-time 0.05 --workers 8
+    python self_play.py --games 200 --verify
+    python self_play.py --games 100 --tablebases tablebases
+
+With --verify, every position is checked against the other backend of the board (same legal moves) and against a
+zobrist key computed from scratch, and the run fails at the first difference.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from classes.BoardClass import Board
+from classes.BitboardClass import BitBoard
+from classes.EngineClass import Engine
+from classes.GameClass import Game
+from classes.StatsClass import percentile
+from classes.TablebaseClass import Tablebases
+
+BACKENDS = {'board': Board, 'bitboard': BitBoard}
+RESULTS = {'white': '1-0', 'black': '0-1', None: '1/2-1/2'}
+
+# the engine and the tablebases of the worker process, kept from game to game
+_engine = None
+_tablebases = None
+
+
+def verify(board):
+    """
+    :param board: Board
+    :return: None. It raises AssertionError if the position is not consistent.
+    """
+    other_backend = BitBoard if type(board) is Board else Board
+    other = other_backend.unpack(board.pack())
+    moves, other_moves = sorted(board.legal_moves(board.turn)), sorted(other.legal_moves(other.turn))
+    if moves != other_moves:
+        raise AssertionError(f"{type(board).__name__} and {other_backend.__name__} do not agree on the legal "
+                             f"moves: {sorted(map(str, set(moves) ^ set(other_moves)))}")
+    if board.zobrist_key != board.compute_zobrist_key():
+        raise AssertionError("the zobrist key of the board is not the one of the position")
+
+
+def play_game(job):
+    """
+    :param job: tuple. (index, seed, players, backend, max_plies, engine_time, opening, check, tablebases directory
+                or None)
+    :return: dict. The moves in coordinate notation, the result and how the game ended.
+    """
+    global _engine, _tablebases
+    index, seed, players, backend, max_plies, engine_time, opening, check, tablebases_directory = job
+    chooser = random.Random(seed)
+    game = Game(BACKENDS[backend]())
+    if tablebases_directory is not None and _tablebases is None:
+        _tablebases = Tablebases(tablebases_directory)
+    if players == 'engine' and _engine is None:
+        _engine = Engine(tablebases=_tablebases)
+
+    start = time.perf_counter()
+    moves = []
+    winner, termination = None, 'move cap'
+    while len(moves) < max_plies:
+        if check:
+            verify(game.board)
+        legal_moves = game.legal_moves()
+        if not legal_moves:
+            winner = game.check_mate()
+            termination = 'checkmate' if winner else 'stalemate'
+            break
+        if game.board.repetitions() >= 3:
+            termination = 'repetition'
+            break
+        if _tablebases is not None:
+            adjudication = game.adjudicate(_tablebases)
+            if adjudication is not None:
+                winner, termination = adjudication[0], 'tablebase'
+                break
+        # the engine always plays the same game, so the first moves are random
+        if players == 'engine' and len(moves) >= opening:
+            move = _engine.best_move(game, engine_time).move
+        else:
+            move = chooser.choice(legal_moves)
+        game.play(move)
+        moves.append(str(move))
+
+    return {'game': index, 'seed': seed, 'players': players, 'backend': backend, 'plies': len(moves),
+            'result': RESULTS[winner] if termination != 'move cap' else '*', 'termination': termination,
+            'seconds': time.perf_counter() - start, 'moves': moves}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--players', choices=('random', 'engine'), default='random')
+    parser.add_argument('--engine-time', type=float, default=0.05, help="seconds per move of the engine")
+    parser.add_argument('--opening', type=int, default=4, help="random moves before the engine plays")
+    parser.add_argument('--max-plies', type=int, default=400, help="a game without a result ends here")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='bitboard')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0, help="the game i uses the seed + i")
+    parser.add_argument('--verify', action='store_true', help="check every position against the other backend")
+    parser.add_argument('--tablebases', help="end the games that reach a position of the tablebases of this directory")
+    parser.add_argument('--output', default='games.jsonl')
+    args = parser.parse_args()
+
+    jobs = [(i, args.seed + i, args.players, args.backend, args.max_plies, args.engine_time, args.opening, args.verify,
+             args.tablebases) for i in range(args.games)]
+
+    latencies = []
+    terminations = {}
+    start = time.perf_counter()
+    with open(args.output, 'w') as file:
+        if args.workers > 1:
+            pool = multiprocessing.Pool(args.workers)
+            games = pool.imap_unordered(play_game, jobs)
+        else:
+            pool = None
+            games = map(play_game, jobs)
+        try:
+            for result in games:
+                file.write(json.dumps(result) + '\n')
+                file.flush()
+                latencies.append(result['seconds'])
+                terminations[result['termination']] = terminations.get(result['termination'], 0) + 1
+        finally:
+            if pool is not None:
+                pool.terminate()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{len(latencies)} games in {elapsed:.2f} s ({len(latencies) / elapsed:.2f} games/s) "
+          f"with {args.workers} workers, written to {args.output}")
+    print("ended by " + ", ".join(f"{name}: {count}" for name, count in sorted(terminations.items())))
+    print("game latency: " + ", ".join(f"p{p} {percentile(latencies, p) * 1000:.1f} ms" for p in (50, 90, 99))
+          + f", max {latencies[-1] * 1000 if latencies else 0:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Hosts games between remote players over TCP (see classes/ServerClass.py for the protocol): a player sends new and
+gets the number of the game, the other one joins it, and then they send their moves in coordinate notation.
+
+    python server.py
+    python server.py --host 0.0.0.0 --port 8765 --workers 4
+
+The moves are validated in --workers processes (one per CPU by default, 0 to validate them in the event loop). Only
+the --capacity games used last are kept as Game objects, the others are packed, and with --store the packed games
+over --packed-capacity are written to that file. The workers import this module, which is why the server starts
+under the if __name__ == "__main__" guard; a program that creates a GameServer with workers needs one too.
+"""
+import argparse
+import asyncio
+
+from classes.ServerClass import BACKENDS, GameServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='bitboard')
+    parser.add_argument('--capacity', type=int, default=10000, help="games kept unpacked in memory")
+    parser.add_argument('--store', help="a file for the packed games over --packed-capacity")
+    parser.add_argument('--packed-capacity', type=int, default=100000)
+    args = parser.parse_args()
+
+    server = GameServer(args.workers, args.backend, args.capacity, args.store, args.packed_capacity)
+    print(f"serving on {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
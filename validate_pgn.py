@@ -0,0 +1,96 @@
+"""
+Replays every game of a PGN file with the rules of the game, reading one game at a time, and reports the games that
+are malformed or have an illegal move without stopping. Big files are split in parts read by worker processes.
+
+    python validate_pgn.py games.pgn
+    python validate_pgn.py games.pgn --workers 8 --errors errors.jsonl
+
+Every error is written as a JSON line with the offset in bytes of the game in the file, the ply and the move. When
+the file is split, a part starts at the first tag line after a movetext line, where the game before it ends.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from classes.BoardClass import Board
+from classes.BitboardClass import BitBoard
+from classes.PgnClass import PgnError, read_games, replay
+
+BACKENDS = {'board': Board, 'bitboard': BitBoard}
+
+
+def validate_part(job):
+    """
+    :param job: tuple. (path, start, end, backend): the games of the file that start in [start, end).
+    :return: tuple. (games, moves, list of errors)
+    """
+    path, start, end, backend = job
+    games = moves = 0
+    errors = []
+    with open(path, 'rb') as file:
+        for game in read_games(file, start, end):
+            games += 1
+            try:
+                replay(game, BACKENDS[backend])
+            except PgnError as error:
+                errors.append({'offset': game.offset, 'event': game.headers.get('Event'), 'ply': error.ply,
+                               'move': error.san, 'error': str(error)})
+                if error.ply is not None:
+                    moves += error.ply - 1
+            else:
+                moves += len(game.moves)
+    return games, moves, errors
+
+
+def validate(path, workers=1, backend='board'):
+    """
+    :param path: str
+    :param workers: int. With more than one, the file is split in parts, 4 per worker.
+    :param backend: str
+    :return: generator of (games, moves, list of errors), one per part as they finish
+    """
+    if workers <= 1:
+        yield validate_part((path, 0, None, backend))
+        return
+    size = os.path.getsize(path)
+    parts = workers * 4
+    cuts = [size * i // parts for i in range(parts + 1)]
+    jobs = [(path, start, end, backend) for start, end in zip(cuts, cuts[1:]) if start < end]
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(validate_part, jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='board')
+    parser.add_argument('--errors', help="write the errors to this JSON lines file")
+    args = parser.parse_args()
+
+    games = moves = errors = 0
+    start = time.perf_counter()
+    output = open(args.errors, 'w') if args.errors else None
+    try:
+        for part_games, part_moves, part_errors in validate(args.path, args.workers, args.backend):
+            games += part_games
+            moves += part_moves
+            errors += len(part_errors)
+            for error in part_errors:
+                if output is not None:
+                    output.write(json.dumps(error) + '\n')
+                else:
+                    print(f"game at byte {error['offset']}: {error['error']}")
+    finally:
+        if output is not None:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{games} games, {moves} moves, {errors} errors in {elapsed:.2f} s "
+          f"({games / elapsed:.1f} games/s, {moves / elapsed:.0f} moves/s)")
+
+
+if __name__ == "__main__":
+    main()